@@ -0,0 +1,177 @@
+# clock.py
+# Every timing path (timestamps, sleeps and timed waits) goes through this module so
+# the whole controller can run on real time or on a simulated clock.
+
+import time
+import queue
+import threading
+
+
+class RealClock:
+    """Wall-clock time: thin wrappers around time and threading."""
+
+    virtual = False
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        time.sleep(max(0.0, seconds))
+
+    def wait(self, event, timeout=None):
+        return event.wait(timeout)
+
+    def wait_for(self, cond, predicate, timeout=None):
+        return cond.wait_for(predicate, timeout)
+
+    def get(self, q, timeout=None):
+        return q.get(timeout=timeout)
+
+    def wait_until(self, predicate, timeout=None, poll=0.05):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not predicate():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(poll)
+        return True
+
+
+class SimClock:
+    """Simulated time that jumps straight to the next pending deadline.
+
+    The thread that creates the clock, and every thread that waits through
+    it, is a participant. Once
+    all live participants are blocked in a clock wait and none of them can
+    proceed, time jumps to the earliest deadline among them and they are
+    woken. Nothing ever sleeps for real, so a 20 minute session replays in
+    a fraction of the time. Work done outside the clock (I2C, gpiozero
+    callbacks) takes no simulated time.
+
+    Only the threaded runtime is covered: asyncio timeouts keep using the
+    event loop's own clock.
+
+    Args:
+        start (float): Initial value of monotonic().
+        slice_s (float): Real seconds between re-checks of a blocked wait,
+            which bounds how late an event set by a non-participant is seen.
+    """
+
+    virtual = True
+
+    def __init__(self, start=0.0, slice_s=0.001):
+        self._now = float(start)
+        self._slice = slice_s
+        self._cv = threading.Condition()
+        self._participants = {threading.current_thread()}  # So time stands still while the creator sets up
+        self._waiting = {}  # Thread -> (deadline or None, predicate)
+
+    def monotonic(self):
+        return self._now
+
+    def _advance(self):
+        """Jump to the next deadline if every participant is stuck. Call with _cv held."""
+        self._participants = {t for t in self._participants if t.is_alive()}
+        if not self._participants.issubset(self._waiting):
+            return
+        if any(predicate() for _, predicate in self._waiting.values()):
+            return
+
+        deadlines = [deadline for deadline, _ in self._waiting.values() if deadline is not None]
+        if deadlines:
+            self._now = max(self._now, min(deadlines))
+            self._cv.notify_all()
+
+    def _block(self, predicate, timeout, real_wait=None):
+        """Wait until predicate() is true or the simulated timeout passes.
+
+        Args:
+            predicate (callable): Returns True once the wait is satisfied.
+            timeout (float or None): Simulated seconds, None for no limit.
+            real_wait (callable or None): Blocks for up to one slice in real
+                time; by default a wait on the clock's own condition.
+
+        Returns:
+            bool: The last value of predicate().
+        """
+        me = threading.current_thread()
+        with self._cv:
+            deadline = None if timeout is None else self._now + max(0.0, timeout)
+            self._participants.add(me)
+            self._waiting[me] = (deadline, predicate)
+
+        try:
+            while True:
+                if predicate():
+                    return True
+                with self._cv:
+                    if deadline is not None and self._now >= deadline:
+                        return False
+                    self._advance()
+                    if real_wait is None:
+                        self._cv.wait(self._slice)
+                if real_wait is not None:
+                    real_wait(self._slice)
+        finally:
+            with self._cv:
+                del self._waiting[me]
+
+    def sleep(self, seconds):
+        self._block(lambda: False, seconds)
+
+    def wait(self, event, timeout=None):
+        return self._block(event.is_set, timeout)
+
+    def wait_for(self, cond, predicate, timeout=None):
+        return self._block(predicate, timeout, cond.wait)  # cond.wait releases the caller's lock
+
+    def get(self, q, timeout=None):
+        if not self._block(lambda: not q.empty(), timeout):
+            raise queue.Empty
+        return q.get_nowait()
+
+    def wait_until(self, predicate, timeout=None, poll=None):
+        return self._block(predicate, timeout)
+
+
+_current = RealClock()
+
+
+def use(new_clock):
+    """Install the clock every module uses. Do this before starting any thread."""
+    global _current
+    _current = new_clock
+
+
+def is_virtual():
+    """Return True when a SimClock is installed."""
+    return _current.virtual
+
+
+def monotonic():
+    """Return the current time in seconds, like time.monotonic()."""
+    return _current.monotonic()
+
+
+def sleep(seconds):
+    """Sleep for the given number of seconds."""
+    _current.sleep(seconds)
+
+
+def wait(event, timeout=None):
+    """Wait for a threading.Event, like event.wait(timeout)."""
+    return _current.wait(event, timeout)
+
+
+def wait_for(cond, predicate, timeout=None):
+    """Wait on a held threading.Condition until predicate() is true, like cond.wait_for()."""
+    return _current.wait_for(cond, predicate, timeout)
+
+
+def get(q, timeout=None):
+    """Take an item from a queue.Queue, like q.get(timeout=timeout). Raises queue.Empty."""
+    return _current.get(q, timeout)
+
+
+def wait_until(predicate, timeout=None):
+    """Wait until predicate() is true. Returns False if the timeout expired first."""
+    return _current.wait_until(predicate, timeout)
@@ -0,0 +1,91 @@
+# compensation.py
+# Time-temperature compensation of the development step. Development runs faster in
+# warm developer and slower in cold, so instead of a fixed number of seconds the
+# step runs until the integrated development equals its length at the recipe's
+# temperature: 20 °C for B&W, the setpoint for recipes that have one (38 °C for C-41).
+
+import math
+from array import array
+from functools import lru_cache
+
+REFERENCE_C = 20.0        # Temperature the development times are given for, unless the recipe sets one
+TEMP_COEFFICIENT = 0.08   # Development rate change per °C: about 8%, which matches the usual B&W charts
+TABLE_SPAN_C = 10.0       # The precomputed rate table covers the reference temperature ± this
+TABLE_STEPS_PER_C = 20
+MAX_STRETCH = 2.0         # Longest a compensated step may run, as a multiple of its length at the reference
+
+
+def build_rate_table(reference_c=REFERENCE_C, coefficient=TEMP_COEFFICIENT):
+    """Precompute the development rate for every table temperature.
+
+    The rate is how many seconds of development at reference_c one second
+    at that temperature is worth: exp(coefficient * (T - reference_c)), so
+    warmer developer gives a rate above 1.
+
+    Args:
+        reference_c (float): Temperature the development time is given for.
+        coefficient (float): Fractional rate change per °C, in natural log units.
+
+    Returns:
+        array: Rates from reference_c - TABLE_SPAN_C to reference_c + TABLE_SPAN_C
+        in 1/TABLE_STEPS_PER_C °C steps.
+    """
+    size = int(round(2 * TABLE_SPAN_C * TABLE_STEPS_PER_C)) + 1
+    return array("d", (math.exp(coefficient * (i / TABLE_STEPS_PER_C - TABLE_SPAN_C)) for i in range(size)))
+
+
+rate_table = lru_cache(maxsize=None)(build_rate_table)  # One table per reference temperature, built on first use
+RATE_TABLE = rate_table(REFERENCE_C)
+
+
+def rate_at(temp, table=RATE_TABLE, reference_c=REFERENCE_C):
+    """Return the development rate at a temperature, clamped to the table's range."""
+    index = int(round((temp - reference_c + TABLE_SPAN_C) * TABLE_STEPS_PER_C))
+    return table[min(len(table) - 1, max(0, index))]
+
+
+class Compensator:
+    """Integrates development progress of one step from the developer temperature.
+
+    Each update() adds the time since the previous update weighted by the
+    rate at the previous temperature, then predicts the real seconds left
+    at the current rate. Both are a table lookup and a few float
+    operations, so it can run on every timer tick.
+
+    Args:
+        target_s (float): Length of the step at reference_c.
+        reference_c (float or None): Temperature target_s is given for, REFERENCE_C if None.
+    """
+
+    def __init__(self, target_s, reference_c=None):
+        self.target_s = float(target_s)
+        self.reference_c = REFERENCE_C if reference_c is None else float(reference_c)
+        self.table = rate_table(self.reference_c)
+        self.equivalent_s = 0.0  # Development done so far, in seconds at reference_c
+        self.rate = 1.0          # Rate at the latest temperature
+        self._last = None        # Time of the previous update, None while on hold
+
+    def update(self, temp, now):
+        """Account for the time since the previous update and take a new temperature.
+
+        Args:
+            temp (float or None): Developer temperature in °C. None keeps the previous rate.
+            now (float): clock.monotonic() of the update.
+
+        Returns:
+            float: Predicted real seconds left, see remaining().
+        """
+        if self._last is not None:
+            self.equivalent_s += self.rate * (now - self._last)
+        self._last = now
+        if temp is not None:
+            self.rate = rate_at(temp, self.table, self.reference_c)
+        return self.remaining()
+
+    def hold(self):
+        """Stop integrating until the next update(), e.g. while the timer is paused."""
+        self._last = None
+
+    def remaining(self):
+        """Return the real seconds left if the temperature stays where it is."""
+        return max(0.0, self.target_s - self.equivalent_s) / self.rate
@@ -0,0 +1,217 @@
+# dashboard.py
+# Local web status page. Off by default; turn it on with FILMDEV_DASHBOARD=1 or
+# `python3 main.py --dashboard`, then open http://<pi>:8080/ (FILMDEV_DASHBOARD_PORT).
+#
+# The page subscribes to /events, a Server-Sent Events stream. The timer, the
+# sampler and the heater control publish() their state; only fields whose value
+# changed are kept, encoded once into an SSE frame and the same bytes are queued
+# on every connected client, so more phones cost one socket write each and
+# nothing polls. While disabled publish() returns straight away.
+
+import os
+import json
+import asyncio
+import threading
+
+enabled = os.environ.get("FILMDEV_DASHBOARD", "") not in ("", "0")
+
+HOST = "0.0.0.0"
+PORT = int(os.environ.get("FILMDEV_DASHBOARD_PORT", 8080))
+MAX_BUFFERED = 64 * 1024    # Bytes a client may fall behind by before it is dropped
+REQUEST_TIMEOUT_S = 10.0    # Time a client gets to send its request headers
+
+PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><meta name="viewport" content="width=device-width, initial-scale=1">
+<title>Film development</title>
+<style>
+body{font-family:sans-serif;background:#111;color:#eee;margin:2em;text-align:center}
+#remaining{font-size:4em;font-variant-numeric:tabular-nums;margin:.2em}
+.paused #remaining{color:#4c4}
+td{padding:.2em 1em;text-align:left}table{margin:auto}
+</style></head>
+<body>
+<h2 id="stage">Waiting for a session</h2>
+<div id="step"></div>
+<div id="remaining">--:--</div>
+<div id="paused"></div>
+<table id="temps"></table>
+<p id="heater"></p>
+<script>
+const state = {};
+function mmss(s) { return String(Math.floor(s / 60)).padStart(2, "0") + ":" + String(s % 60).padStart(2, "0"); }
+function render() {
+  document.getElementById("stage").textContent = state.stage ? "Stage " + state.stage : "Waiting for a session";
+  document.getElementById("step").textContent = state.step || "";
+  document.getElementById("remaining").textContent = state.remaining == null ? "--:--" : mmss(state.remaining);
+  document.getElementById("paused").textContent = state.paused ? "PAUSED" : "";
+  document.body.className = state.paused ? "paused" : "";
+  const temps = state.temps || {};
+  document.getElementById("temps").innerHTML = Object.keys(temps).map(
+    name => "<tr><td>" + name + "</td><td>" + temps[name].toFixed(1) + " &deg;C</td></tr>").join("");
+  document.getElementById("heater").textContent = state.heater == null ? "" : "Heater " + (state.heater ? "on" : "off");
+}
+const events = new EventSource("/events");
+events.onmessage = message => { Object.assign(state, JSON.parse(message.data)); render(); };
+</script>
+</body></html>
+"""
+
+
+def _response(status, content_type, body=b""):
+    """Encode a complete HTTP/1.1 response that closes the connection."""
+    return (f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n").encode() + body
+
+
+PAGE_RESPONSE = _response("200 OK", "text/html; charset=utf-8", PAGE.encode())
+NOT_FOUND_RESPONSE = _response("404 Not Found", "text/plain", b"Not found\n")
+EVENTS_HEADER = (b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                 b"Cache-Control: no-cache\r\nConnection: keep-alive\r\n\r\n")
+
+_lock = threading.Lock()
+_state = {}       # Latest value of every published field
+_loop = None      # Loop serving the clients, None while the server is down
+_clients = set()  # StreamWriters of the open event streams, only touched on _loop
+_serving = None   # Task running run(), cancelled by stop()
+_worker = None
+
+
+def enable():
+    """Turn publishing on. Call before start() or run()."""
+    global enabled
+    enabled = True
+
+
+def _frame(fields):
+    """Encode fields as one SSE message."""
+    return b"data: " + json.dumps(fields, separators=(",", ":")).encode() + b"\n\n"
+
+
+def publish(**fields):
+    """Record new state values and push the ones that changed to every client.
+
+    Safe to call from any thread. Fields equal to their last published
+    value are dropped, and nothing is sent if none changed.
+
+    Args:
+        **fields: JSON-serialisable values, e.g. stage=2, paused=False.
+    """
+    if not enabled:
+        return
+    with _lock:
+        changed = {name: value for name, value in fields.items() if name not in _state or _state[name] != value}
+        if not changed:
+            return
+        _state.update(changed)
+        if _loop is not None:  # Scheduled under the lock, so frames reach the loop in update order
+            _loop.call_soon_threadsafe(_broadcast, _frame(changed))
+
+
+def snapshot():
+    """Return a copy of the latest published state."""
+    with _lock:
+        return dict(_state)
+
+
+def _broadcast(frame):
+    """Queue one encoded frame on every client. Runs on the server loop."""
+    for writer in list(_clients):
+        if writer.transport.get_write_buffer_size() > MAX_BUFFERED:  # Gone quiet, e.g. a phone that went to sleep
+            _clients.discard(writer)
+            writer.close()
+        else:
+            writer.write(frame)
+
+
+async def _handle(reader, writer):
+    """Serve one connection: the page, the event stream, or a 404."""
+    try:
+        request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), REQUEST_TIMEOUT_S)
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError):
+        writer.close()
+        return
+
+    parts = request.split(b" ", 2)
+    path = parts[1].split(b"?", 1)[0] if len(parts) > 1 else b""
+
+    if path == b"/events":
+        writer.write(EVENTS_HEADER + _frame(snapshot()))
+        _clients.add(writer)
+        try:
+            while await reader.read(1024):  # Clients send nothing more: drop what comes, in bounded chunks, until they disconnect
+                pass
+        except (ConnectionError, asyncio.CancelledError):  # Cancelled: the server is shutting down
+            writer.close()
+            return
+        finally:
+            _clients.discard(writer)
+    elif path in (b"/", b"/index.html"):
+        writer.write(PAGE_RESPONSE)
+    else:
+        writer.write(NOT_FOUND_RESPONSE)
+
+    try:
+        await writer.drain()
+    except ConnectionError:
+        pass
+    writer.close()
+
+
+async def run(host=HOST, port=PORT):
+    """Serve the dashboard on the running event loop until the task is cancelled.
+
+    Args:
+        host (str): Address to listen on, every interface by default.
+        port (int): TCP port.
+    """
+    global _loop, _serving
+
+    server = await asyncio.start_server(_handle, host, port)
+    with _lock:
+        _loop = asyncio.get_running_loop()
+        _serving = asyncio.current_task()
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        with _lock:
+            _loop = None
+        for writer in _clients:
+            writer.close()
+        _clients.clear()
+
+
+def _serve(host, port):
+    try:
+        asyncio.run(run(host, port))
+    except asyncio.CancelledError:
+        pass
+    except OSError as error:  # Port already in use, no network
+        print(f"Dashboard not started: {error}")
+
+
+def start(host=HOST, port=PORT):
+    """Start the dashboard server on a thread of its own, with its own event loop.
+
+    Args:
+        host (str): Address to listen on, every interface by default.
+        port (int): TCP port.
+    """
+    global _worker
+
+    if _worker and _worker.is_alive():
+        return _worker
+
+    _worker = threading.Thread(target=_serve, args=(host, port), daemon=True)
+    _worker.start()
+    return _worker
+
+
+def stop():
+    """Stop the server thread started by start()."""
+    with _lock:
+        loop, task = _loop, _serving
+    if loop is not None and task is not None:
+        loop.call_soon_threadsafe(task.cancel)
+    if _worker and _worker.is_alive():
+        _worker.join(timeout=1.5)
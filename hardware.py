@@ -0,0 +1,123 @@
+# hardware.py
+# Selects the hardware backend every other module talks to. Set FILMDEV_HARDWARE=sim
+# (before anything is imported) to run against simulation.py instead of the Pi.
+# Importing this module, or any module that uses it, touches no hardware: the pin
+# factory, the 1-Wire modules and the LCD are only set up when first asked for.
+
+import os
+import threading
+import subprocess
+
+PI = "pi"
+SIM = "sim"
+
+BACKEND = os.environ.get("FILMDEV_HARDWARE", PI)
+if BACKEND not in (PI, SIM):
+    raise ValueError(f"Unknown FILMDEV_HARDWARE backend: {BACKEND!r}")
+
+PI_W1_BASE_DIR = '/sys/bus/w1/devices/'
+W1_MODULES = ('w1-gpio', 'w1-therm')
+
+_lock = threading.RLock()
+_gpio_ready = False
+
+
+def _simulation():
+    """Return the simulation module with its hardware installed."""
+    import simulation
+    with _lock:
+        simulation.setup()  # Mock pin factory, fake 1-Wire tree and the bath model; runs once
+    return simulation
+
+
+def setup_gpio():
+    """Install the gpiozero pin factory, once, before the first device is built.
+
+    On the Pi the lgpio factory (the one that drives the Pi 5's GPIO) is set
+    directly, so gpiozero does not try and fail its other factories first.
+    GPIOZERO_PIN_FACTORY still wins when it is set.
+    """
+    global _gpio_ready
+    with _lock:
+        if _gpio_ready:
+            return
+        if BACKEND == SIM:
+            _simulation()
+        elif not os.environ.get('GPIOZERO_PIN_FACTORY'):
+            from gpiozero import Device
+            from gpiozero.pins.lgpio import LGPIOFactory
+            Device.pin_factory = LGPIOFactory()
+        _gpio_ready = True
+
+
+def w1_base_dir():
+    """Return the directory holding the 1-Wire devices (a fake tree on the simulator)."""
+    if BACKEND == SIM:
+        return _simulation().w1_dir
+    return PI_W1_BASE_DIR
+
+
+def load_w1_modules():
+    """Load the 1-Wire kernel modules unless they are already loaded (no-op on the simulator).
+
+    Returns:
+        bool: True if modprobe had to run.
+    """
+    if BACKEND == SIM:
+        return False
+    missing = [name for name in W1_MODULES if not os.path.isdir('/sys/module/' + name.replace('-', '_'))]
+    for name in missing:
+        subprocess.run(['modprobe', name], check=False)
+    return bool(missing)
+
+
+def bring_up(*steps):
+    """Run independent start-up steps at the same time, one thread each.
+
+    Used to overlap the slow parts of a cold start: the LCD's I2C init
+    sequence, building the GPIO devices and loading the 1-Wire modules.
+
+    Args:
+        *steps (callable): Functions taking no arguments.
+
+    Returns:
+        list: Each step's return value, in the order given.
+
+    Raises:
+        Exception: The first exception raised by a step, once all have finished.
+    """
+    setup_gpio()  # Before the threads, so they never race to pick a pin factory
+
+    results = [None] * len(steps)
+    errors = []
+
+    def run(index, step):
+        try:
+            results[index] = step()
+        except BaseException as error:  # Re-raised on the calling thread
+            errors.append(error)
+
+    threads = [threading.Thread(target=run, args=(index, step), name=f"bring-up-{index}")
+               for index, step in enumerate(steps)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+    return results
+
+
+def make_lcd():
+    """Create the LCD driver for the active backend.
+
+    Returns:
+        hd44780.I2CLcd or simulation.VirtualLcd: Object with the lcd_write,
+        lcd_write_at, lcd_display_string and lcd_clear interface.
+    """
+    if BACKEND == SIM:
+        return _simulation().VirtualLcd()
+
+    import hd44780
+    return hd44780.I2CLcd()
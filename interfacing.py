@@ -1,64 +1,194 @@
 # interfacing.py
-import sys
-import time
-from pathlib import Path
+import queue
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import namedtuple
 from gpiozero import Button
+import clock
+import hardware
+import metrics
 from rotarycontrol import RotaryControl
 
-# LCD driver import
-BASE_DIR = Path(__file__).resolve().parent
+# Input event kinds posted by the button callbacks
+PRESS = "press"
+RELEASE = "release"
+HOLD = "hold"
+ROTATE = "rotate"  # Encoder turned; the event's steps are signed and velocity-accelerated
 
-def _extend_sys_path_for_lcd(base_dir: Path):
-    """Add the most likely lcd driver directory to sys.path.
+KNOB = 0  # Pseudo button number for the rotary encoder's push switch
 
-    Prefer an adjacent `lcd/` folder but fall back to the historical
-    `../../lcd` location for compatibility with older deployments.
+# HD44780 geometry for the 20x4 module
+LCD_COLS = 20
+LCD_ROWS = 4
+LCD_ROW_OFFSETS = (0x00, 0x40, 0x14, 0x54)  # DDRAM address of column 0 on each line
+RENDER_INTERVAL_S = 0.05  # Shortest time between two renders of posted lines: at most 20 LCD updates a second
 
-    Args:
-        base_dir (Path): Base directory to search from.
-    """
-
-    lcd_candidates = [
-        base_dir / "lcd",              # ./lcd
-        base_dir.parent / "lcd",       # ../lcd
-        base_dir.parent.parent / "lcd" # ../../lcd (legacy)
-    ]
-
-    for candidate in lcd_candidates:
-        if candidate.is_dir():
-            sys.path.append(str(candidate))
-            break
-    else:
-        # Preserve previous behavior if no candidate directory is present.
-        sys.path.append(str(lcd_candidates[-1]))
-
-
-_extend_sys_path_for_lcd(BASE_DIR)
-
-import drivers
+ButtonEvent = namedtuple("ButtonEvent", ["kind", "button", "timestamp", "steps"], defaults=(0,))
 
 
 class UI:
     
     """
     Handles all user interaction including:
-    - LCD output (all the different screens shown to the user)
-    - Button input (detect_button looks for which button is being pushed)
+    - LCD output (all the different screens shown to the user). A shadow copy
+      of the glass is kept so only characters that changed are sent over I2C.
+      Loops that must not wait on the bus post_line() instead: a renderer
+      thread keeps only the latest posted text of each line and draws it at
+      most every RENDER_INTERVAL_S
+    - Button input (edge callbacks post timestamped ButtonEvents on a queue
+      that the stage timer and main loop block on)
     - Rotary encoder input for setting dev time and push or pull setting
 
     This class acts as the interface layer between the user and the
-    development logic.
+    development logic. After attach_loop() the events go to an asyncio
+    queue instead and the *_async methods serve the asyncio runtime.
     """
     
-    def __init__(self):
-        self.display = drivers.Lcd()
-
+    def __init__(self, hold_time=1.2):
+        self.display = hardware.make_lcd()
+        self.display.lcd_clear()
+        self._shadow = [" " * LCD_COLS for _ in range(LCD_ROWS)]  # What is currently on the glass
+        self._lcd_lock = threading.Lock()       # Held while the glass and shadow are written
+        self._posted = [None] * LCD_ROWS        # Latest posted text of each line, None when nothing is waiting
+        self._post_cond = threading.Condition()  # Guards _posted; taken after _lcd_lock, never before it
+        self._rendering = True
+        self._renderer = threading.Thread(target=self._render_loop, daemon=True)
+        self._renderer.start()
+
+        hardware.setup_gpio()
         self.rotary = RotaryControl()
 
-        self.key1 = Button(25, pull_up=True, bounce_time=0.1)
-        self.key2 = Button(8,  pull_up=True, bounce_time=0.1)
-        self.key3 = Button(23, pull_up=True, bounce_time=0.1)
-        self.key4 = Button(24, pull_up=True, bounce_time=0.1)
+        self.key1 = Button(25, pull_up=True, bounce_time=0.1, hold_time=hold_time)
+        self.key2 = Button(8,  pull_up=True, bounce_time=0.1, hold_time=hold_time)
+        self.key3 = Button(23, pull_up=True, bounce_time=0.1, hold_time=hold_time)
+        self.key4 = Button(24, pull_up=True, bounce_time=0.1, hold_time=hold_time)
+
+        self.events = queue.Queue()
+        self.async_events = None   # asyncio.Queue once attach_loop() is called
+        self._loop = None
+        self._lcd_executor = None  # Single worker so LCD writes stay ordered
+        self.stage_names = ()      # Menu name of every stage, set by Stages from its recipe
+
+        for number, key in enumerate((self.key1, self.key2, self.key3, self.key4), start=1):
+            self._bind_events(key, number)
+        self._bind_events(self.rotary.button, KNOB)
+        self.rotary.when_turned = lambda steps: self._post(ROTATE, KNOB, steps)
+
+    def _bind_events(self, button, number):
+        """Route a button's edge and hold callbacks onto the event queue.
+
+        Args:
+            button (Button): gpiozero button to listen to.
+            number (int): Button number (1-4, or KNOB) reported in the events.
+        """
+        button.when_pressed = lambda: self._post(PRESS, number)
+        button.when_released = lambda: self._post(RELEASE, number)
+        button.when_held = lambda: self._post(HOLD, number)
+
+    def _post(self, kind, number, steps=0):
+        """Queue a timestamped input event. Runs on the gpiozero callback thread."""
+        event = ButtonEvent(kind, number, clock.monotonic(), steps)
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self.async_events.put_nowait, event)
+        else:
+            self.events.put(event)
+
+    def attach_loop(self, loop):
+        """Switch input delivery and LCD writes over to an asyncio event loop.
+
+        Input events are posted to async_events on the loop, and run_lcd()
+        moves the blocking I2C writes onto a dedicated executor thread.
+
+        Args:
+            loop (asyncio.AbstractEventLoop): Loop running the asyncio runtime.
+        """
+        self.async_events = asyncio.Queue()
+        self._lcd_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="lcd")
+        self._loop = loop
+
+    async def run_lcd(self, func, *args):
+        """Run a blocking LCD method on the LCD executor and wait for it.
+
+        Args:
+            func (callable): Bound UI method that writes to the display.
+            *args: Arguments passed to func.
+
+        Returns:
+            The return value of func.
+        """
+        return await self._loop.run_in_executor(self._lcd_executor, func, *args)
+
+    def set_hold_time(self, seconds: float):
+        """Set how long a stage button must be held before a HOLD event fires.
+
+        Args:
+            seconds (float): Long-press duration in seconds.
+        """
+        for key in (self.key1, self.key2, self.key3, self.key4):
+            key.hold_time = seconds
+
+    def flush_events(self):
+        """Discard any input events that are still waiting in the queue."""
+        while True:
+            try:
+                self.events.get_nowait()
+            except queue.Empty:
+                break
+        while self.async_events is not None and not self.async_events.empty():
+            self.async_events.get_nowait()
+
+    def next_event(self, timeout=None):
+        """Block until the next input event arrives.
+
+        Args:
+            timeout (float or None): Maximum time to wait in seconds. None waits forever.
+
+        Returns:
+            ButtonEvent or None: The event, or None if the timeout expired.
+        """
+        try:
+            return clock.get(self.events, timeout)
+        except queue.Empty:
+            return None
+
+    async def next_event_async(self, timeout=None):
+        """Wait for the next input event on the asyncio queue.
+
+        Args:
+            timeout (float or None): Maximum time to wait in seconds. None waits forever.
+
+        Returns:
+            ButtonEvent or None: The event, or None if the timeout expired.
+        """
+        try:
+            return await asyncio.wait_for(self.async_events.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def poll_event(self):
+        """Return the next queued input event without waiting, or None if there is none."""
+        try:
+            if self._loop is not None:
+                return self.async_events.get_nowait()
+            return self.events.get_nowait()
+        except (queue.Empty, asyncio.QueueEmpty):
+            return None
+
+    @staticmethod
+    def _knob_pressed(event):
+        """Return True if event is a press of the rotary encoder's push switch."""
+        return event is not None and event.kind == PRESS and event.button == KNOB
+
+    def wait_for_knob(self):
+        """Block until the rotary encoder's push switch is pressed."""
+        while not self._knob_pressed(self.next_event()):
+            pass
+
+    async def wait_for_knob_async(self):
+        """Asyncio version of wait_for_knob()."""
+        while not self._knob_pressed(await self.next_event_async()):
+            pass
 
     @staticmethod
     def _line(text: str) -> str:
@@ -73,17 +203,127 @@ class UI:
         return text[:20].ljust(20)
 
     def write_line(self, text: str, line: int):
-        """Write text to a specific LCD line (1-4).
+        """Write text to a specific LCD line (1-4) now.
+
+        Text still posted for the line is dropped, so the renderer cannot
+        later overwrite this with an older frame.
 
         Args:
             text (str): Text to display (auto-formatted to 20 chars).
             line (int): LCD line number (1-4).
         """
-        self.display.lcd_display_string(self._line(text), line)
+        with self._lcd_lock:
+            with self._post_cond:
+                self._posted[line - 1] = None
+            self._draw_line(text, line)
+
+    def _draw_line(self, text: str, line: int):
+        """Send a line to the glass. Call with _lcd_lock held.
+
+        The line is diffed against the shadow buffer and only the changed
+        characters are sent. Runs separated by a single unchanged character
+        are merged, since a cursor move costs as much as writing that character.
+        """
+        new = self._line(text)
+        old = self._shadow[line - 1]
+
+        col = 0
+        while col < LCD_COLS:
+            if new[col] == old[col]:
+                col += 1
+                continue
+
+            end = col + 1
+            while end < LCD_COLS:
+                if new[end] != old[end]:
+                    end += 1
+                elif end + 1 < LCD_COLS and new[end + 1] != old[end + 1]:
+                    end += 2
+                else:
+                    break
+
+            self._write_at(line, col, new[col:end])
+            col = end
+
+        self._shadow[line - 1] = new
+
+    @metrics.timed(metrics.LCD_WRITE)
+    def _write_at(self, line: int, col: int, text: str):
+        """Move the cursor to (line, col) and send text from there, in one I2C transfer.
+
+        Args:
+            line (int): LCD line number (1-4).
+            col (int): Column (0-19) of the first character.
+            text (str): Characters to send.
+        """
+        self.display.lcd_write_at(LCD_ROW_OFFSETS[line - 1] + col, text)
+        metrics.count(metrics.LCD_COMMANDS)
+        metrics.count(metrics.LCD_CHARS, len(text))
+
+    def write_screen(self, *lines: str):
+        """Draw a full screen by overwriting every line in place.
+
+        Lines that are not given are blanked. Nothing is cleared first, so
+        characters shared with the previous screen are not resent.
+
+        Args:
+            *lines (str): Up to four lines of text, top to bottom.
+        """
+        for line in range(1, LCD_ROWS + 1):
+            self.write_line(lines[line - 1] if line <= len(lines) else "", line)
 
     def clear(self):
-        """Clear all text from the LCD display."""
-        self.display.lcd_clear()
+        """Blank the LCD display by overwriting the characters still shown."""
+        self.write_screen()
+
+    def post_line(self, text: str, line: int):
+        """Hand a line to the renderer and return without touching the bus.
+
+        Posting again before the renderer gets to the line replaces the
+        earlier text, which is then never drawn.
+
+        Args:
+            text (str): Text to display (auto-formatted to 20 chars).
+            line (int): LCD line number (1-4).
+        """
+        with self._post_cond:
+            self._posted[line - 1] = text
+            self._post_cond.notify()
+
+    def post_screen(self, *lines: str):
+        """Hand a full screen to the renderer, like write_screen() without waiting.
+
+        Args:
+            *lines (str): Up to four lines of text, top to bottom.
+        """
+        with self._post_cond:
+            for line in range(LCD_ROWS):
+                self._posted[line] = lines[line] if line < len(lines) else ""
+            self._post_cond.notify()
+
+    def _render_loop(self):
+        """Draw posted lines until cleanup(), at most once every RENDER_INTERVAL_S."""
+        waiting = lambda: not self._rendering or any(text is not None for text in self._posted)
+        while True:
+            with self._post_cond:
+                clock.wait_for(self._post_cond, waiting)
+                if not self._rendering:
+                    return
+
+            with self._lcd_lock:
+                with self._post_cond:
+                    lines, self._posted = self._posted, [None] * LCD_ROWS
+                for line, text in enumerate(lines, start=1):
+                    if text is not None:
+                        self._draw_line(text, line)
+            metrics.count(metrics.LCD_RENDERS)
+            clock.sleep(RENDER_INTERVAL_S)  # Whatever is posted meanwhile is coalesced into the next render
+
+    def _stop_renderer(self):
+        with self._post_cond:
+            self._rendering = False
+            self._post_cond.notify()
+        self._renderer.join(timeout=1.5)
 
     def _format_time(self, seconds: int) -> str:
         """Convert seconds to MM:SS format.
@@ -99,152 +339,307 @@ class UI:
 
     def welcome_screen(self):
         """Display the welcome screen prompting user to start."""
-        self.clear()
-        self.write_line("********************", 1)
-        self.write_line("*     Welcome!     *", 2)
-        self.write_line("* Press 1 to begin *", 3)
-        self.write_line("********************", 4)
+        self.write_screen(
+            "********************",
+            "*     Welcome!     *",
+            "* Press 1 to begin *",
+            "********************",
+        )
+
+    @staticmethod
+    def _stage_menu(names):
+        """Return the stage menu's two lines: stages 1-2 on the left, 3-4 on the right."""
+        cells = [f"{number} {name}" for number, name in enumerate(names, start=1)]
+        left, right = cells[:2], cells[2:4]
+        width = max(map(len, left), default=0) + 1
+        return [((left[row] if row < len(left) else "").ljust(width) + (right[row] if row < len(right) else ""))[:LCD_COLS].rstrip()
+                for row in range(2)]
 
     def stage_done_screen(self):
-        """Display stage completion screen with next stage options."""
-        self.clear()
-        self.write_line("   Stage finished   ", 1)
-        self.write_line(" Choose next stage: ", 2)
-        self.write_line("1 Dev   3 Fixer    ", 3)
-        self.write_line("2 Stop  4 Photoflo ", 4)
+        """Display stage completion screen with next stage options, named after the recipe's stages."""
+        self.write_screen(
+            "   Stage finished   ",
+            " Choose next stage: ",
+            *self._stage_menu(self.stage_names),
+        )
 
     def paused_screen(self):
-        """Display the paused state screen with resume instructions."""
-        self.clear()
-        self.write_line("********************", 1)
-        self.write_line("*      PAUSED      *", 2)
-        self.write_line("*  Hold to resume  *", 3)
-        self.write_line("********************", 4)
+        """Post the paused state screen with resume instructions."""
+        self.post_screen(
+            "********************",
+            "*      PAUSED      *",
+            "*  Hold to resume  *",
+            "********************",
+        )
+
+    def resume_prompt(self, stage, remaining=None):
+        """Offer to resume a session left unfinished by a crash or reboot.
+
+        Args:
+            stage (int): Stage that was running, or the next stage to choose.
+            remaining (float or None): Seconds left in the running stage, None between stages.
+
+        Returns:
+            bool: True if the knob was pressed to resume, False if a stage
+            button was pressed to start afresh.
+        """
+        if remaining is None:
+            where = f"Next: stage {stage}"
+        else:
+            where = f"Stage {stage}: {self._format_time(remaining)} left"
+        self.write_screen(
+            "Unfinished session",
+            where,
+            "Knob: resume",
+            "Button: start over",
+        )
+
+        self.flush_events()
+        while True:
+            event = self.next_event()
+            if event.kind == PRESS:
+                return event.button == KNOB
+
+    @staticmethod
+    def _format_level(level: int) -> str:
+        """Format a push/pull level with an explicit sign for pushes."""
+        return f"+{level}" if level > 0 else str(level)
+
+    def _dev_time_screen(self, value):
+        """Show the development time dialog with the current value."""
+        self.write_screen(
+            "[ Dev time ]",
+            self._dev_time_field(value),
+            "Rotate to adjust",
+            "Press knob to set",
+        )
+
+    def _dev_time_field(self, value):
+        """Return the dev time dialog's value line."""
+        return f"   {self._format_time(value)}   "
+
+    def _push_pull_screen(self, level):
+        """Show the push/pull dialog with the current level."""
+        self.write_screen(
+            "Push/Pull setting",
+            self._push_pull_field(level),
+            "Rotate to adjust",
+            "Press knob to set",
+        )
+
+    def _push_pull_field(self, level):
+        """Return the push/pull dialog's value line."""
+        return f"Level: {self._format_level(level).rjust(3)}"
+
+    def _dev_summary_screen(self, adjusted, level):
+        """Show the chosen development settings before the run starts."""
+        self.write_screen(
+            "Dev settings ready",
+            f"Time: {self._format_time(adjusted)}",
+            f"Push/Pull: {self._format_level(level).rjust(3)}",
+            "Press knob to start",
+        )
+
+    @staticmethod
+    def _level_index(push_pull_options, current_level):
+        """Return the index of current_level in push_pull_options (0 if absent)."""
+        for i, (level, _) in enumerate(push_pull_options):
+            if level == current_level:
+                return i
+        return 0
+
+    @staticmethod
+    def _dev_time_step(value, event):
+        """Apply a ROTATE event to the dev time: 5 s per step, kept within 10 s to 1 hour."""
+        return min(3600, max(10, value + event.steps * 5))
+
+    @staticmethod
+    def _level_step(index, event, count):
+        """Apply a ROTATE event to the push/pull index: one level per detent, whatever the speed."""
+        return (index + (1 if event.steps > 0 else -1)) % count
+
+    def _dial_loop(self, value, step, field):
+        """Run an encoder dialog until the knob is pressed.
+
+        Drives _dial() and _dial_async(), which differ only in how they
+        block: the generator yields when it has caught up and needs the
+        next event, and is sent that event. Every turn already queued is
+        applied before the value line is posted, and the renderer
+        coalesces posts, so a fast spin costs one LCD update per render,
+        not per detent.
+
+        Args:
+            value: Starting value.
+            step (callable): (value, ROTATE event) -> new value.
+            field (callable): value -> text of LCD line 2.
+
+        Returns:
+            The value when the knob was pressed (as StopIteration.value).
+        """
+        dirty = False
+        while True:
+            event = self.poll_event() if dirty else (yield)
+            if event is None:  # Caught up with the encoder
+                self.post_line(field(value), 2)
+                dirty = False
+            elif event.kind == ROTATE:
+                value = step(value, event)
+                dirty = True
+            elif self._knob_pressed(event):
+                return value
+
+    def _dial(self, value, step, field):
+        """Run an encoder dialog, blocking on the input queue between events."""
+        dialog = self._dial_loop(value, step, field)
+        next(dialog)
+        try:
+            while True:
+                dialog.send(self.next_event())
+        except StopIteration as done:
+            return done.value
+
+    async def _dial_async(self, value, step, field):
+        """Asyncio version of _dial()."""
+        dialog = self._dial_loop(value, step, field)
+        next(dialog)
+        try:
+            while True:
+                dialog.send(await self.next_event_async())
+        except StopIteration as done:
+            return done.value
+
+    def _dev_time_dialog(self, base_seconds):
+        """Return the starting value and screen of the dev time dialog."""
+        value = max(10, int(base_seconds))
+        return value, (self._dev_time_screen, value)
+
+    def _push_pull_dialog(self, push_pull_options, current_level):
+        """Return the starting index, screen, step and field of the push/pull dialog."""
+        count = len(push_pull_options)
+        index = self._level_index(push_pull_options, current_level)
+        return (index, (self._push_pull_screen, push_pull_options[index][0]),
+                lambda i, event: self._level_step(i, event, count),
+                lambda i: self._push_pull_field(push_pull_options[i][0]))
+
+    @staticmethod
+    def _dev_settings(value, push_pull_options, index):
+        """Return the adjusted development time and the chosen level."""
+        level, factor = push_pull_options[index]
+        return int(round(value * factor)), level
 
     def development_settings(self, base_seconds: int, push_pull_options, current_level=0):
         
         """
         Allows the user to configure development time and push/pull level
-        using the rotary encoder.
+        using the rotary encoder. The time moves 5 s per slow detent and
+        faster the faster the knob is spun (see rotarycontrol.ACCELERATION).
     
         Returns the adjusted development time and selected push/pull level.
         """
 
-        def format_level(level: int) -> str:
-            return f"+{level}" if level > 0 else str(level)
-
-        def show_time(value):
-            self.clear()
-            self.write_line("[ Dev time ]", 1)
-            self.write_line(f"   {self._format_time(value)}   ", 2)
-            self.write_line("Rotate to adjust", 3)
-            self.write_line("Press knob to set", 4)
+        self.flush_events()
 
-        def show_push_pull(index):
-            level, _ = push_pull_options[index]
-            self.clear()
-            self.write_line("Push/Pull setting", 1)
-            self.write_line(f"Level: {format_level(level).rjust(3)}", 2)
-            self.write_line("Rotate to adjust", 3)
-            self.write_line("Press knob to set", 4)
+        value, (screen, *args) = self._dev_time_dialog(base_seconds)
+        screen(*args)
+        value = self._dial(value, self._dev_time_step, self._dev_time_field)
 
-        # Adjusts base development time in 5s increments
-        value = max(10, int(base_seconds))
-        show_time(value)
-
-        while True:
-            delta = self.rotary.delta()
-            if delta:
-                value = min(3600, max(10, value + delta * 5))
-                show_time(value)
+        # Choose push/pull level
+        index, (screen, *args), step, field = self._push_pull_dialog(push_pull_options, current_level)
+        screen(*args)
+        index = self._dial(index, step, field)
 
-            if self.rotary.is_pressed():
-                time.sleep(0.15)  # debounces the confirmation
-                break
+        adjusted, level = self._dev_settings(value, push_pull_options, index)
+        self._dev_summary_screen(adjusted, level)
 
-            time.sleep(0.05)
+        # Wait for confirmation so user can see what they chose before starting.
+        self.wait_for_knob()
 
-        # Choose push/pull level
-        index = 0 
-        for i, (level, _) in enumerate(push_pull_options):
-            if level == current_level:
-                index = i
-                break
-        show_push_pull(index)
+        return adjusted, level
 
-        while True:
-            delta = self.rotary.delta()
-            if delta:
-                index = (index + delta) % len(push_pull_options)
-                show_push_pull(index)
+    async def development_settings_async(self, base_seconds: int, push_pull_options, current_level=0):
+        """Asyncio version of development_settings().
 
-            if self.rotary.is_pressed():
-                time.sleep(0.15)
-                break
+        The encoder dialogs run as a task on the event loop and the screens
+        are drawn through run_lcd().
+        """
 
-            time.sleep(0.05)
+        self.flush_events()
 
-        level, factor = push_pull_options[index]
-        adjusted = int(round(value * factor))
+        value, screen = self._dev_time_dialog(base_seconds)
+        await self.run_lcd(*screen)
+        value = await self._dial_async(value, self._dev_time_step, self._dev_time_field)
 
-        self.clear()
-        self.write_line("Dev settings ready", 1)
-        self.write_line(f"Time: {self._format_time(adjusted)}", 2)
-        self.write_line(f"Push/Pull: {format_level(level).rjust(3)}", 3)
-        self.write_line("Press knob to start", 4)
+        index, screen, step, field = self._push_pull_dialog(push_pull_options, current_level)
+        await self.run_lcd(*screen)
+        index = await self._dial_async(index, step, field)
 
-        # Wait for confirmation so user can see what they chose before starting.
-        while not self.rotary.is_pressed():
-            time.sleep(0.05)
-        time.sleep(0.15)  # debouncing
+        adjusted, level = self._dev_settings(value, push_pull_options, index)
+        await self.run_lcd(self._dev_summary_screen, adjusted, level)
+        await self.wait_for_knob_async()
 
         return adjusted, level
 
+    def _end_screen(self):
+        """Show the session completion screen."""
+        self.write_screen(
+            "  You're all done!  ",
+            "--------------------",
+            " Press any button   ",
+            "   to restart       ",
+        )
+
     def end_screen(self):
         """Display completion screen and wait for button press to restart.
 
         Returns:
             str: Always returns "restart".
         """
-        self.clear()
-        self.write_line("  You're all done!  ", 1)
-        self.write_line("--------------------", 2)
-        self.write_line(" Press any button   ", 3)
-        self.write_line("   to restart       ", 4)
+        self._end_screen()
 
         self.wait_for_button()
         return "restart"
 
-    def detect_button(self):
-        """Check which stage button is currently pressed.
+    async def end_screen_async(self):
+        """Asyncio version of end_screen()."""
+        await self.run_lcd(self._end_screen)
 
-        Returns:
-            int or None: Button number (1-4) or None if no button is pressed.
-        """
-        if self.key1.is_pressed:
-            return 1
-        if self.key2.is_pressed:
-            return 2
-        if self.key3.is_pressed:
-            return 3
-        if self.key4.is_pressed:
-            return 4
-        return None
+        await self.wait_for_button_async()
+        return "restart"
 
-    def wait_for_button(self):
-        """Block until any button is pressed, then return its number.
+    def wait_for_button(self, flush=True):
+        """Block until any stage button is pressed, then return its number.
+
+        Presses queued before the call (e.g. during a running stage) are
+        discarded so only a fresh press is reported.
+
+        Args:
+            flush (bool): Set to False to accept a press queued before the
+                call, e.g. one made on the welcome screen during start-up.
 
         Returns:
             int: Button number (1-4) that was pressed.
         """
+        if flush:
+            self.flush_events()
+        while True:
+            event = self.next_event()
+            if event.kind == PRESS and event.button != KNOB:
+                return event.button
+
+    async def wait_for_button_async(self, flush=True):
+        """Asyncio version of wait_for_button()."""
+        if flush:
+            self.flush_events()
         while True:
-            b = self.detect_button()
-            if b:
-                return b
-            time.sleep(0.02)
+            event = await self.next_event_async()
+            if event.kind == PRESS and event.button != KNOB:
+                return event.button
 
     def cleanup(self):
         """Release all GPIO resources and clear the LCD display."""
+        if self._lcd_executor is not None:
+            self._lcd_executor.shutdown(wait=True)
+        self._stop_renderer()
         self.clear()
         self.key1.close()
         self.key2.close()
@@ -0,0 +1,214 @@
+# journal.py
+# Append-only record of the running session, so a crash or reboot mid-stage can be
+# resumed at the right stage with the right time left. Records are JSON lines.
+#
+# SD cards wear with every sync, so records are batched: checkpoints, pauses and
+# resumes are written to the file (the page cache, which survives a crash of this
+# process) and the file is only fsynced at stage boundaries, which therefore also
+# survive a power cut. Checkpoints are held in memory and only the newest is written,
+# once a minute or with the next record: a running stage's time left is its offset
+# plus the wall time since the record, so an older checkpoint resumes it just as well.
+# Pauses and resumes are written at once, since losing one would count paused time
+# as developing or the other way round.
+
+import os
+import json
+import time
+from collections import namedtuple
+from pathlib import Path
+import clock
+
+JOURNAL_FILE = Path(os.environ.get("FILMDEV_JOURNAL", Path(__file__).resolve().parent / "session.journal"))
+CHECKPOINT_S = 15.0  # Seconds between remaining-time checkpoints while a stage runs
+CHECKPOINT_WRITE_S = 60.0  # Seconds between writes of the newest checkpoint
+
+Recovery = namedtuple("Recovery", [
+    "recipe",       # Recipe name
+    "history",      # Id of the session in sessiondb, or None
+    "compensate",   # Whether the session compensated the development time
+    "dev_seconds",  # Dev settings chosen for the session, or None if not chosen yet
+    "dev_level",
+    "last_stage",   # Last completed stage, None if none
+    "stage",        # Stage that was running, or None between stages
+    "offset",       # Seconds into that stage's timeline at the last record
+    "equivalent",   # Compensated development done, in seconds at the recipe's reference temperature, or None
+    "paused",       # Whether the stage was paused at the last record
+    "wall_time",    # time.time() of the last record
+])
+
+
+class Journal:
+    """Writer for the session journal.
+
+    Args:
+        path (str or Path): Journal file. A new session truncates it.
+        checkpoint_s (float): Seconds between remaining-time checkpoints.
+        write_s (float): Seconds between writes of the newest checkpoint.
+    """
+
+    def __init__(self, path=JOURNAL_FILE, checkpoint_s=CHECKPOINT_S, write_s=CHECKPOINT_WRITE_S):
+        self.path = Path(path)
+        self.checkpoint_s = checkpoint_s
+        self.write_s = write_s
+        self._fd = None
+        self._pending = []           # Encoded records not written yet
+        self.next_checkpoint = 0.0   # clock.monotonic() from which checkpoint() is due
+        self._next_write = 0.0       # clock.monotonic() from which a checkpoint is written
+
+    def _open(self, truncate):
+        self.close()
+        flags = os.O_WRONLY | os.O_CREAT | os.O_APPEND | (os.O_TRUNC if truncate else 0)
+        self._fd = os.open(self.path, flags, 0o644)
+
+    def record(self, event, **fields):
+        """Queue a record in memory. Nothing reaches the file until flush()."""
+        fields["event"] = event
+        fields["t"] = time.time()  # Wall time: monotonic clocks restart with the Pi
+        self._pending.append(json.dumps(fields, separators=(",", ":")) + "\n")
+
+    def flush(self, sync=False):
+        """Write the queued records in one write() call, and fsync if sync is True."""
+        if self._fd is None:
+            self._pending.clear()
+            return
+        if self._pending:
+            os.write(self._fd, "".join(self._pending).encode())
+            self._pending.clear()
+        if sync:
+            os.fsync(self._fd)
+
+    def begin(self, recipe, compensate, history=None):
+        """Start a new session, replacing the previous journal.
+
+        Args:
+            recipe (str): Recipe name.
+            compensate (bool): Whether the development time is compensated.
+            history (int or None): Id of the session in sessiondb, kept for resuming.
+        """
+        self._open(truncate=True)
+        self.record("session", recipe=recipe, compensate=compensate, history=history)
+        self.flush(sync=True)
+
+    def reopen(self):
+        """Continue the journal of a session that is being resumed."""
+        self._open(truncate=False)
+        self.record("reopen")
+        self.flush(sync=True)
+
+    def dev_settings(self, seconds, level):
+        self.record("dev", seconds=seconds, level=level)
+        self.flush(sync=True)
+
+    def stage_start(self, stage, offset=0.0, equivalent=None):
+        if equivalent is not None:
+            equivalent = round(equivalent, 2)
+        self.record("stage_start", stage=stage, offset=round(offset, 2), equivalent=equivalent)
+        self.flush(sync=True)
+        self.next_checkpoint = clock.monotonic() + self.checkpoint_s
+        self._next_write = self.next_checkpoint + self.write_s
+
+    def stage_end(self, stage):
+        self.record("stage_end", stage=stage)
+        self.flush(sync=True)
+
+    def checkpoint(self, stage, offset, now, equivalent=None):
+        """Record how far into the stage the timer is.
+
+        The timer loop only calls it once now reaches next_checkpoint, so
+        between checkpoints the journal costs it one comparison. The record
+        replaces any checkpoint not written yet, and is written once
+        write_s has passed since the last write, or with the next record.
+
+        Args:
+            stage (int): Running stage.
+            offset (float): Seconds into the stage's timeline, pauses excluded.
+            now (float): clock.monotonic() of the pass.
+            equivalent (float or None): Compensated development done so far.
+        """
+        self.next_checkpoint = now + self.checkpoint_s
+        if equivalent is not None:
+            equivalent = round(equivalent, 2)
+        self._pending.clear()  # Only checkpoints wait here: every other record is written at once
+        self.record("checkpoint", stage=stage, offset=round(offset, 2), equivalent=equivalent)
+        if now >= self._next_write:
+            self._next_write = now + self.write_s
+            self.flush()
+
+    def pause(self, stage, offset):
+        self.record("pause", stage=stage, offset=round(offset, 2))
+        self.flush()
+
+    def resume(self, stage, offset):
+        self.record("resume", stage=stage, offset=round(offset, 2))
+        self.flush()
+
+    def end(self):
+        """Mark the session as finished, so it is not offered for resuming."""
+        self.record("session_end")
+        self.flush(sync=True)
+        self.close()
+
+    def discard(self):
+        """Delete the journal, e.g. when the user declines to resume it."""
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        if self._fd is not None:
+            self.flush()
+            os.close(self._fd)
+            self._fd = None
+
+
+def recover(path=JOURNAL_FILE):
+    """Read the journal left by an unfinished session.
+
+    A torn last line (the process died mid-write) is ignored.
+
+    Args:
+        path (str or Path): Journal file.
+
+    Returns:
+        Recovery or None: Where the session was, or None if there is no
+        journal or its session finished.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+
+    state = None
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        event = record.get("event")
+
+        if event == "session":
+            state = dict(recipe=record["recipe"], history=record.get("history"), compensate=record["compensate"], dev_seconds=None,
+                         dev_level=None, last_stage=None, stage=None, offset=0.0, equivalent=None,
+                         paused=False, wall_time=record["t"])
+            continue
+        if state is None:
+            continue
+        state["wall_time"] = record["t"]
+
+        if event == "dev":
+            state.update(dev_seconds=record["seconds"], dev_level=record["level"])
+        elif event == "stage_start":
+            state.update(stage=record["stage"], offset=record["offset"], equivalent=record["equivalent"], paused=False)
+        elif event == "checkpoint":
+            state.update(offset=record["offset"], equivalent=record["equivalent"])
+        elif event in ("pause", "resume"):
+            state.update(offset=record["offset"], paused=event == "pause")
+        elif event == "stage_end":
+            state.update(last_stage=record["stage"], stage=None, offset=0.0, equivalent=None, paused=False)
+        elif event == "session_end":
+            state = None
+
+    return Recovery(**state) if state else None
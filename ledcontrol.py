@@ -1,200 +1,398 @@
 # ledcontrol.py
 from gpiozero import LED, PWMLED
-from time import sleep, monotonic, time
+import hardware
+import clock
+import metrics
+from collections import namedtuple
+from itertools import count
+import heapq
+import asyncio
 import threading
 
-blue = PWMLED(17)
-yellow = LED(27)
-green = LED(22)
+blue = None    # PWMLED on GPIO 17, built by init()
+yellow = None  # LED on GPIO 27
+green = None   # LED on GPIO 22
 
-stop_flag = False
-green_blink_flag = False
-pause_flag = False
+# Declarative LED patterns. The single engine thread turns each one into a
+# stream of (value, hold) steps and sleeps until the earliest step is due.
+Solid = namedtuple("Solid", ["value"])                                  # Constant brightness
+Blink = namedtuple("Blink", ["on_time", "off_time", "active", "every"])  # Blink for `active` s at the start of every `every` s (None = always)
+Breathe = namedtuple("Breathe", ["step_time", "steps"])                 # Fade 0 -> 1 -> 0 in `steps` increments
+Pulse = namedtuple("Pulse", ["fade_in_time", "fade_out_time"])          # Same fade, generated by gpiozero's PWMLED.pulse()
 
+BLUE_BREATHE = Breathe(step_time=0.01, steps=100)                       # Pouring water
+BLUE_PULSE = Pulse(fade_in_time=1.01, fade_out_time=1.01)               # Pouring water, offloaded
+YELLOW_AGITATE = Blink(on_time=0.5, off_time=0.5, active=10.0, every=30.0)  # Blinks for 10 seconds every 30 seconds
+YELLOW_BLINK = Blink(on_time=0.5, off_time=0.5, active=None, every=None)   # One agitation window of a recipe timeline
+GREEN_BLINK = Blink(on_time=0.4, off_time=0.4, active=None, every=None)     # Paused
 
-def cleanup():
-    """Ensure all LED resources are released and threads stop.
 
-    The GPIOZero objects are closed after explicitly stopping any
-    background animation loops so that pins are reset even if the
-    program exits due to a KeyboardInterrupt.
-    """
+class _Slot:
+    """Playback state of the pattern currently assigned to one LED."""
 
-    leds_off()
-    yellow.close()
-    green.close()
-    blue.close()
+    def __init__(self, led, steps, end, pausable):
+        self.led = led
+        self.steps = steps          # Iterator of (value, hold) pairs
+        self.end = end              # Monotonic time the pattern stops, or None
+        self.pausable = pausable
+        self.deadline = None        # When the next step is due
+        self.token = None           # Sequence number of the live queue entry
+        self.value = None           # Value currently shown (restored after a pause)
 
 
-def leds_off():
-    """Stop any running LED threads and power everything down."""
+_wake = threading.Condition()   # Guards everything below and wakes the engine early
+_slots = {}                     # led -> _Slot
+_queue = []                     # Heap of (deadline, seq, slot); stale entries are skipped
+_seq = count()
+_paused_at = None
+_engine = None
+_running = False
+_dirty = False                  # Set by _notify() so the engine re-plans after a change
+_async_wake = None              # asyncio.Event while the engine runs as a task (see run_engine())
+_async_loop = None
 
-    global stop_flag, green_blink_flag, pause_flag
-    stop_flag = True
-    green_blink_flag = False
-    pause_flag = False
-    yellow.off()
-    blue.off()
-    green.off()
 
+def init():
+    """Build the LED devices. Call once before any pattern is played; later calls do nothing."""
 
-def rerun_stop_flag():
-    """Reset the stop flag to allow LED animation threads to resume."""
+    global blue, yellow, green
+    with _wake:
+        if blue is not None:
+            return
+        hardware.setup_gpio()
+        blue = PWMLED(17)
+        yellow = LED(27)
+        green = LED(22)
 
-    global stop_flag
-    stop_flag = False
 
+# When True the blue breathing fade is handed to PWMLED.pulse() so the engine
+# only starts, pauses and stops it instead of stepping the PWM value itself.
+offload_breathe = True
 
-def pause_on():
-    """Pause all running LED animations while preserving their state."""
 
-    global pause_flag
-    pause_flag = True
+def _steps(pattern):
+    """Expand a pattern into an endless stream of (value, hold) pairs.
 
+    Args:
+        pattern (Solid, Blink, Breathe or Pulse): Pattern to expand.
 
-def pause_off():
-    """Resume all paused LED animations."""
+    Yields:
+        tuple: Output value (0-1, or a Pulse) and how long to hold it in seconds.
+    """
 
-    global pause_flag
-    pause_flag = False
+    if isinstance(pattern, Solid):
+        yield pattern.value, float("inf")
+
+    elif isinstance(pattern, Pulse):
+        yield pattern, float("inf")  # _show() starts the background fade
+
+    elif isinstance(pattern, Blink):
+        if pattern.active is None:
+            while True:
+                yield 1, pattern.on_time
+                yield 0, pattern.off_time
+
+        while True:
+            elapsed = 0.0
+            while elapsed < pattern.active:
+                hold = min(pattern.on_time, pattern.active - elapsed)
+                yield 1, hold
+                elapsed += hold
+                if elapsed >= pattern.active:
+                    break
+                hold = min(pattern.off_time, pattern.active - elapsed)
+                yield 0, hold
+                elapsed += hold
+            if pattern.every > elapsed:
+                yield 0, pattern.every - elapsed
+
+    elif isinstance(pattern, Breathe):
+        while True:
+            for i in range(0, pattern.steps + 1):
+                yield i / pattern.steps, pattern.step_time
+            for i in range(pattern.steps, -1, -1):
+                yield i / pattern.steps, pattern.step_time
+
+    else:
+        raise TypeError(f"Unknown LED pattern: {pattern!r}")
+
+
+def _show(led, value):
+    """Put a step's value on an LED. Call with _wake held.
 
+    Args:
+        led (LED or PWMLED): LED to drive.
+        value (float or Pulse): Brightness, or a Pulse to run in the PWM backend.
+    """
 
-def blue_threading(duration):
-    """Worker thread that fades the blue LED smoothly in and out for a specified duration.
+    if isinstance(value, Pulse):
+        led.pulse(fade_in_time=value.fade_in_time, fade_out_time=value.fade_out_time)
+    else:
+        led.value = value  # Also cancels a running pulse()
 
-    Implements a breathing animation with pause and stop signal support.
-    Used internally by blue_cycle(); do not call directly.
 
-    Args:
-        duration (float): How long to animate in seconds.
-    """
+def _schedule(slot, deadline):
+    """Queue the slot's next step. Call with _wake held."""
 
-    elapsed = 0.0
-    step_dt = 0.01
+    if slot.end is not None:
+        deadline = min(deadline, slot.end)
+    slot.deadline = deadline
+    slot.token = next(_seq)
+    if deadline != float("inf"):
+        heapq.heappush(_queue, (deadline, slot.token, slot))
 
-    while elapsed < duration and not stop_flag:
 
-        for i in range(0, 101):
-            if stop_flag or elapsed >= duration:
-                break
+def _advance(slot):
+    """Show the slot's next step, or finish it at its end time. Call with _wake held."""
 
+    if slot.end is not None and slot.deadline >= slot.end:
+        del _slots[slot.led]
+        slot.led.off()
+        return
 
-            while pause_flag and not stop_flag:
-                blue.off()
-                sleep(0.05)
-            if stop_flag:
-                break
+    value, hold = next(slot.steps)
+    _show(slot.led, value)
+    slot.value = value
+    _schedule(slot, slot.deadline + hold)
 
-            blue.value = i / 100
-            sleep(step_dt)
-            elapsed += step_dt
-            if elapsed >= duration:
-                break
 
+def _notify():
+    """Wake the engine, whether it runs as a thread or a task. Call with _wake held."""
 
-        for i in range(100, -1, -1):
-            if stop_flag or elapsed >= duration:
-                break
+    global _dirty
+    _dirty = True
+    _wake.notify()
+    if _async_wake is not None:
+        _async_loop.call_soon_threadsafe(_async_wake.set)
 
-            while pause_flag and not stop_flag:
-                blue.off()
-                sleep(0.05)
-            if stop_flag:
-                break
 
-            blue.value = i / 100
-            sleep(step_dt)
-            elapsed += step_dt
-            if elapsed >= duration:
-                break
+def _run_due():
+    """Apply every step that is due. Call with _wake held.
 
-    blue.off()
+    Returns:
+        float or None: Seconds until the next step, or None if nothing is queued.
+    """
 
+    now = clock.monotonic()
+    while _queue and _queue[0][0] <= now:
+        _, token, slot = heapq.heappop(_queue)
+        if _slots.get(slot.led) is not slot or slot.token != token:
+            continue  # Replaced, stopped or rescheduled since it was queued
+        if _paused_at is not None and slot.pausable:
+            continue  # pause_off() requeues it with the paused time added
+        _advance(slot)
 
-def blue_cycle(duration):
-    """Start a smooth breathing animation on the blue LED (active/current stage indicator).
+    return _queue[0][0] - now if _queue else None
 
-    Creates a daemon thread that fades the LED in and out continuously.
-    Respects pause and stop signals from the main thread.
+
+def _engine_loop():
+    """Engine thread: apply every due step, then sleep until the next deadline."""
+
+    global _dirty
+
+    with _wake:
+        while _running:
+            metrics.count(metrics.LED_WAKEUPS)
+            _dirty = False
+            clock.wait_for(_wake, lambda: _dirty, _run_due())
+
+
+async def run_engine():
+    """Run the LED engine as an asyncio task instead of a thread.
+
+    While the task runs, play_pattern() and friends schedule onto it and
+    no engine thread is started. Cancel the task to stop it.
+    """
+
+    global _async_wake, _async_loop
+    _async_loop = asyncio.get_running_loop()
+    _async_wake = asyncio.Event()
+
+    try:
+        while True:
+            metrics.count(metrics.LED_WAKEUPS)
+            _async_wake.clear()
+            with _wake:
+                timeout = _run_due()
+            try:
+                await asyncio.wait_for(_async_wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        with _wake:
+            _async_wake = None
+            _async_loop = None
+
+
+def _ensure_engine():
+    """Start the engine thread on first use. Call with _wake held."""
+
+    global _engine, _running
+    if _async_wake is not None:
+        return  # run_engine() is serving the queue
+    if _engine and _engine.is_alive():
+        return
+    _running = True
+    _engine = threading.Thread(target=_engine_loop, daemon=True)
+    _engine.start()
+
+
+def play_pattern(led, pattern, duration=None, pausable=True):
+    """Run a pattern on an LED, replacing whatever it was showing.
 
     Args:
-        duration (float): How long to animate in seconds.
+        led (LED or PWMLED): LED to drive.
+        pattern (Solid, Blink, Breathe or Pulse): Pattern to show.
+        duration (float or None): Seconds of (unpaused) playback before the LED
+            turns off. None plays until stopped.
+        pausable (bool): Whether pause_on() freezes and darkens this pattern.
 
     Returns:
-        threading.Thread: The animation thread (daemon).
+        threading.Thread or None: The LED engine thread (daemon), or None while
+        run_engine() drives the patterns.
     """
-    rerun_stop_flag()
-    t = threading.Thread(target=blue_threading, args=(duration,))
-    t.daemon = True
-    t.start()
-    return t
 
+    with _wake:
+        _ensure_engine()
+        now = clock.monotonic()
+        slot = _Slot(led, _steps(pattern), None if duration is None else now + duration, pausable)
+        _slots[led] = slot
+        slot.deadline = now
+        if _paused_at is None or not pausable:
+            _advance(slot)
+        else:
+            led.off()
+        _notify()
+        return _engine
 
-def yellow_threading(duration):
-    """Worker thread that blinks the yellow LED for a specified duration.
 
-    Implements a 30-second cycle with 10 seconds of blinking followed by
-    20 seconds off. Respects pause and stop signals. Used internally by
-    yellow_cycle(); do not call directly.
+def stop_pattern(led):
+    """Stop any pattern on an LED and turn it off.
 
     Args:
-        duration (float): How long to animate in seconds.
+        led (LED or PWMLED): LED to stop.
     """
 
-    elapsed = 0.0
-    last = monotonic()
+    with _wake:
+        _slots.pop(led, None)
+        led.off()
+        _notify()
+
 
-    while elapsed < duration and not stop_flag:
-        now = monotonic()
+def cleanup():
+    """Ensure all LED resources are released and threads stop.
+
+    The GPIOZero objects are closed after explicitly stopping the
+    engine thread so that pins are reset even if the program exits
+    due to a KeyboardInterrupt.
+    """
 
-        if pause_flag:
+    global _running
+    leds_off()
+    with _wake:
+        _running = False
+        _notify()
+    if _engine and _engine.is_alive():
+        _engine.join(timeout=1.5)
+    if blue is not None:
+        yellow.close()
+        green.close()
+        blue.close()
+
+
+def leds_off():
+    """Stop every LED pattern and power everything down."""
+
+    global _paused_at
+    with _wake:
+        _slots.clear()
+        _queue.clear()
+        _paused_at = None
+        if blue is not None:
             yellow.off()
-            last = now
-            sleep(0.05)
-            continue
+            blue.off()
+            green.off()
+        _notify()
+
+
+def pause_on():
+    """Pause all running LED animations while preserving their state."""
 
-        dt = now - last
-        if dt < 0:
-            dt = 0
-        elapsed += dt
-        last = now
+    global _paused_at
+    with _wake:
+        if _paused_at is not None:
+            return
+        _paused_at = clock.monotonic()
+        for slot in _slots.values():
+            if slot.pausable:
+                slot.led.off()
 
-        if elapsed >= duration:
-            break
 
-        cycle_pos = elapsed % 30.0
+def pause_off():
+    """Resume all paused LED animations."""
 
-        if cycle_pos < 10.0:
-            yellow.on()
-            sleep(0.5)
-            if stop_flag or pause_flag:
+    global _paused_at
+    with _wake:
+        if _paused_at is None:
+            return
+        paused_for = clock.monotonic() - _paused_at
+        _paused_at = None
+        for slot in _slots.values():
+            if not slot.pausable:
                 continue
-            yellow.off()
-            sleep(0.5)
-        else:
-            yellow.off()
-            sleep(0.1)
+            if slot.end is not None:
+                slot.end += paused_for
+            if slot.value is not None:
+                _show(slot.led, slot.value)
+            _schedule(slot, slot.deadline + paused_for)
+        _notify()
+
+
+def blue_cycle(duration):
+    """Start a smooth breathing animation on the blue LED (active/current stage indicator).
 
-    yellow.off()
+    Fades the LED in and out continuously. With offload_breathe set the fade is
+    generated by gpiozero's pulse() and the shared LED engine thread only wakes
+    to pause, resume or end it; otherwise the engine steps the PWM value itself.
+    Respects pause and stop signals from the main thread.
+
+    Args:
+        duration (float): How long to animate in seconds.
+
+    Returns:
+        threading.Thread: The LED engine thread (daemon).
+    """
+    return play_pattern(blue, BLUE_PULSE if offload_breathe else BLUE_BREATHE, duration)
 
 
 def yellow_cycle(duration):
     """Start a blinking pattern on the yellow LED (warning/caution indicator).
 
-    Creates a daemon thread that blinks in 30-second cycles (10s on, 20s off).
+    Runs on the shared LED engine thread in 30-second cycles (10s blinking, 20s off).
     Respects pause and stop signals from the main thread.
 
     Args:
         duration (float): How long to animate in seconds.
 
     Returns:
-        threading.Thread: The animation thread (daemon).
+        threading.Thread: The LED engine thread (daemon).
+    """
+    return play_pattern(yellow, YELLOW_AGITATE, duration)
+
+
+def agitate(duration):
+    """Blink the yellow LED for one agitation window of a recipe timeline.
+
+    Unlike yellow_cycle(), which repeats its own 10-in-30 s rhythm, the
+    timeline decides when each window starts and how long it lasts.
+
+    Args:
+        duration (float): Length of the window in seconds.
+
+    Returns:
+        threading.Thread: The LED engine thread (daemon).
     """
-    rerun_stop_flag()
-    t = threading.Thread(target=yellow_threading, args=(duration,))
-    t.daemon = True
-    t.start()
-    return t
+    return play_pattern(yellow, YELLOW_BLINK, duration)
 
 
 def green_cycle():
@@ -203,9 +401,7 @@ def green_cycle():
     Stops any blinking animation and sets the LED to solid on.
     """
 
-    global green_blink_flag
-    green_blink_flag = False
-    green.on()
+    play_pattern(green, Solid(1), pausable=False)
 
 
 def green_done():
@@ -214,36 +410,21 @@ def green_done():
     Stops any blinking animation and powers off the LED.
     """
 
-    global green_blink_flag
-    green_blink_flag = False
-    green.off()
+    stop_pattern(green)
 
 
 def green_blink():
     """Start a steady blinking pattern on the green LED (ready/completion indicator).
 
-    Creates a daemon thread that blinks the LED at 0.4-second intervals.
-    The blink continues until green_blink_stop() is called.
+    Blinks the LED at 0.4-second intervals on the shared LED engine thread.
+    The blink keeps going while other animations are paused and continues
+    until green_blink_stop() is called.
 
     Returns:
-        threading.Thread: The blinking animation thread (daemon).
+        threading.Thread: The LED engine thread (daemon).
     """
 
-    global green_blink_flag
-    green_blink_flag = True
-
-    def _blink():
-        while green_blink_flag:
-            green.on()
-            sleep(0.4)
-            green.off()
-            sleep(0.4)
-        green.off()
-
-    t = threading.Thread(target=_blink)
-    t.daemon = True
-    t.start()
-    return t
+    return play_pattern(green, GREEN_BLINK, pausable=False)
 
 
 def green_blink_stop():
@@ -251,6 +432,4 @@ def green_blink_stop():
 
     Halts any active blinking animation and powers off the LED.
     """
-    global green_blink_flag
-    green_blink_flag = False
-    green.off()
+    stop_pattern(green)
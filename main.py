@@ -1,90 +1,373 @@
 #main.py
 
+import sys
 import time
+import asyncio
+import clock
+import dashboard
+import hardware
 from interfacing import UI
 from stages import Stages
+import journal
 import ledcontrol
+import metrics
+import multitank
+import recipes
 import relaycontrol
+import sessiondb
+import tempcontrol
 
-def main():
+def dump_metrics():
+    """Print the hot-path metrics of the session that just ended and start afresh."""
+    if metrics.enabled:
+        print(metrics.format_summary())
+        metrics.reset()
+
+def start_hardware():
+    """
+    Brings the hardware up with the slow parts overlapped, one thread each: the LCD
+    and buttons (the welcome screen is drawn as soon as the LCD answers), the LED and
+    relay outputs, and the 1-Wire bus (modprobe only if needed, then probe discovery).
+
+    Returns:
+        UI: The user interface, showing the welcome screen.
+    """
+    def display():
+        ui = UI()
+        ui.welcome_screen()
+        return ui
+
+    def outputs():
+        ledcontrol.init()
+        relaycontrol.init()
+
+    ui, _, _ = hardware.bring_up(display, outputs, tempcontrol.init)
+    return ui
+
+def use_setpoint(recipe):
+    """Regulate the bath at the recipe's setpoint, or at the default one if it has none."""
+    relaycontrol.configure(setpoint=relaycontrol.DEFAULT_SETPOINT_C if recipe.setpoint_c is None else recipe.setpoint_c)
+
+def missed_time(recovery):
+    """Seconds the film has kept developing since the journal's last record, 0 if it was paused."""
+    return 0.0 if recovery.paused else max(0.0, time.time() - recovery.wall_time)
+
+def recover_session(ui, session_journal, recipe, compensate):
+    """
+    Looks for a session left unfinished by a crash or reboot in the journal and offers
+    to resume it. A stage that was running continues where its last record left it,
+    plus the time the controller was down and the prompt was up, unless it was paused,
+    since the film kept developing meanwhile. Starting over deletes the journal.
+    The bath is regulated at the recovered recipe's setpoint while the prompt waits.
+
+    Args:
+        ui (UI): The user interface.
+        session_journal (journal.Journal): Journal of the session.
+        recipe (recipes.Recipe or None): Process asked for on the command line.
+        compensate (bool): Compensation asked for on the command line.
+
+    Returns:
+        tuple: (stages, last_stage, resume). resume is (stage, offset, equivalent)
+        for a stage to continue right away, or None.
+    """
+    recovery = journal.recover(session_journal.path)
+    if recovery is not None:
+        loaded, _ = recipes.load_recipes()
+        if recovery.recipe in loaded:
+            stages = Stages(ui, loaded[recovery.recipe], recovery.compensate, session_journal)
+            use_setpoint(stages.recipe)
+            if recovery.dev_seconds is not None:
+                stages.set_dev_settings(recovery.dev_seconds, recovery.dev_level)
+
+            last_stage, remaining = recovery.last_stage, None
+            if recovery.stage is not None:
+                missed = missed_time(recovery)
+                remaining = stages.stage_remaining(recovery.stage, recovery.offset + missed,
+                                                   None if recovery.equivalent is None else recovery.equivalent + missed)
+                if remaining <= 0:
+                    last_stage = recovery.stage  # It ran out while the controller was down
+
+            next_stage = recovery.stage if remaining else stages.next_stage(last_stage)
+            if next_stage is not None and ui.resume_prompt(next_stage, remaining or None):
+                session_journal.reopen()
+                sessiondb.reopen(recovery.history)
+                tempcontrol.session_running = True
+
+                resume = None
+                if remaining:
+                    missed = missed_time(recovery)  # Now, so the time the prompt was up counts too
+                    offset = recovery.offset + missed
+                    equivalent = None if recovery.equivalent is None else recovery.equivalent + missed
+                    if stages.stage_remaining(recovery.stage, offset, equivalent) > 0:
+                        resume = (recovery.stage, offset, equivalent)
+                    else:
+                        last_stage = recovery.stage  # It ran out while the prompt was up
+                return stages, last_stage, resume
+
+        session_journal.discard()
+
+    return Stages(ui, recipe, compensate, session_journal), None, None
+
+def begin_stage(stages, session_journal, last_stage, choice):
+    """
+    Checks a stage button press against the forced stage order, and opens the session's
+    records when it starts the first stage.
+
+    Returns:
+        bool or None: True to run the stage, False for the wrong button, None once
+        the recipe has no stage left.
+    """
+    correct = stages.next_stage(last_stage)
+    if correct is None:
+        return None
+    if choice != correct:
+        return False
+    if last_stage is None:
+        history_id = sessiondb.begin(stages.recipe.name, stages.compensate)
+        session_journal.begin(stages.recipe.name, stages.compensate, history_id)
+        tempcontrol.session_running = True
+    return True
+
+def end_stage(stages, session_journal, choice):
+    """
+    Closes the session's records if choice was the recipe's last stage.
+
+    Returns:
+        bool: True if the session is over.
+    """
+    if stages.next_stage(choice) is not None:
+        return False
+    session_journal.end()
+    sessiondb.end()
+    tempcontrol.session_running = False
+    return True
+
+def shut_down(ui, session_journal):
+    """Closes the session's records, prints the reports and releases the hardware."""
+    session_journal.close()
+    sessiondb.stop()
+    print(relaycontrol.format_report())
+    dump_metrics()
+    dashboard.stop()
+    relaycontrol.stop()
+    tempcontrol.cleanup()
+    ui.cleanup()
+    ledcontrol.leds_off()
+
+def run_tanks(ui, recipe, compensate, tanks):
+    """
+    Multi-tank loop used by main() when more than one tank is asked for. After the
+    welcome screen every tank gets its dev settings, then multitank.run() drives all
+    of them at once until they are done. Runs until Ctrl+C.
+    """
+    first = True
+    while True:
+        ui.welcome_screen()
+        ui.wait_for_button(flush=not first)  # The welcome screen is up before the loop starts
+        first = False
+        tempcontrol.session_running = True
+        multitank.run(ui, multitank.create_sessions(ui, tanks, recipe, compensate))
+        tempcontrol.session_running = False
+        ui.end_screen()
+        dump_metrics()
+
+def main(recipe=None, compensate=False, tanks=1):
     """
     This function intializes the user interface (UI) and the stage control (Stages)
     It starts the threading for the relay control, and forces the stage order so that
     the user cannot repeat or enter the wrong stage at any point. The stages are
-    continuous so the program can't be exited until all 4 have been completed, unless Ctrl+C
+    continuous so the program can't be exited until all of them have been completed, unless Ctrl+C
     is pressed.
-    """
-    ui = UI()
-    stages = Stages(ui)
 
+    Args:
+        recipe (recipes.Recipe or None): Process to run, the recipe file's default if None.
+        compensate (bool): Stretch or shrink the development time with the developer temperature.
+        tanks (int): Number of tanks developing at once, see multitank.py.
+    """
+    ui = start_hardware()
+    sessiondb.start()
+    tempcontrol.start()  # Before the resume prompt, which waits for a person: the bath must not go cold meanwhile
     relaycontrol.start()
+    session_journal = journal.Journal()
+    if tanks > 1:
+        stages, last_stage, resume = Stages(ui, recipe, compensate), None, None
+    else:
+        stages, last_stage, resume = recover_session(ui, session_journal, recipe, compensate)
+    use_setpoint(stages.recipe)
 
-    NEXT_STAGE = {#Dictionary that enforces strict stage order
-        None: 1,  # start -> dev
-        1: 2,     # dev -> stop
-        2: 3,     # stop -> fixer
-        3: 4,     # fixer -> photoflo
-        4: None   # photoflo -> done
-    }
+    if dashboard.enabled:
+        dashboard.start()
 
-    last_stage = None
+    started = resume is not None or last_stage is not None  # Until then presses on the welcome screen drawn during start-up count
 
     try:
-        ui.welcome_screen()
+        if tanks > 1:
+            run_tanks(ui, stages.recipe, compensate, tanks)
+
+        if last_stage is None:
+            ui.welcome_screen()
+        else:
+            ui.stage_done_screen()
 
         while True:
-            choice = ui.wait_for_button()
-            correct = NEXT_STAGE[last_stage]
+            if resume is not None:
+                choice, offset, equivalent = resume
+                resume = None
+            else:
+                choice = ui.wait_for_button(flush=started)
+                started = True
+                offset, equivalent = 0.0, None
+                valid = begin_stage(stages, session_journal, last_stage, choice)
 
-            if correct is None:
-                break
+                if valid is None:
+                    break
 
-            if choice != correct:
-                ui.clear()
-                ui.write_line("Invalid stage!", 2)
-                time.sleep(1)
-                ui.stage_done_screen()
-                continue
-
-            if choice == 1:
-                dev_seconds, choice_level = ui.development_settings(
-                    stages.dev_run_seconds,
-                    stages.push_pull_options,
-                    stages.dev_choice_level,
-                )
-                stages.set_dev_settings(dev_seconds, choice_level)
-
-                stages.wash_dev()
-                last_stage = 1
-                ui.stage_done_screen()
+                if not valid:
+                    ui.write_screen("", "Invalid stage!")
+                    clock.sleep(1)
+                    ui.stage_done_screen()
+                    continue
 
-            elif choice == 2:
-                stages.stopdev()
-                last_stage = 2
-                ui.stage_done_screen()
+                if choice == stages.dev_stage:
+                    dev_seconds, choice_level = ui.development_settings(
+                        stages.dev_run_seconds,
+                        stages.push_pull_options,
+                        stages.dev_choice_level,
+                    )
+                    stages.set_dev_settings(dev_seconds, choice_level)
 
-            elif choice == 3:
-                stages.wash_fix()
-                last_stage = 3
-                ui.stage_done_screen()
+            stages.run_stage(choice, offset, equivalent)
+            last_stage = choice
 
-            elif choice == 4:
-                stages.wash_photoflo()
-                last_stage = 4
+            if end_stage(stages, session_journal, choice):
                 ui.end_screen()
+                dump_metrics()
                 last_stage = None
                 ui.welcome_screen()
-                continue
+            else:
+                ui.stage_done_screen()
 
     except KeyboardInterrupt:
         pass
 
     finally:
-        relaycontrol.stop()
-        ui.cleanup()
-        ledcontrol.leds_off()
+        shut_down(ui, session_journal)
+
+
+async def main_async(recipe=None, compensate=False):
+    """
+    Asyncio version of main(). The session flow, stage timers and encoder
+    dialogs run on the event loop alongside temperature sampling, relay
+    control and the LED engine, which all run as tasks instead of threads.
+    Blocking sysfs and I2C I/O goes to executors. Ctrl+C cancels the tasks.
+
+    Args:
+        recipe (recipes.Recipe or None): Process to run, the recipe file's default if None.
+        compensate (bool): Stretch or shrink the development time with the developer temperature.
+    """
+    loop = asyncio.get_running_loop()
+    ui = await loop.run_in_executor(None, start_hardware)
+    sessiondb.start()  # A thread in both runtimes: SQLite calls block
+    tasks = [  # Running before the resume prompt, which waits for a person: the bath must not go cold meanwhile
+        asyncio.create_task(tempcontrol.run()),
+        asyncio.create_task(relaycontrol.run()),
+        asyncio.create_task(ledcontrol.run_engine()),
+    ]
+    session_journal = journal.Journal()
+    stages, last_stage, resume = await loop.run_in_executor(  # Before attach_loop(): the prompt reads the thread queue
+        None, recover_session, ui, session_journal, recipe, compensate)
+    ui.attach_loop(loop)
+    use_setpoint(stages.recipe)
+    if dashboard.enabled:
+        tasks.append(asyncio.create_task(dashboard.run()))
+
+    started = resume is not None or last_stage is not None  # Until then presses on the welcome screen drawn during start-up count
+
+    try:
+        await ui.run_lcd(ui.welcome_screen if last_stage is None else ui.stage_done_screen)
+
+        while True:
+            if resume is not None:
+                choice, offset, equivalent = resume
+                resume = None
+            else:
+                choice = await ui.wait_for_button_async(flush=started)
+                started = True
+                offset, equivalent = 0.0, None
+                valid = begin_stage(stages, session_journal, last_stage, choice)
+
+                if valid is None:
+                    break
+
+                if not valid:
+                    await ui.run_lcd(ui.write_screen, "", "Invalid stage!")
+                    await asyncio.sleep(1)
+                    await ui.run_lcd(ui.stage_done_screen)
+                    continue
+
+                if choice == stages.dev_stage:
+                    dev_seconds, choice_level = await ui.development_settings_async(
+                        stages.dev_run_seconds,
+                        stages.push_pull_options,
+                        stages.dev_choice_level,
+                    )
+                    stages.set_dev_settings(dev_seconds, choice_level)
+
+            await stages.run_stage_async(choice, offset, equivalent)
+            last_stage = choice
+
+            if end_stage(stages, session_journal, choice):
+                await ui.end_screen_async()
+                dump_metrics()
+                last_stage = None
+                await ui.run_lcd(ui.welcome_screen)
+            else:
+                await ui.run_lcd(ui.stage_done_screen)
+
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        shut_down(ui, session_journal)
+
+
+def option_value(flag):
+    """Return the command line argument following flag, exiting with a message if there is none."""
+    index = sys.argv.index(flag) + 1
+    if index >= len(sys.argv):
+        sys.exit(f"{flag} needs a value")
+    return sys.argv[index]
 
 
 if __name__ == "__main__":
-    main()
+    if "--pid" in sys.argv[1:]:
+        relaycontrol.configure(mode=relaycontrol.PID)
+    if "--metrics" in sys.argv[1:]:
+        metrics.enable()
+    if "--dashboard" in sys.argv[1:]:
+        dashboard.enable()
+
+    recipe = None
+    if "--recipe" in sys.argv[1:]:
+        loaded, _ = recipes.load_recipes()
+        name = option_value("--recipe")
+        if name not in loaded:
+            sys.exit(f"unknown recipe {name!r}, known recipes: {', '.join(loaded)}")
+        recipe = loaded[name]
+    compensate = "--compensate" in sys.argv[1:]
+    tanks = 1
+    if "--tanks" in sys.argv[1:]:
+        value = option_value("--tanks")
+        tanks = int(value) if value.isdigit() else 0
+        if not 1 <= tanks <= multitank.MAX_TANKS:
+            sys.exit(f"--tanks takes a number from 1 to {multitank.MAX_TANKS}, not {value!r}")
 
+    if "--asyncio" in sys.argv[1:]:
+        if tanks > 1:
+            sys.exit("--tanks runs on the threaded runtime, leave out --asyncio")
+        try:
+            asyncio.run(main_async(recipe, compensate))
+        except KeyboardInterrupt:
+            pass
+    else:
+        main(recipe, compensate, tanks)
@@ -0,0 +1,177 @@
+# metrics.py
+# Opt-in hot-path instrumentation: fixed-bucket latency histograms and event counters.
+# Off by default; turn it on with FILMDEV_METRICS=1 or `python3 main.py --metrics`.
+# While disabled every recording call returns straight away.
+
+import os
+import time
+import threading
+from bisect import bisect_left
+from functools import wraps
+
+enabled = os.environ.get("FILMDEV_METRICS", "") not in ("", "0")
+
+# Histogram bucket upper bounds in milliseconds. Anything slower lands in a final overflow bucket
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# Histograms
+TICK_LATENESS = "tick_lateness"      # How late each one-second timer tick was drawn
+TICK_DRAW = "tick_draw"              # Time the timer spends posting a tick to the LCD renderer
+BUTTON_REACTION = "button_reaction"  # From a button event to the timer acting on it
+SENSOR_READ = "sensor_read"          # One tempcontrol.sample() over every probe
+RELAY_DECISION = "relay_decision"    # One relaycontrol.update_heater()
+LCD_WRITE = "lcd_write"              # One cursor move and the characters after it, sent by UI.write_line()
+
+# Counters
+LCD_COMMANDS = "lcd_commands"        # Cursor moves sent by UI.write_line()
+LCD_CHARS = "lcd_chars"              # Characters sent by UI.write_line()
+LCD_RENDERS = "lcd_renders"          # Renders of posted lines; posts beyond this were coalesced
+LED_WAKEUPS = "led_wakeups"          # LED engine iterations
+TEMP_WAKEUPS = "temp_wakeups"        # Temperature sampler iterations
+TEMP_REJECTED = "temp_rejected"      # Sensor readings dropped by the filter as glitches or spikes
+RELAY_WAKEUPS = "relay_wakeups"      # Heater control iterations
+
+
+class Histogram:
+    """Latency histogram with fixed buckets, so recording is one bisect and an add.
+
+    Args:
+        buckets_ms (tuple): Sorted bucket upper bounds in milliseconds.
+    """
+
+    __slots__ = ("bounds", "counts", "count", "total", "max")
+
+    def __init__(self, buckets_ms=BUCKETS_MS):
+        self.bounds = tuple(b / 1000.0 for b in buckets_ms)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction):
+        """Return the upper bound of the bucket holding the given fraction of samples.
+
+        Args:
+            fraction (float): 0-1, e.g. 0.99 for the 99th percentile.
+
+        Returns:
+            float or None: Seconds, the observed maximum for the overflow
+            bucket, or None if nothing was recorded.
+        """
+        if self.count == 0:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for bound, bucket_count in zip(self.bounds, self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+_lock = threading.Lock()
+_histograms = {}  # Name -> Histogram
+_counters = {}    # Name -> int
+
+
+def enable(on=True):
+    """Turn recording on or off. Already recorded figures are kept."""
+    global enabled
+    enabled = bool(on)
+
+
+def reset():
+    """Forget every recorded figure, e.g. at the start of a new session."""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def observe(name, seconds):
+    """Record one latency in the named histogram.
+
+    Args:
+        name (str): Histogram name, e.g. TICK_LATENESS.
+        seconds (float): Measured latency. Negative values count as 0.
+    """
+    if not enabled:
+        return
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.observe(max(0.0, seconds))
+
+
+def count(name, n=1):
+    """Add n to the named counter."""
+    if not enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def timed(name):
+    """Decorator that records each call's duration in the named histogram.
+
+    Durations are measured with time.perf_counter(), so they are real CPU
+    and I/O time even when the controller runs on a simulated clock.
+    """
+
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - started)
+        return wrapper
+
+    return decorate
+
+
+def summary():
+    """Return a snapshot of everything recorded.
+
+    Returns:
+        dict: "histograms" maps each name to count, mean, p50, p90, p99 and
+        max in seconds; "counters" maps each name to its value.
+    """
+    with _lock:
+        histograms = {
+            name: {
+                "count": h.count,
+                "mean": h.total / h.count if h.count else None,
+                "p50": h.percentile(0.50),
+                "p90": h.percentile(0.90),
+                "p99": h.percentile(0.99),
+                "max": h.max,
+            }
+            for name, h in sorted(_histograms.items())
+        }
+        counters = dict(sorted(_counters.items()))
+    return {"histograms": histograms, "counters": counters}
+
+
+def format_summary():
+    """Returns summary() as printable lines of text, latencies in milliseconds."""
+    report = summary()
+    lines = ["Metrics:"]
+    for name, h in report["histograms"].items():
+        lines.append(f"  {name:<16} n={h['count']:<6} mean {h['mean'] * 1000:8.2f}  p50 <={h['p50'] * 1000:8.2f}  "
+                     f"p90 <={h['p90'] * 1000:8.2f}  p99 <={h['p99'] * 1000:8.2f}  max {h['max'] * 1000:8.2f} ms")
+    for name, value in report["counters"].items():
+        lines.append(f"  {name:<16} {value}")
+    if len(lines) == 1:
+        lines.append("  nothing recorded")
+    return "\n".join(lines)
@@ -0,0 +1,266 @@
+# multitank.py
+# Several tanks developing at once in the same water bath. Each tank runs its whole
+# recipe as one timeline; the temperature sampler and heater loop are shared, the
+# LCD is split between the tanks, and their cues (pour, agitate, done) wait in one
+# queue until the user has seen them.
+
+import math
+from collections import deque, namedtuple
+import clock
+import ledcontrol
+import recipes
+import tempcontrol
+from interfacing import PRESS, HOLD, KNOB
+from stages import Stages
+
+MAX_TANKS = 4      # One stage button per tank: press to start it, hold to pause it
+TANK_ROWS = 3      # LCD lines for tank rows; the fourth shows the alert queue
+PAGE_S = 4.0       # With more tanks than rows, each page of rows is shown this long
+ALERT_MIN_S = 3.0  # Shortest time an alert stays on screen, so none flashes past unseen
+
+# Alert kinds
+POUR = "pour"        # A step begins: pour the next chemical (or water)
+AGITATE = "agitate"  # An agitation window begins; it lapses once the window is over
+DONE = "done"        # The tank has finished its recipe
+
+Alert = namedtuple("Alert", ["tank", "kind", "text", "expires"])  # expires: clock time an AGITATE lapses, else None
+
+ALERT_LEDS = {  # Alert kind waiting in the queue -> (ledcontrol LED name, pattern)
+    POUR: ("blue", ledcontrol.BLUE_PULSE),
+    AGITATE: ("yellow", ledcontrol.YELLOW_BLINK),
+    DONE: ("green", ledcontrol.GREEN_BLINK),
+}
+
+
+class TankSession:
+
+    """
+    One tank: its own recipe timeline, dev settings, pause state and
+    compensation, built from a Stages object that never drives the LEDs or
+    the screen itself. poll() turns the events that come due into alerts.
+
+    Args:
+        number (int): Tank number, also the button that starts and pauses it.
+        stages (Stages): Recipe, dev settings and compiled stage timelines.
+    """
+
+    def __init__(self, number, stages):
+        self.number = number
+        self.stages = stages
+        self.timeline = recipes.chain_stages(stages.timelines[n] for n in range(1, stages.stage_count + 1))
+        self.playback = None   # Playback once started
+        self.paused_at = None  # Timestamp of the pausing HOLD event
+        self.done = False
+
+    @property
+    def running(self):
+        return self.playback is not None and self.paused_at is None and not self.done
+
+    def start(self):
+        """Start the tank's timeline now."""
+        self.playback = self.stages.start_playback(self.timeline)
+
+    def toggle_pause(self, timestamp):
+        """Pause a running tank, or resume a paused one.
+
+        Args:
+            timestamp (float): ButtonEvent.timestamp of the HOLD that asked for it.
+        """
+        if self.playback is None or self.done:
+            return
+        if self.paused_at is None:
+            self.paused_at = timestamp
+        else:
+            self.playback.pause(timestamp - self.paused_at)
+            self.paused_at = None
+
+    def poll(self, now):
+        """Apply every event that is due and return the alerts it raises.
+
+        Args:
+            now (float): clock.monotonic().
+
+        Returns:
+            list: Alert tuples, oldest first.
+        """
+        alerts = []
+        if not self.running:
+            return alerts
+
+        event = self.playback.pop_due(now)
+        while event is not None:
+            if event.kind == recipes.STEP_START:
+                alerts.append(Alert(self.number, POUR, f"T{self.number} pour {event.label.strip()}", None))
+            elif event.kind == recipes.AGITATE:
+                alerts.append(Alert(self.number, AGITATE, f"T{self.number} agitate", self.playback.start + event.end))
+            elif event.kind == recipes.STAGE_END and self.playback.finished:
+                self.done = True
+                alerts.append(Alert(self.number, DONE, f"T{self.number} done", None))
+            event = self.playback.pop_due(now)
+
+        if self.playback.step is not None:
+            self.playback.track(tempcontrol.get_temp(self.stages.compensation_probe), now)
+        return alerts
+
+    def deadline(self):
+        """Return when poll() or the countdown next needs attention, or None."""
+        if not self.running:
+            return None
+        deadline = self.playback.next_time()
+        if self.playback.step is not None:
+            step_end = self.playback.step_end()
+            remaining = max(0, math.ceil(step_end - clock.monotonic()))
+            deadline = min(deadline, step_end - (remaining - 1))
+        return deadline
+
+    def row(self, now):
+        """Return the tank's 20 character status line."""
+        if self.playback is None:
+            return f"{self.number} press {self.number} to start"
+        if self.done:
+            return f"{self.number} done"
+
+        step = self.playback.step
+        if step is None:
+            label, left = "", "--:--"
+        else:
+            reference = self.paused_at if self.paused_at is not None else now
+            mins, secs = divmod(max(0, math.ceil(self.playback.step_end() - reference)), 60)
+            label, left = step.label.strip(), f"{mins:02}:{secs:02}"
+        return f"{self.number} {label[:11]:<11} {left}{'P' if self.paused_at is not None else ''}"
+
+
+def create_sessions(ui, count, recipe, compensate=False):
+    """Build the tank sessions, asking for each tank's dev settings on the encoder.
+
+    Args:
+        ui (UI): Shared display and buttons.
+        count (int): Number of tanks, at most MAX_TANKS.
+        recipe (recipes.Recipe): Process every tank runs.
+        compensate (bool): Compensate each tank's development time for temperature.
+
+    Returns:
+        list: TankSession objects numbered from 1.
+    """
+    sessions = []
+    for number in range(1, count + 1):
+        stages = Stages(ui, recipe, compensate)
+        if stages.dev_stage is not None:
+            ui.write_screen("", f"Tank {number} settings".center(20))
+            clock.sleep(1)
+            dev_seconds, choice_level = ui.development_settings(
+                stages.dev_run_seconds,
+                stages.push_pull_options,
+                stages.dev_choice_level,
+            )
+            stages.set_dev_settings(dev_seconds, choice_level)
+        sessions.append(TankSession(number, stages))
+    return sessions
+
+
+def _show_alert_leds(kinds, showing):
+    """Light the LED of every alert kind waiting in the queue; returns the new set of kinds shown."""
+    kinds = frozenset(kinds)
+    for kind in showing - kinds:
+        ledcontrol.stop_pattern(getattr(ledcontrol, ALERT_LEDS[kind][0]))
+    for kind in kinds - showing:
+        name, pattern = ALERT_LEDS[kind]
+        ledcontrol.play_pattern(getattr(ledcontrol, name), pattern, pausable=False)
+    return kinds
+
+
+def _queue_alert(alerts, alert):
+    """Add an alert to the queue. A tank's new step or finish supersedes its pour alerts still waiting."""
+    if alert.kind in (POUR, DONE):
+        for waiting in [a for a in alerts if a.tank == alert.tank and a.kind == POUR]:
+            alerts.remove(waiting)  # The step it asked for has already begun
+    alerts.append(alert)
+
+
+def _drop_lapsed(alerts, now, head, shown_since):
+    """Remove the agitation alerts whose window is over, without showing them.
+
+    Only the alert on screen (head, shown since shown_since) stays until it
+    has been up for ALERT_MIN_S, so it does not flash past unseen.
+    """
+    for alert in [a for a in alerts if a.expires is not None and now >= a.expires]:
+        if alert is not head or now - shown_since >= ALERT_MIN_S:
+            alerts.remove(alert)
+
+
+def run(ui, sessions):
+    """Run several tank sessions at once until every tank is done.
+
+    Press a stage button to start its tank (start them whenever the
+    staggering calls for it), hold it to pause or resume that tank, and
+    press the encoder knob to acknowledge the alert on the bottom line.
+    Pour and done alerts stay until acknowledged, or until the same tank's
+    next pour or done alert replaces them. An agitation alert lapses once
+    its window is over, after ALERT_MIN_S if it is on screen by then. The
+    LEDs show every kind of alert waiting, not only the one on screen.
+
+    Args:
+        ui (UI): Shared display and buttons.
+        sessions (list): TankSession objects, numbered from 1.
+    """
+    if not 1 <= len(sessions) <= MAX_TANKS:
+        raise ValueError(f"Between 1 and {MAX_TANKS} tanks can run at once, got {len(sessions)}")
+
+    tanks = {session.number: session for session in sessions}
+    alerts = deque()
+    head = None         # Alert on the bottom line
+    shown_since = None  # When it was first shown
+    leds = frozenset()  # Alert kinds the LEDs are showing
+    pages = math.ceil(len(sessions) / TANK_ROWS)
+
+    ui.flush_events()
+    ledcontrol.leds_off()
+
+    while True:
+        now = clock.monotonic()
+        for session in sessions:
+            for alert in session.poll(now):
+                _queue_alert(alerts, alert)
+        _drop_lapsed(alerts, now, head, shown_since)
+        if not alerts:
+            head = shown_since = None
+        elif alerts[0] is not head:
+            head, shown_since = alerts[0], now
+
+        if not alerts and all(session.done for session in sessions):
+            break
+
+        leds = _show_alert_leds((alert.kind for alert in alerts), leds)
+
+        page = int(now // PAGE_S) % pages
+        for line in range(TANK_ROWS):
+            index = page * TANK_ROWS + line
+            ui.post_line(sessions[index].row(now) if index < len(sessions) else "", line + 1)
+        if alerts:
+            more = f" +{len(alerts) - 1}" if len(alerts) > 1 else ""
+            ui.post_line(f"{alerts[0].text[:20 - len(more)]:<{20 - len(more)}}{more}", 4)
+        else:
+            temp = tempcontrol.get_temp(tempcontrol.BATH_PROBE)
+            ui.post_line(f"Bath: {temp:4.1f} C" if temp is not None else "Bath: unknown", 4)
+
+        deadlines = [d for d in (session.deadline() for session in sessions) if d is not None]
+        if pages > 1:
+            deadlines.append((int(now // PAGE_S) + 1) * PAGE_S)
+        for alert in alerts:
+            if alert.expires is not None:
+                deadlines.append(max(shown_since + ALERT_MIN_S, alert.expires) if alert is head else alert.expires)
+        timeout = max(0.0, min(deadlines) - clock.monotonic()) if deadlines else None
+
+        event = ui.next_event(timeout=timeout)
+        if event is None:
+            continue
+
+        if event.kind == PRESS and event.button == KNOB and alerts:
+            alerts.popleft()  # The next alert is shown from the next pass
+        elif event.kind == PRESS and event.button in tanks and tanks[event.button].playback is None:
+            tanks[event.button].start()
+        elif event.kind == HOLD and event.button in tanks:
+            tanks[event.button].toggle_pause(event.timestamp)
+
+    _show_alert_leds((), leds)
+    ledcontrol.leds_off()
@@ -0,0 +1,217 @@
+# recipes.py
+# Development processes described as data. A recipe lists the steps of each stage
+# (one stage per button) and is compiled into a flat timeline of events that
+# Stages.play() steps through by deadline.
+
+import json
+from collections import namedtuple
+from pathlib import Path
+
+RECIPE_FILE = Path(__file__).resolve().parent / "recipes.json"
+
+DEV = "dev"        # Step duration placeholder: the development time chosen on the encoder
+LED_NAMES = ("blue", "yellow")
+MAX_STAGES = 4     # One stage per button
+STEP_GAP_S = 0.5   # Blank screen and dark LEDs between two steps
+LABEL_WIDTH = 20
+
+# Event kinds, in the order they apply when several fall on the same offset
+STEP_END = "step_end"        # Step time is up: LEDs off, screen cleared
+STAGE_START = "stage_start"  # Green LED off while the stage runs
+STEP_START = "step_start"    # New label and remaining time on the LCD, step LED started
+AGITATE = "agitate"          # Yellow LED blinks for one agitation window
+STAGE_END = "stage_end"      # Green LED on: stage done
+_KIND_ORDER = {STEP_END: 0, STAGE_START: 1, STEP_START: 2, AGITATE: 3, STAGE_END: 4}
+
+Step = namedtuple("Step", ["label", "duration", "led", "agitate"])  # agitate: None, ("every", active, every) or ("windows", ((start, length), ...))
+Recipe = namedtuple("Recipe", ["name", "title", "dev_time", "setpoint_c", "stages"])
+Event = namedtuple("Event", ["offset", "kind", "label", "end", "led", "dev"])  # Offsets in seconds from the start of the stage
+
+
+def _parse_agitate(spec, where):
+    """Turn a step's agitate entry into ("every", active, every) or ("windows", ((start, length), ...))."""
+    if spec is None:
+        return None
+    if isinstance(spec, dict):
+        active = float(spec["active"])
+        every = spec.get("every")
+        if active <= 0 or (every is not None and float(every) < active):
+            raise ValueError(f"{where}: agitate needs active > 0 and every >= active")
+        return ("every", active, None if every is None else float(every))
+    windows = tuple((float(start), float(length)) for start, length in spec)
+    if any(start < 0 or length <= 0 for start, length in windows):
+        raise ValueError(f"{where}: agitation windows need start >= 0 and length > 0")
+    return ("windows", windows)
+
+
+def _parse_step(spec, where):
+    duration = spec["duration"]
+    if duration != DEV:
+        duration = float(duration)
+        if duration <= 0:
+            raise ValueError(f"{where}: duration must be positive or \"{DEV}\"")
+    led = spec.get("led")
+    if led is not None and led not in LED_NAMES:
+        raise ValueError(f"{where}: unknown led {led!r}, expected one of {LED_NAMES}")
+    return Step(str(spec["label"]), duration, led, _parse_agitate(spec.get("agitate"), where))
+
+
+def parse_recipe(name, spec):
+    """Validate one recipe from the recipe file.
+
+    Args:
+        name (str): Recipe name, its key in the file.
+        spec (dict): title, dev_time, optional setpoint_c and stages, a list
+            of stages that are each a list of step dicts.
+
+    Returns:
+        Recipe: The parsed recipe.
+
+    Raises:
+        ValueError: If the recipe is malformed.
+    """
+    try:
+        stages = tuple(
+            tuple(_parse_step(step, f"recipe {name!r} stage {number} step {index}")
+                  for index, step in enumerate(stage, start=1))
+            for number, stage in enumerate(spec["stages"], start=1)
+        )
+        dev_time = float(spec.get("dev_time", 60))
+        setpoint = spec.get("setpoint_c")
+        setpoint = None if setpoint is None else float(setpoint)
+    except (KeyError, TypeError) as error:
+        raise ValueError(f"recipe {name!r} is malformed: {error!r}") from error
+
+    if not 1 <= len(stages) <= MAX_STAGES or not all(stages):
+        raise ValueError(f"recipe {name!r} needs 1-{MAX_STAGES} stages, each with at least one step")
+    if sum(step.duration == DEV for stage in stages for step in stage) > 1:
+        raise ValueError(f"recipe {name!r} has more than one \"{DEV}\" step")
+
+    return Recipe(name, str(spec.get("title", name)), dev_time, setpoint, stages)
+
+
+def load_recipes(path=RECIPE_FILE):
+    """Load and validate every recipe in a recipe file.
+
+    Args:
+        path (str or Path): JSON file with a "recipes" object and an optional
+            "default" recipe name.
+
+    Returns:
+        tuple: (recipes, default_name), recipes being a dict of name -> Recipe.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    recipes = {name: parse_recipe(name, spec) for name, spec in data["recipes"].items()}
+    default = data.get("default", next(iter(recipes)))
+    if default not in recipes:
+        raise ValueError(f"default recipe {default!r} is not in {path}")
+    return recipes, default
+
+
+def dev_stage(recipe):
+    """Return the stage number (1-based) holding the development step, or None."""
+    for number, stage in enumerate(recipe.stages, start=1):
+        if any(step.duration == DEV for step in stage):
+            return number
+    return None
+
+
+def stage_names(recipe):
+    """Return a short name for every stage, for the stage menu.
+
+    The stage holding the development step is "Dev"; any other stage is
+    named after the first word of its last step's label, e.g. "Fixing" for
+    "Fixing..." or "Blix".
+    """
+    dev = dev_stage(recipe)
+    return tuple("Dev" if number == dev else stage[-1].label.strip().partition(" ")[0].rstrip(".")
+                 for number, stage in enumerate(recipe.stages, start=1))
+
+
+def _agitation_windows(agitate, duration):
+    """Yield (start, length) agitation windows inside a step of the given duration."""
+    if agitate[0] == "windows":
+        windows = agitate[1]
+    else:
+        _, active, every = agitate
+        starts = [0.0]
+        while every is not None and starts[-1] + every < duration:
+            starts.append(starts[-1] + every)
+        windows = [(start, active) for start in starts]
+
+    for start, length in windows:
+        if start < duration:
+            yield start, min(length, duration - start)
+
+
+def compile_stage(steps, dev_seconds=None, dev_label=None, dev_stretch=1.0):
+    """Compile a stage's steps into its timeline.
+
+    Steps run back to back with STEP_GAP_S between them. Step durations are
+    rounded to whole seconds, as they are shown in MM:SS.
+
+    With dev_stretch above 1 the DEV step is laid out at its longest: its
+    agitation windows and every later event are placed as if it lasted
+    dev_seconds * dev_stretch, and the player pulls the later events back
+    once the real length is known (see compensation.py).
+
+    Args:
+        steps (tuple): Step tuples of the stage.
+        dev_seconds (float or None): Duration of a DEV step.
+        dev_label (str or None): LCD label for a DEV step, already 20 characters.
+        dev_stretch (float): Longest the DEV step may run, as a multiple of dev_seconds.
+
+    Returns:
+        tuple: Event tuples sorted by offset, starting with STAGE_START and
+        ending with STAGE_END.
+    """
+    events = [Event(0.0, STAGE_START, None, None, None, False)]
+    offset = 0.0
+
+    for index, step in enumerate(steps):
+        if index:
+            offset += STEP_GAP_S
+        dev = step.duration == DEV
+        if dev:
+            if dev_seconds is None:
+                raise ValueError("a development time is needed to compile this stage")
+            duration, label = int(round(dev_seconds * dev_stretch)), dev_label or step.label.center(LABEL_WIDTH)
+        else:
+            duration, label = int(round(step.duration)), step.label.center(LABEL_WIDTH)
+
+        end = offset + duration
+        events.append(Event(offset, STEP_START, label[:LABEL_WIDTH], end, step.led, dev))
+        if step.agitate:
+            for start, length in _agitation_windows(step.agitate, duration):
+                events.append(Event(offset + start, AGITATE, None, offset + start + length, None, dev))
+        events.append(Event(end, STEP_END, None, None, None, dev))
+        offset = end
+
+    events.append(Event(offset + STEP_GAP_S, STAGE_END, None, None, None, False))
+    events.sort(key=lambda event: (event.offset, _KIND_ORDER[event.kind]))
+    return tuple(events)
+
+
+def chain_stages(timelines):
+    """Join stage timelines back to back into one timeline.
+
+    Each stage starts as soon as the previous one's STAGE_END is applied,
+    which is how a tank session runs a whole recipe without waiting for a
+    button between stages.
+
+    Args:
+        timelines (iterable): Stage timelines from compile_stage(), in order.
+
+    Returns:
+        tuple: Event tuples sorted by offset.
+    """
+    events = []
+    base = 0.0
+    for timeline in timelines:
+        for event in timeline:
+            end = None if event.end is None else event.end + base
+            events.append(event._replace(offset=event.offset + base, end=end))
+        base += timeline[-1].offset
+    return tuple(events)
@@ -2,60 +2,322 @@
 # Controls heater relay using DS18B20 temperature readings from tempcontrol.py
 
 
+# Default target: 20.5°C (69°F) with a 1°C band, i.e. the original
 # Heater ON < 20°C (68°F)
 # Heater OFF > 21°C (70°F)
 
 from gpiozero import OutputDevice
+import hardware
+from collections import deque
 import threading
-import time
+import asyncio
+import clock
+import dashboard
+import metrics
 import tempcontrol
 
-HEAT_ON_C  = 20.0   # 68°F. I personally prefer celsius but here's the °F value for whoever uses that system
-HEAT_OFF_C = 21.0   # 70°F
+HYSTERESIS = "hysteresis"  # Bang-bang: on below the band, off above it
+PID = "pid"                # PI(D) duty, delivered by holding the relay on or off for long stretches
 
+# Configuration, changed through configure()
+control_mode = HYSTERESIS
+DEFAULT_SETPOINT_C = 20.5  # 69°F. I personally prefer celsius but here's the °F value for whoever uses that system
+setpoint_c = DEFAULT_SETPOINT_C  # Recipes with a setpoint_c of their own replace it
+band_c = 1.0        # Hysteresis width, centred on the setpoint. PID mode also cuts the heater above setpoint + band
 
-heater = OutputDevice(16, active_high=True, initial_value=False)
+KP = 1.0            # Duty per °C of error
+KI = 0.0001         # Duty per °C·s of accumulated error. Slow: the bath takes hours to settle
+KD = 0.0            # Duty per °C/s, on the measurement. 0 gives a PI controller
+DUTY_HOLD_S = 1200.0 # Heater-seconds the relay may run ahead of or behind the duty before it switches.
+                     # At a steady duty d it switches twice every DUTY_HOLD_S / (d * (1 - d)) seconds
+MIN_ON_S = 15.0     # Shortest on and off times, to spare the relay contacts
+MIN_OFF_S = 15.0
+
+CONTROL_PROBE = tempcontrol.BATH_PROBE  # The heater regulates the water bath, not the bottles or the tank
+WATCHDOG_S = 5.0    # Heater forced off once the bath reading is this much older than the sampling interval:
+                    # sampling stopped or the probe keeps failing
+
+
+heater = None  # OutputDevice on GPIO 16, built by init()
 stop_event = threading.Event()
 _worker = None
 
+_switches = deque()      # Monotonic times of relay switches during the last hour
+_started_at = None
+_last_switch = None
+_integral = 0.0
+_last_temp = None
+_last_time = None
+_duty_debt = 0.0         # Heater-seconds the relay owes the duty since it last switched, negative once ahead
+
+
+def init():
+
+    """Build the relay output, off. Called by start() and run(); later calls do nothing."""
+
+    global heater
+
+    if heater is None:
+        hardware.setup_gpio()
+        heater = OutputDevice(16, active_high=True, initial_value=False)
+    _publish_thresholds()
+
+
+def _publish_thresholds():
+
+    """Tell the sampler where the heater would switch next, so it samples fast around there."""
+
+    if control_mode == PID:
+        tempcontrol.thresholds_c = (setpoint_c + band_c,)  # The duty moves slowly; the overshoot cut is immediate
+    elif heater is not None and heater.is_active:
+        tempcontrol.thresholds_c = (setpoint_c + band_c / 2,)
+    else:
+        tempcontrol.thresholds_c = (setpoint_c - band_c / 2,)
+
+
+def configure(mode=None, setpoint=None, band=None):
+
+    """
+    Changes the control mode, setpoint or band. Arguments left as None keep
+    their current value. Switching mode resets the PID state.
+
+    Args:
+        mode (str or None): HYSTERESIS or PID.
+        setpoint (float or None): Target bath temperature in °C.
+        band (float or None): Band width in °C.
+    """
+
+    global control_mode, setpoint_c, band_c, _integral, _last_temp, _last_time, _duty_debt
+
+    if mode is not None and mode != control_mode:
+        if mode not in (HYSTERESIS, PID):
+            raise ValueError(f"Unknown heater control mode: {mode}")
+        control_mode = mode
+        _integral = _duty_debt = 0.0
+        _last_temp = _last_time = None
+    if setpoint is not None:
+        setpoint_c = float(setpoint)
+    if band is not None:
+        band_c = float(band)
+    _publish_thresholds()
+
+
+def _switch(on, now):
+
+    """Drive the relay, counting actual changes of state."""
+
+    global _last_switch
+
+    if on == heater.is_active:
+        return
+    if on:
+        heater.on()
+    else:
+        heater.off()
+    _last_switch = now
+    _switches.append(now)
+
+
+def _pid_duty(temp, now):
+
+    """
+    Returns the heater duty (0-1) for the next window. The integral only
+    accumulates while the output is unsaturated, or while the error pulls it
+    back out of saturation, so it cannot wind up during long warm-ups.
+    """
+
+    global _integral, _last_temp, _last_time
+
+    error = setpoint_c - temp
+    dt = now - _last_time if _last_time is not None else 0.0
+    derivative = (temp - _last_temp) / dt if dt > 0 else 0.0
+
+    proportional = KP * error
+    candidate = _integral + KI * error * dt
+    output = proportional + candidate - KD * derivative
+
+    if 0.0 <= output <= 1.0 or (output > 1.0 and error < 0) or (output < 0.0 and error > 0):
+        _integral = candidate
+
+    _last_temp = temp
+    _last_time = now
+    return min(1.0, max(0.0, proportional + _integral - KD * derivative))
+
+
+def _update_pid(temp, now):
+
+    """
+    Delivers the PID duty with as few relay switches as it can: the relay
+    holds its state while the heater-on time it owes the duty (or has run
+    ahead of it) since its last switch stays under DUTY_HOLD_S, so the
+    heater runs in long stretches whose average follows the duty. A
+    saturated duty switches at once, and minimum on/off times still apply.
+    """
+
+    global _duty_debt
+
+    dt = now - _last_time if _last_time is not None else 0.0
+    duty = _pid_duty(temp, now)
+    on = heater.is_active
+    _duty_debt += (duty - (1.0 if on else 0.0)) * dt
+
+    if temp > setpoint_c + band_c:  # Overshoot safety cut, whatever the duty says
+        want = False
+    elif duty >= 1.0 or duty <= 0.0:
+        want = duty >= 1.0
+    elif on:
+        want = _duty_debt > -DUTY_HOLD_S
+    else:
+        want = _duty_debt >= DUTY_HOLD_S
+
+    if want != on and _last_switch is not None and not temp > setpoint_c + band_c:
+        held = now - _last_switch
+        if held < (MIN_ON_S if on else MIN_OFF_S):
+            want = on
+
+    if want != on:
+        _duty_debt = 0.0
+    _switch(want, now)
+
+
+@metrics.timed(metrics.RELAY_DECISION)
 def update_heater():
 
     """
-    Updates the heater relay state based on the current temperature.
-    Heater turns ON below HEAT_ON_C
-    Heater turns OFF above HEAT_OFF_C
+    Updates the heater relay state based on the current bath temperature.
+    In HYSTERESIS mode the heater turns ON below setpoint - band/2 and OFF
+    above setpoint + band/2. In PID mode it follows a time-proportioned duty.
+    With no reading, or one more than WATCHDOG_S older than the sampling
+    interval, the heater is turned off.
     """
 
-    temp = tempcontrol.actual_temp
+    global _started_at
+
+    now = clock.monotonic()
+    if _started_at is None:
+        _started_at = now
+
+    reading = tempcontrol.readings.get(CONTROL_PROBE)
+    temp = reading.temp if reading and now - reading.timestamp <= tempcontrol.sample_interval + WATCHDOG_S else None
 
     if temp is None:
-        heater.off()
+        _switch(False, now)
+        tempcontrol.heater_on = False
+        if dashboard.enabled:
+            dashboard.publish(heater=False)
         return
 
-    if temp < HEAT_ON_C:
-        heater.on()
+    if control_mode == PID:
+        _update_pid(temp, now)
+
+    elif temp < setpoint_c - band_c / 2:
+        _switch(True, now)
+
+    elif temp > setpoint_c + band_c / 2:
+        _switch(False, now)
+
+    tempcontrol.heater_on = heater.is_active
+    _publish_thresholds()
+    if dashboard.enabled:
+        dashboard.publish(heater=heater.is_active)
+
+
+def control_report(window=900):
+
+    """
+    Returns the figures used to compare control modes: relay switches per
+    hour and how far the bath strayed from the setpoint.
+
+    Args:
+        window (int): History window in seconds for the stability figures.
+            Must be one of tempcontrol.HISTORY_WINDOWS.
+
+    Returns:
+        dict: mode, setpoint_c, switches_per_hour, max_deviation_c and
+        stddev_c (the last two are None without bath readings).
+    """
+
+    now = clock.monotonic()
+    while _switches and now - _switches[0] > 3600:
+        _switches.popleft()
+
+    elapsed = min(3600.0, now - _started_at) if _started_at is not None else 0.0
+    per_hour = len(_switches) * 3600.0 / elapsed if elapsed > 0 else 0.0
+
+    stats = tempcontrol.get_history(CONTROL_PROBE).stats(window)
+    if stats:
+        deviation = max(abs(stats.max - setpoint_c), abs(stats.min - setpoint_c))
+        stddev = stats.variance ** 0.5
+    else:
+        deviation = stddev = None
+
+    return {
+        "mode": control_mode,
+        "setpoint_c": setpoint_c,
+        "switches_per_hour": per_hour,
+        "max_deviation_c": deviation,
+        "stddev_c": stddev,
+    }
+
+
+def format_report(window=900):
+
+    """Returns control_report() as one line of text."""
+
+    report = control_report(window)
+    if report["max_deviation_c"] is None:
+        stability = "no bath readings"
+    else:
+        stability = f"±{report['max_deviation_c']:.2f} °C (σ {report['stddev_c']:.2f} °C) over {window // 60} min"
+    return (f"Heater {report['mode']}: setpoint {report['setpoint_c']:.1f} °C, "
+            f"{report['switches_per_hour']:.1f} switches/h, {stability}")
 
-    elif temp > HEAT_OFF_C:
-        heater.off()
 
 def _relay_loop():
+    seen = tempcontrol.sample_count
     while not stop_event.is_set():
+        metrics.count(metrics.RELAY_WAKEUPS)
         update_heater()
-        time.sleep(1)
+        seen = tempcontrol.wait_for_sample(seen, tempcontrol.sample_interval + WATCHDOG_S, stop_event)  # A timeout finds the reading stale
+
+async def run():
+
+    """
+    Heater control as an asyncio task: the same update on every new
+    sample as the thread started by start(), fed by tempcontrol.run().
+    Cancel the task to stop it, then call stop() to switch the heater off.
+    """
+
+    init()
+    samples = tempcontrol.subscribe()
+    try:
+        while True:
+            metrics.count(metrics.RELAY_WAKEUPS)
+            update_heater()
+            try:
+                await asyncio.wait_for(samples.get(), tempcontrol.sample_interval + WATCHDOG_S)
+            except asyncio.TimeoutError:
+                pass  # No sample: update_heater() finds the reading stale
+    finally:
+        tempcontrol.unsubscribe(samples)
 
 def start():
-    
+
     """
     Starts the heater control thread.
-    The thread runs continuously in the background and updates the relay
-    state once per second based on the latest temperature reading.
+    The thread sleeps on tempcontrol.new_sample and updates the relay
+    state as soon as each new temperature reading is published, so the
+    heater reacts within one conversion. If no sample arrives for
+    WATCHDOG_S past the sampling interval it wakes anyway and switches
+    the heater off.
     """
-    
+
     global _worker
 
     if _worker and _worker.is_alive():
         return _worker
 
+    init()
     stop_event.clear()
     _worker = threading.Thread(target=_relay_loop, daemon=True)
     _worker.start()
@@ -63,11 +325,13 @@ def start():
 
 
 def stop():
-    
+
     """Turn heater off on program exit."""
-    
+
     stop_event.set()
+    tempcontrol.wake_waiters()
     if _worker and _worker.is_alive():
         _worker.join(timeout=1.5)
-    heater.off()
-    heater.close()
+    if heater is not None:
+        heater.off()
+        heater.close()
@@ -1,26 +1,52 @@
-import time
 from gpiozero import RotaryEncoder, Button
+import clock
+import hardware
+
+# Velocity acceleration: a detent that comes less than this many seconds after
+# the previous one counts as that many steps. Slow turns move one step per detent.
+ACCELERATION = (
+    (0.025, 24),
+    (0.05, 12),
+    (0.1, 4),
+)
+
+
+def accelerated_steps(interval, table=ACCELERATION):
+    """Return how many steps one detent is worth after the given interval.
+
+    Args:
+        interval (float or None): Seconds since the previous detent, None for the first.
+        table (tuple): (interval, steps) pairs, shortest interval first.
+
+    Returns:
+        int: Steps for this detent, 1 for a slow turn.
+    """
+    if interval is not None:
+        for limit, steps in table:
+            if interval < limit:
+                return steps
+    return 1
 
 
 class RotaryControl:
 
     def __init__(self, pin_a=5, pin_b=6, button_pin=12, debounce=0.1):
+        hardware.setup_gpio()
         self.encoder = RotaryEncoder(pin_a, pin_b, max_steps=0, wrap=False)
         self.button = Button(button_pin, pull_up=True, bounce_time=debounce)
-        self._last_steps = self.encoder.steps
-
-    def delta(self):
-        current = self.encoder.steps
-        change = current - self._last_steps
-        self._last_steps = current
-        return change
+        self._last_detent = None  # clock.monotonic() of the previous detent
+        self.when_turned = None   # Called with the signed, accelerated steps of every detent
 
-    def is_pressed(self):
-        return self.button.is_pressed
+        self.encoder.when_rotated_clockwise = lambda: self._turned(1)
+        self.encoder.when_rotated_counter_clockwise = lambda: self._turned(-1)
 
-    def wait_for_press(self):
-        while not self.button.is_pressed:
-            time.sleep(0.02)
+    def _turned(self, direction):
+        """Scale one detent by the turning speed and report it. Runs on the gpiozero callback thread."""
+        now = clock.monotonic()
+        interval = now - self._last_detent if self._last_detent is not None else None
+        self._last_detent = now
+        if self.when_turned is not None:
+            self.when_turned(direction * accelerated_steps(interval))
 
     def close(self):
         self.encoder.close()
@@ -0,0 +1,351 @@
+# sessiondb.py
+# History of past sessions in SQLite: recipe, dev time and push/pull level, stage
+# events, and the temperature and heater profile of every probe while it ran.
+#
+# Nothing here blocks the timer or the heater. Session calls append a row to an
+# in-memory queue and return; one writer thread owns the database (in WAL mode)
+# and commits everything queued in a single transaction every FLUSH_S seconds and
+# when a session ends. Temperature samples are not queued at all: the writer
+# copies the new ones out of tempcontrol's history ring buffers when it flushes.
+# A flush that fails (disk full, locked database) is printed and tried again at
+# the next one; the session carries on either way.
+#
+# List past sessions with:  python3 sessiondb.py [--recipe bw] [--level 1] [--days 31]
+
+import os
+import sys
+import time
+import sqlite3
+import threading
+from collections import deque, namedtuple
+from pathlib import Path
+import clock
+import tempcontrol
+
+DB_FILE = Path(os.environ.get("FILMDEV_HISTORY_DB", Path(__file__).resolve().parent / "history.db"))
+FLUSH_S = 30.0  # Seconds between batched commits while nothing asks for one
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,  -- Wall-clock start in milliseconds
+    started REAL NOT NULL,
+    finished REAL,
+    recipe TEXT NOT NULL,
+    compensate INTEGER NOT NULL,
+    dev_seconds INTEGER,
+    push_pull INTEGER
+);
+CREATE INDEX IF NOT EXISTS sessions_by_recipe ON sessions (recipe, push_pull, started);
+CREATE INDEX IF NOT EXISTS sessions_by_start ON sessions (started);
+
+CREATE TABLE IF NOT EXISTS events (
+    session_id INTEGER NOT NULL,
+    t REAL NOT NULL,
+    kind TEXT NOT NULL,  -- stage_start, stage_end, pause, resume, dev, resumed
+    stage INTEGER,
+    value REAL
+);
+CREATE INDEX IF NOT EXISTS events_by_session ON events (session_id, t);
+
+CREATE TABLE IF NOT EXISTS samples (
+    session_id INTEGER NOT NULL,
+    t REAL NOT NULL,
+    probe TEXT NOT NULL,
+    temp REAL NOT NULL,
+    heater INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS samples_by_session ON samples (session_id, probe, t);
+"""
+
+Session = namedtuple("Session", ["id", "started", "finished", "recipe", "compensate", "dev_seconds", "push_pull"])
+
+# Queued operations, in the order they happened. Times are clock.monotonic()
+# and become wall time when written, the same way as the samples.
+_BEGIN = "begin"    # (id, t, recipe, compensate)
+_DEV = "dev"        # (id, t, seconds, level)
+_EVENT = "event"    # (id, t, kind, stage)
+_FINISH = "finish"  # (id, t)
+
+_queue = deque()         # Appends and pops are atomic, so producers never take a lock
+_session = None          # Id of the running session, None between sessions
+_flush_event = threading.Event()
+_stop_event = threading.Event()
+_worker = None
+
+
+def connect(path=DB_FILE):
+    """Open the database in WAL mode, creating the tables on first use.
+
+    WAL lets queries read while the writer thread commits.
+
+    Args:
+        path (str or Path): Database file.
+
+    Returns:
+        sqlite3.Connection: The connection.
+    """
+    db = sqlite3.connect(str(path))
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")  # WAL stays consistent after a power cut, only the last commits may be lost
+    db.executescript(SCHEMA)
+    return db
+
+
+def _recording():
+    """Return True while the writer thread runs, so there is someone to write what is queued."""
+    return _worker is not None and _worker.is_alive()
+
+
+def begin(recipe, compensate):
+    """Start recording a session.
+
+    Args:
+        recipe (str): Recipe name.
+        compensate (bool): Whether the development time is compensated.
+
+    Returns:
+        int or None: The session's id, or None if the writer is not running.
+    """
+    global _session
+    if not _recording():
+        return None
+    _session = int(time.time() * 1000)
+    _queue.append((_BEGIN, (_session, clock.monotonic(), recipe, int(compensate))))
+    return _session
+
+
+def reopen(session_id):
+    """Keep recording into a session resumed after a crash or reboot.
+
+    Args:
+        session_id (int or None): Id returned by begin() when the session started.
+    """
+    global _session
+    if not _recording() or session_id is None:
+        return
+    _session = session_id
+    event("resumed")
+
+
+def dev_settings(seconds, level):
+    """Record the development time and push/pull level of the running session."""
+    if _session is not None:
+        _queue.append((_DEV, (_session, clock.monotonic(), seconds, level)))
+
+
+def event(kind, stage=None):
+    """Record a stage event (stage_start, stage_end, pause, resume) of the running session."""
+    if _session is not None:
+        _queue.append((_EVENT, (_session, clock.monotonic(), kind, stage)))
+
+
+def end():
+    """Mark the running session as finished and have it written now."""
+    global _session
+    if _session is None:
+        return
+    _queue.append((_FINISH, (_session, clock.monotonic())))
+    _session = None
+    _flush_event.set()
+
+
+class _Writer:
+    """State of the writer thread: the connection and where each probe's history was read up to."""
+
+    def __init__(self, db):
+        self.db = db
+        self.read_index = {}  # Probe name -> TempHistory index to read from next
+        self.open_span = None  # (session id, monotonic start) of the session samples go to
+        self.to_wall = None    # Added to clock.monotonic() times to get time.time()
+
+    def flush(self):
+        """Write everything queued, and the new samples, in one transaction.
+
+        If the transaction fails the queued operations go back to the front of
+        the queue and the samples are read again, so the next flush retries them.
+        """
+        ops = []
+        while _queue:
+            ops.append(_queue.popleft())
+        read_index, open_span = dict(self.read_index), self.open_span
+        try:
+            self._write(ops)
+        except sqlite3.Error:
+            _queue.extendleft(reversed(ops))
+            self.read_index, self.open_span = read_index, open_span
+            raise
+
+    def _write(self, ops):
+        """Write ops and the samples taken since the last flush."""
+        # Re-read on every flush so an NTP correction after boot (the Pi has no RTC)
+        # is picked up. A simulated clock runs ahead of wall time, so keep its first offset.
+        if self.to_wall is None or not clock.is_virtual():
+            self.to_wall = time.time() - clock.monotonic()
+        to_wall = self.to_wall
+
+        spans = []  # (session id, start, end or None) of the sessions samples may belong to
+        if self.open_span is not None:
+            spans.append([*self.open_span, None])
+        for kind, row in ops:
+            if kind == _BEGIN:
+                spans.append([row[0], row[1], None])
+            elif kind == _FINISH:
+                for span in spans:
+                    if span[0] == row[0] and span[2] is None:
+                        span[2] = row[1]
+            elif kind == _EVENT and row[2] == "resumed" and not any(span[0] == row[0] for span in spans):
+                spans.append([row[0], row[1], None])
+
+        samples = []
+        for name, probe_history in list(tempcontrol.history.items()):
+            # The ring holds tempcontrol.HISTORY_S even at the fastest sampling rate, so only a writer
+            # stalled that long loses samples
+            new, self.read_index[name] = probe_history.since(self.read_index.get(name, 0))
+            for sample in new:
+                for session_id, start, finish in spans:
+                    if start <= sample.timestamp and (finish is None or sample.timestamp < finish):
+                        samples.append((session_id, sample.timestamp + to_wall, name, sample.temp, int(sample.heater_on)))
+                        break
+
+        self.open_span = next(((span[0], span[1]) for span in spans if span[2] is None), None)
+        if not ops and not samples:
+            return
+
+        with self.db:
+            for kind, row in ops:
+                if kind == _BEGIN:
+                    session_id, t, recipe, compensate = row
+                    self.db.execute("INSERT OR IGNORE INTO sessions (id, started, recipe, compensate) VALUES (?, ?, ?, ?)",
+                                    (session_id, t + to_wall, recipe, compensate))
+                elif kind == _DEV:
+                    session_id, t, seconds, level = row
+                    self.db.execute("UPDATE sessions SET dev_seconds = ?, push_pull = ? WHERE id = ?", (seconds, level, session_id))
+                    self.db.execute("INSERT INTO events VALUES (?, ?, 'dev', NULL, ?)", (session_id, t + to_wall, seconds))
+                elif kind == _EVENT:
+                    session_id, t, name, stage = row
+                    self.db.execute("INSERT INTO events VALUES (?, ?, ?, ?, NULL)", (session_id, t + to_wall, name, stage))
+                elif kind == _FINISH:
+                    session_id, t = row
+                    self.db.execute("UPDATE sessions SET finished = ? WHERE id = ?", (t + to_wall, session_id))
+            self.db.executemany("INSERT INTO samples VALUES (?, ?, ?, ?, ?)", samples)
+
+
+def _flush(writer):
+    """Flush, printing a database error instead of letting it end the writer thread."""
+    try:
+        writer.flush()
+    except sqlite3.Error as error:
+        print(f"Session history not written, retrying: {error}")
+
+
+def _write_loop(path):
+    try:
+        writer = _Writer(connect(path))
+    except sqlite3.Error as error:
+        print(f"Session history not recorded: {error}")
+        return
+    try:
+        while not _stop_event.is_set():
+            clock.wait(_flush_event, FLUSH_S)
+            _flush_event.clear()
+            _flush(writer)
+        _flush(writer)
+    finally:
+        writer.db.close()
+
+
+def start(path=DB_FILE):
+    """Start the writer thread. Session calls record nothing until it runs.
+
+    Args:
+        path (str or Path): Database file.
+    """
+    global _worker
+
+    if _worker and _worker.is_alive():
+        return _worker
+
+    _stop_event.clear()
+    _worker = threading.Thread(target=_write_loop, args=(path,), daemon=True)
+    _worker.start()
+    return _worker
+
+
+def stop():
+    """Write what is still queued and stop the writer thread."""
+    global _worker, _session
+
+    _stop_event.set()
+    _flush_event.set()
+    if _worker and _worker.is_alive():
+        _worker.join(timeout=5)
+    _worker = None
+    _session = None
+
+
+def find_sessions(recipe=None, push_pull=None, since=None, path=DB_FILE):
+    """Return past sessions, newest first, answered from the sessions indexes.
+
+    Args:
+        recipe (str or None): Only sessions of this recipe.
+        push_pull (int or None): Only sessions with this push/pull level.
+        since (float or None): Only sessions started after this time.time().
+        path (str or Path): Database file.
+
+    Returns:
+        list: Session tuples.
+    """
+    where, args = [], []
+    for clause, value in (("recipe = ?", recipe), ("push_pull = ?", push_pull), ("started >= ?", since)):
+        if value is not None:
+            where.append(clause)
+            args.append(value)
+    query = "SELECT * FROM sessions" + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY started DESC"
+
+    db = connect(path)
+    try:
+        return [Session(*row) for row in db.execute(query, args)]
+    finally:
+        db.close()
+
+
+def temperature_profile(session_id, probe=tempcontrol.BATH_PROBE, path=DB_FILE):
+    """Return a session's readings of one probe, oldest first.
+
+    Args:
+        session_id (int): Session id.
+        probe (str): Probe name, the bath probe by default.
+        path (str or Path): Database file.
+
+    Returns:
+        list: (time.time(), temperature in C, heater on) tuples.
+    """
+    db = connect(path)
+    try:
+        return [(t, temp, bool(heater)) for t, temp, heater in db.execute(
+            "SELECT t, temp, heater FROM samples WHERE session_id = ? AND probe = ? ORDER BY t", (session_id, probe))]
+    finally:
+        db.close()
+
+
+def session_events(session_id, path=DB_FILE):
+    """Return a session's events, oldest first, as (time.time(), kind, stage, value) tuples."""
+    db = connect(path)
+    try:
+        return db.execute("SELECT t, kind, stage, value FROM events WHERE session_id = ? ORDER BY t", (session_id,)).fetchall()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    recipe = args[args.index("--recipe") + 1] if "--recipe" in args else None
+    level = int(args[args.index("--level") + 1]) if "--level" in args else None
+    since = time.time() - float(args[args.index("--days") + 1]) * 86400 if "--days" in args else None
+
+    for session in find_sessions(recipe, level, since):
+        profile = [temp for _, temp, _ in temperature_profile(session.id)]
+        bath = f"bath {min(profile):.1f}-{max(profile):.1f} C" if profile else "no bath readings"
+        level_text = "" if session.push_pull is None else f"{session.push_pull:+d}"
+        print(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(session.started))}  {session.recipe} {level_text:>2}  "
+              f"dev {session.dev_seconds or 0:>4d} s  {'done' if session.finished else 'unfinished'}  {bath}")
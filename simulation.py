@@ -0,0 +1,358 @@
+# simulation.py
+# Simulated hardware: gpiozero mock pins, a fake 1-Wire sysfs tree fed by a
+# thermal model of the water bath, and an in-memory 20x4 LCD.
+#
+# Run a full scripted session off the Pi with:  python3 simulation.py
+# and profile it with:                          python3 -m cProfile -s cumtime simulation.py
+# The session runs on a simulated clock; add --realtime to run it at wall-clock speed,
+# and --metrics to print the hot-path metrics when it ends.
+#
+# Compare the heater control modes on the simulated bath with:
+#   python3 simulation.py --soak 4          (hysteresis)
+#   python3 simulation.py --soak 4 --pid
+# which regulates the bath for 4 simulated hours and reports the last one.
+
+import os
+import sys
+import random
+import signal
+import tempfile
+import threading
+
+from gpiozero import Device
+from gpiozero.pins.mock import MockFactory, MockPWMPin
+
+import clock
+
+HEATER_PIN = 16
+BUTTON_PINS = {1: 25, 2: 8, 3: 23, 4: 24, 0: 12}  # Stage buttons 1-4, and 0 for the encoder knob
+ENCODER_PINS = (5, 6)  # Rotary encoder A and B
+
+# Simulated probes: sensor id -> sensor time constant in seconds. The first is
+# the bath probe, the second sits in the developer bottle and lags behind.
+SENSORS = {
+    "28-00000000b001": 8.0,
+    "28-00000000b002": 120.0,
+}
+
+w1_dir = None   # Root of the fake /sys/bus/w1/devices tree
+bath = None     # The running ThermalBath
+lcd = None      # The most recently created VirtualLcd
+
+
+class ThermalBath:
+    """First-order thermal model of the water bath and its probes.
+
+    The bath gains heater power while the heater relay pin is high and loses
+    heat to the room in proportion to the temperature difference. Each probe
+    follows the bath through its own first-order lag and is written to the
+    fake sysfs tree in millidegrees, quantised to the DS18B20's 1/16 C steps.
+
+    Args:
+        directory (str): Root of the fake 1-Wire tree.
+        start_c (float): Initial bath and probe temperature.
+        ambient_c (float): Room temperature.
+        heater_w (float): Heater power in watts.
+        capacity_j_per_c (float): Heat capacity of the bath (19 L of water by default).
+        loss_w_per_c (float): Heat loss to the room per degree above ambient.
+        noise_c (float): Standard deviation of the sensor noise.
+    """
+
+    def __init__(self, directory, start_c=19.0, ambient_c=18.0, heater_w=25.0,
+                 capacity_j_per_c=79000.0, loss_w_per_c=4.0, noise_c=0.0):
+        self.directory = directory
+        self.temp_c = start_c
+        self.ambient_c = ambient_c
+        self.heater_w = heater_w
+        self.capacity_j_per_c = capacity_j_per_c
+        self.loss_w_per_c = loss_w_per_c
+        self.noise_c = noise_c
+        self.probe_c = {sensor_id: start_c for sensor_id in SENSORS}
+        self._fds = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+        for sensor_id in SENSORS:
+            sensor_dir = os.path.join(directory, sensor_id)
+            os.makedirs(sensor_dir, exist_ok=True)
+            with open(os.path.join(sensor_dir, "resolution"), "w") as f:
+                f.write("12\n")
+            self._fds[sensor_id] = os.open(os.path.join(sensor_dir, "temperature"), os.O_RDWR | os.O_CREAT, 0o644)
+        self._publish()
+
+    def heater_on(self):
+        """Return the state of the heater relay pin."""
+        return bool(Device.pin_factory.pin(HEATER_PIN).state)
+
+    def step(self, dt):
+        """Advance the model by dt seconds and publish the new probe readings."""
+        power = self.heater_w if self.heater_on() else 0.0
+        power -= self.loss_w_per_c * (self.temp_c - self.ambient_c)
+        self.temp_c += power * dt / self.capacity_j_per_c
+
+        for sensor_id, tau in SENSORS.items():
+            self.probe_c[sensor_id] += (self.temp_c - self.probe_c[sensor_id]) * min(1.0, dt / tau)
+        self._publish()
+
+    def _publish(self):
+        """Write every probe's reading in place, so open descriptors see it."""
+        for sensor_id, fd in self._fds.items():
+            reading = self.probe_c[sensor_id] + (random.gauss(0, self.noise_c) if self.noise_c else 0.0)
+            millideg = int(round(reading * 16)) * 1000 // 16
+            os.pwrite(fd, f"{millideg:>8d}\n".encode(), 0)  # Fixed width, never shorter than before
+
+    def _loop(self, period):
+        last = clock.monotonic()
+        while not clock.wait(self._stop, period):
+            now = clock.monotonic()
+            self.step(now - last)
+            last = now
+
+    def start(self, period=1.0):
+        """Step the model in a background thread every period seconds."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, args=(period,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread and close the probe files."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=1.5)
+        for fd in self._fds.values():
+            os.close(fd)
+        self._fds.clear()
+
+
+class VirtualLcd:
+    """In-memory 20x4 HD44780 with the hd44780.I2CLcd interface.
+
+    Decodes cursor moves and character writes into `glass`, records
+    every byte sent in `log` as (mode, byte) and counts I2C transactions
+    in `transfers`, so tests and profiles can count bus traffic.
+    """
+
+    ROW_OFFSETS = (0x00, 0x40, 0x14, 0x54)
+
+    def __init__(self):
+        global lcd
+        self.glass = [[" "] * 20 for _ in range(4)]
+        self.log = []
+        self.transfers = 0
+        self.address = 0
+        self.backlight = True
+        lcd = self
+
+    def lcd_write(self, cmd, mode=0):
+        self.transfers += 1
+        self._byte(cmd, mode)
+
+    def _byte(self, cmd, mode):
+        self.log.append((mode, cmd))
+        if mode:
+            for row, offset in enumerate(self.ROW_OFFSETS):
+                if offset <= self.address < offset + 20:
+                    self.glass[row][self.address - offset] = chr(cmd)
+            self.address += 1
+        elif cmd & 0x80:
+            self.address = cmd & 0x7F
+        elif cmd == 0x01:
+            self.lcd_clear()
+
+    def lcd_write_at(self, address, text):
+        self.transfers += 1
+        self._byte(0x80 | address, 0)
+        for char in text:
+            self._byte(ord(char), 1)
+
+    def lcd_display_string(self, string, line):
+        self.lcd_write_at(self.ROW_OFFSETS[line - 1], string)
+
+    def lcd_clear(self):
+        self.glass = [[" "] * 20 for _ in range(4)]
+        self.address = 0
+
+    def lcd_backlight(self, state):
+        self.backlight = bool(state)
+
+    def text(self):
+        """Return the four lines currently on the glass."""
+        return ["".join(row) for row in self.glass]
+
+    def shows(self, fragment):
+        """Return True if any line on the glass contains fragment."""
+        return any(fragment in line for line in self.text())
+
+
+def setup():
+    """Install the simulated hardware. Called by hardware.py when FILMDEV_HARDWARE=sim."""
+    global w1_dir, bath
+    if w1_dir is not None:
+        return
+
+    Device.pin_factory = MockFactory(pin_class=MockPWMPin)
+
+    w1_dir = tempfile.mkdtemp(prefix="filmdev-w1-") + "/"
+    os.makedirs(os.path.join(w1_dir, "w1_bus_master1"))
+    open(os.path.join(w1_dir, "w1_bus_master1", "therm_bulk_read"), "w").close()
+
+    bath = ThermalBath(w1_dir)
+    bath.start()
+
+
+def press(button, hold=0.1):
+    """Press and release a button on the mock pins.
+
+    gpiozero's hold detection runs on wall-clock time, so on a simulated
+    clock the button's when_held callback is fired here once the hold
+    reaches its hold_time.
+
+    Args:
+        button (int): Stage button 1-4, or 0 for the encoder knob.
+        hold (float): Seconds to keep it pressed. Over 1.2 s is a long press.
+    """
+    pin = Device.pin_factory.pin(BUTTON_PINS[button])
+    device = getattr(pin.when_changed, "__self__", None)  # The gpiozero Button listening on the pin
+
+    pin.drive_low()
+    if clock.is_virtual() and device is not None and device.when_held and hold >= device.hold_time:
+        clock.sleep(device.hold_time)
+        device.when_held()
+        clock.sleep(hold - device.hold_time)
+    else:
+        clock.sleep(hold)
+    pin.drive_high()
+    clock.sleep(0.2)  # Longer than the buttons' bounce_time
+
+
+def turn(detents, interval=0.2):
+    """Turn the rotary encoder on the mock pins.
+
+    Each detent drives the full quadrature sequence on pins A and B.
+
+    Args:
+        detents (int): Detents to turn, positive clockwise.
+        interval (float): Seconds between detents. Short intervals are accelerated.
+    """
+    pin_a = Device.pin_factory.pin(ENCODER_PINS[0])
+    pin_b = Device.pin_factory.pin(ENCODER_PINS[1])
+    first, second = (pin_a, pin_b) if detents > 0 else (pin_b, pin_a)
+    for _ in range(abs(detents)):
+        first.drive_low()
+        second.drive_low()
+        first.drive_high()
+        second.drive_high()
+        clock.sleep(interval)
+
+
+def wait_for_screen(fragment, timeout=None):
+    """Block until the virtual LCD shows fragment.
+
+    Raises:
+        TimeoutError: If it does not appear within timeout seconds.
+    """
+    if not clock.wait_until(lambda: lcd is not None and lcd.shows(fragment), timeout):
+        raise TimeoutError(f"LCD never showed {fragment!r}: {lcd.text() if lcd else None}")
+
+
+def _script():
+    """Drive one full session through the UI the way a user would."""
+    try:
+        wait_for_screen("Press 1 to begin", timeout=10)
+        press(1)
+        wait_for_screen("[ Dev time ]", timeout=10)
+        press(0)
+        wait_for_screen("Push/Pull setting", timeout=10)
+        press(0)
+        wait_for_screen("Press knob to start", timeout=10)
+        press(0)
+
+        wait_for_screen("left")
+        clock.sleep(20)
+        press(1, hold=1.5)  # Pause the pre-soak for half a minute
+        wait_for_screen("PAUSED")
+        clock.sleep(30)
+        press(1, hold=1.5)
+
+        for stage in (2, 3, 4):
+            wait_for_screen("Choose next stage")
+            press(stage)
+
+        wait_for_screen("You're all done!")
+        press(1)
+        wait_for_screen("Press 1 to begin", timeout=10)
+        print("Simulated session completed")
+    finally:
+        # A real SIGINT (unlike _thread.interrupt_main) also wakes a blocked
+        # queue wait; main() exits through its KeyboardInterrupt handler
+        os.kill(os.getpid(), signal.SIGINT)
+
+
+def run_session(virtual_time=True):
+    """Run main() on the simulated hardware with a scripted user.
+
+    Args:
+        virtual_time (bool): Run on a SimClock instead of wall-clock time.
+    """
+    if virtual_time:
+        clock.use(clock.SimClock())  # Before any module starts a thread
+    os.environ["FILMDEV_HARDWARE"] = "sim"
+    state_dir = tempfile.mkdtemp(prefix="filmdev-state-")
+    os.environ.setdefault("FILMDEV_JOURNAL", os.path.join(state_dir, "session.journal"))
+    os.environ.setdefault("FILMDEV_HISTORY_DB", os.path.join(state_dir, "history.db"))
+    import main
+
+    threading.Thread(target=_script, daemon=True).start()
+    main.main()
+
+
+def soak(hours, mode=None):
+    """Regulate the simulated bath with no session running and report the last hour.
+
+    Starts from the bath model's defaults (19 C water in an 18 C room) on a
+    simulated clock, so the first hours absorb the warm-up.
+
+    Args:
+        hours (float): Simulated hours to run, at least 1.
+        mode (str or None): relaycontrol.HYSTERESIS or PID, the default mode if None.
+
+    Returns:
+        tuple: Relay switches, lowest and highest water temperature in C, over the last hour.
+    """
+    clock.use(clock.SimClock())
+    os.environ["FILMDEV_HARDWARE"] = "sim"
+    import relaycontrol
+    import tempcontrol
+
+    if mode is not None:
+        relaycontrol.configure(mode=mode)
+    relaycontrol.init()
+    tempcontrol.start()
+    relaycontrol.start()
+
+    end = clock.monotonic() + hours * 3600.0
+    last_hour = end - 3600.0
+    low = high = None
+    while clock.monotonic() < end:
+        clock.sleep(10.0)
+        if clock.monotonic() >= last_hour:
+            low = bath.temp_c if low is None else min(low, bath.temp_c)
+            high = bath.temp_c if high is None else max(high, bath.temp_c)
+    switches = round(relaycontrol.control_report()["switches_per_hour"])  # Counted over the last hour
+
+    relaycontrol.stop()
+    tempcontrol.cleanup()
+    return switches, low, high
+
+
+if __name__ == "__main__":
+    import simulation  # Use the importable module so hardware.py shares its state
+    if "--soak" in sys.argv[1:]:
+        mode = "pid" if "--pid" in sys.argv[1:] else None
+        switches, low, high = simulation.soak(float(sys.argv[sys.argv.index("--soak") + 1]), mode)
+        print(f"Heater {mode or 'hysteresis'}, last hour: {switches} switches, water {low:.2f}-{high:.2f} C")
+        sys.exit()
+    if "--metrics" in sys.argv[1:]:
+        import metrics
+        metrics.enable()
+    simulation.run_session(virtual_time="--realtime" not in sys.argv[1:])
@@ -1,30 +1,288 @@
 # stages.py
 
 import math
-import time
+import clock
+import compensation
+import dashboard
 import ledcontrol
+import metrics
+import recipes
+import sessiondb
 import tempcontrol
+from interfacing import HOLD
+from journal import Journal
+
+LED_CYCLES = {  # Step "led" names in the recipe file -> ledcontrol function started for the step
+    "blue": ledcontrol.blue_cycle,
+    "yellow": ledcontrol.yellow_cycle,
+}
+
+
+class Playback:
+
+    """
+    Where a stage timeline is up to, shared by Stages.play(), play_async() and
+    the tank sessions of multitank.py.
+    When the development step is time-temperature compensated, every offset
+    at or after its compiled (longest) end is moved by `shift`, which follows
+    the compensator's prediction of when the step will really end, and the
+    step's agitation windows past that point are skipped.
+
+    Args:
+        timeline (tuple): recipes.Event tuples sorted by offset.
+        start (float): clock.monotonic() at offset 0.
+        compensator (compensation.Compensator or None): Times the DEV step.
+    """
+
+    def __init__(self, timeline, start, compensator=None):
+        self.timeline = timeline
+        self.start = start              # Time zero of the timeline, moved later by every pause
+        self.position = 0               # Index of the next event to apply
+        self.step = None                # STEP_START event of the step on screen
+        self.compensator = compensator
+        self.shift = 0.0                # Seconds (<= 0) taken off everything after the compensated step
+        self._compensated = None        # STEP_START of the compensated step once it has begun
+
+    @property
+    def finished(self):
+        return self.position == len(self.timeline)
+
+    def _time(self, offset):
+        """Return the clock time of a timeline offset."""
+        if self._compensated is not None and offset >= self._compensated.end:
+            offset += self.shift
+        return self.start + offset
+
+    def _skipped(self, event):
+        """Return True for an agitation window past the compensated step's predicted end."""
+        return (self._compensated is not None and event.kind == recipes.AGITATE and event.dev
+                and event.offset >= self._compensated.end + self.shift)
+
+    def pop_due(self, now):
+        """Return the next event due at now and move past it, or None."""
+        while self.position < len(self.timeline):
+            event = self.timeline[self.position]
+            if self._skipped(event):
+                self.position += 1
+                continue
+            if self._time(event.offset) > now:
+                return None
+
+            self.position += 1
+            if event.kind == recipes.STEP_START:
+                self.step = event
+                if event.dev and self.compensator is not None:
+                    self._compensated = event
+            elif event.kind == recipes.STEP_END:
+                self.step = None
+            return event
+        return None
+
+    def next_time(self):
+        """Return the clock time of the next event that will be applied."""
+        index = self.position
+        while self._skipped(self.timeline[index]):  # STAGE_END is last and never skipped
+            index += 1
+        return self._time(self.timeline[index].offset)
+
+    def step_end(self):
+        """Return the clock time the step on screen ends."""
+        return self._time(self.step.end)
+
+    def track(self, temp, now):
+        """Move the compensated step's end to where the compensator now predicts it.
+
+        Args:
+            temp (float or None): Developer temperature in °C.
+            now (float): clock.monotonic() of the reading.
+        """
+        step = self._compensated
+        if step is None or self.step is not step:
+            return
+        remaining = self.compensator.update(temp, now)
+        self.shift = min(0.0, (now - self.start) + remaining - step.end)
+
+    def offset(self, now):
+        """Return the timeline offset reached at now, as journalled and passed to seek()."""
+        elapsed = now - self.start
+        if self._compensated is not None and elapsed >= self._compensated.end + self.shift:
+            elapsed -= self.shift
+        return elapsed
+
+    def equivalent(self):
+        """Return the compensated development done so far, or None outside the compensated step."""
+        if self._compensated is None or self.step is not self._compensated:
+            return None
+        return self.compensator.equivalent_s
+
+    def seek(self, offset, equivalent=None):
+        """Continue offset seconds into the timeline, e.g. to resume a journalled stage.
+
+        Events before offset are passed over without being applied. The ones
+        still under way at offset are returned moved to start there, so
+        applying them puts the LEDs where they would have been.
+
+        Args:
+            offset (float): Timeline offset to continue from.
+            equivalent (float or None): Compensated development already done,
+                None to count the time spent in the compensated step at the
+                reference rate.
+
+        Returns:
+            list: recipes.Event tuples to apply now.
+        """
+        now = self.start
+        self.start -= offset
+        if self.compensator is not None and equivalent is not None:
+            self.compensator.equivalent_s = equivalent
+
+        under_way = []
+        due = self.pop_due(now)
+        while due is not None:
+            if due.kind == recipes.STAGE_START or (due.end is not None and due.end > offset):
+                under_way.append(due._replace(offset=offset))
+            due = self.pop_due(now)
+        if self._compensated is not None and equivalent is None:
+            self.compensator.equivalent_s = max(0.0, offset - self._compensated.offset)
+        return under_way
+
+    def pause(self, seconds):
+        """Push the rest of the timeline back after a pause of the given length."""
+        self.start += seconds
+        if self.compensator is not None:
+            self.compensator.hold()  # Paused time is not development time
+
+
+class _Player:
+    """One run of a stage timeline: everything play() and play_async() do
+    besides waiting for the next button event, which is all that differs
+    between the two runtimes.
+
+    Args:
+        stages (Stages): Owner of the UI, journal and LED handling.
+        timeline (tuple): recipes.Event tuples sorted by offset.
+        active_button (int): Button that pauses the stage, and its number in the journal.
+        offset (float): Seconds into the timeline to start from.
+        equivalent (float or None): Compensated development already done.
+    """
+
+    def __init__(self, stages, timeline, active_button, offset=0.0, equivalent=None):
+        self.stages = stages
+        self.ui = stages.ui
+        self.active_button = active_button
+        self.pause_hint = f"Hold {active_button} to pause"  # Fourth LCD line, reminds which button pauses this stage
+        self.last_displayed_seconds = None
+
+        self.ui.flush_events()
+        self.playback = stages._resume_playback(timeline, offset, equivalent)
+
+    def advance(self):
+        """Apply the due events, checkpoint the journal and redraw the countdown if its second changed.
+
+        Returns:
+            float or None: clock.monotonic() time to wake up at for the next
+            event or second tick, or None once the timeline has finished.
+        """
+        playback = self.playback
+        now = clock.monotonic()
+        due = playback.pop_due(now)
+        while due is not None:
+            self.stages._apply(due)
+            if due.kind == recipes.STEP_START:
+                self.last_displayed_seconds = None
+            elif due.kind == recipes.STEP_END:
+                self.ui.post_screen()
+            due = playback.pop_due(now)
+
+        if playback.finished:
+            return None
+
+        journal = self.stages.journal
+        if now >= journal.next_checkpoint:
+            journal.checkpoint(self.active_button, playback.offset(now), now, playback.equivalent())
+
+        if playback.step is None:
+            return playback.next_time()
+
+        playback.track(tempcontrol.get_temp(self.stages.compensation_probe), now)
+        step_end = playback.step_end()
+        display_seconds = max(0, math.ceil(step_end - now))
+
+        if display_seconds != self.last_displayed_seconds:
+            if metrics.enabled and self.last_displayed_seconds is not None:
+                metrics.observe(metrics.TICK_LATENESS, clock.monotonic() - (step_end - display_seconds))
+            self.stages._draw_tick(playback.step.label, display_seconds, self.pause_hint)
+            self.last_displayed_seconds = display_seconds
+
+        # Wake for the next second tick too, so the display changes
+        # exactly once per second while reacting to holds immediately.
+        return min(playback.next_time(), step_end - (display_seconds - 1))
+
+    def is_pause(self, event):
+        """Return True for a HOLD of the active button, which pauses and resumes."""
+        return event is not None and event.kind == HOLD and event.button == self.active_button
+
+    def pause(self, event):
+        """Show the paused state and record it.
+
+        Args:
+            event (ButtonEvent): The HOLD that paused.
+        """
+        ledcontrol.pause_on()
+        ledcontrol.green_blink()
+        self.ui.paused_screen()
+        self.stages.journal.pause(self.active_button, self.playback.offset(event.timestamp))
+        dashboard.publish(paused=True)
+        sessiondb.event("pause", self.active_button)
+        metrics.observe(metrics.BUTTON_REACTION, clock.monotonic() - event.timestamp)
+
+    def resume(self, event, resume):
+        """Push the timeline back by the time spent paused and leave the paused state.
+
+        Args:
+            event (ButtonEvent): The HOLD that paused.
+            resume (ButtonEvent): The HOLD that resumed.
+        """
+        self.playback.pause(resume.timestamp - event.timestamp)
+        self.stages.journal.resume(self.active_button, self.playback.offset(resume.timestamp))
+        dashboard.publish(paused=False)
+        sessiondb.event("resume", self.active_button)
+
+        ledcontrol.green_blink_stop()
+        ledcontrol.pause_off()
+        metrics.observe(metrics.BUTTON_REACTION, clock.monotonic() - resume.timestamp)
+        self.last_displayed_seconds = None  # Redraw over the paused screen
+        if self.playback.step is None:
+            self.ui.post_screen()  # Paused between two steps
 
 
 class Stages:
     
     """
     This class contains all the logic pertaining the timers used across every stage
-    as well as the stage-dependent LED behavior. Pausing is handled in here, and the
+    as well as the stage-dependent LED behavior. The steps, durations and LED cues of
+    each stage come from a recipe (see recipes.py), compiled into one timeline per
+    stage that play() steps through. Pausing is handled in here, and the
     temperature display is too
     """
     
-    def __init__(self, ui):
+    def __init__(self, ui, recipe=None, compensate=False, journal=None):
         self.ui = ui
+        self.journal = journal if journal is not None else Journal()  #Session journal (see journal.py), writes nothing until begin() or reopen()
 
-        self.short_rinse = 60    #The timer durations are hard coded because they don't change in B&W dev. Only Dev timer can change which is handled elsewhere
-        self.long_rinse  = 5*60
-        self.dev         = 60
-        self.stopbath    = 60
-        self.fixer       = 5.5*60
-        self.photoflo    = 30
+        if recipe is None:
+            loaded, default = recipes.load_recipes()
+            recipe = loaded[default]
+        self.recipe = recipe                          #Durations and step order of every stage come from the recipe file
+        self.dev = recipe.dev_time                    #Default dev time offered on the encoder
+        self.dev_stage = recipes.dev_stage(recipe)    #Stage that asks for the dev time first, None if the recipe has none
+        self.stage_count = len(recipe.stages)
+        self.ui.stage_names = recipes.stage_names(recipe)  #Names on the stage menu, so a new process needs no code change
 
         self.longpress_time = 1.2 #Long press corresponds to button handling for pausing
+        self.display_probe = tempcontrol.BATH_PROBE #Probe whose temperature is shown while a timer runs
+        self.compensate = compensate #Stretch or shrink the dev step with the developer temperature (see compensation.py)
+        self.ui.set_hold_time(self.longpress_time)
 
         self.push_pull_options = [ #These are (stops of light, factor)
             (-2, 0.6),			   #A stop of light is by how much should the film be pushed or pulled, the factor is by how much the timer has to be adjusted
@@ -36,11 +294,49 @@ class Stages:
         self.dev_run_seconds = self.dev
         self.dev_choice_level = 0
 
+        self.timelines = {  #Stage number -> compiled timeline, built once here and when the dev time changes
+            number: self._compile(number) for number in range(1, self.stage_count + 1)
+        }
+
+    def _compile(self, stage):
+        """Compile one stage of the recipe with the current dev settings.
+
+        Args:
+            stage (int): Stage number (1 to stage_count).
+
+        Returns:
+            tuple: The stage's recipes.Event timeline.
+        """
+        return recipes.compile_stage(
+            self.recipe.stages[stage - 1], self.dev_run_seconds, self._dev_label(),
+            compensation.MAX_STRETCH if self.compensate else 1.0)
+
+    @property
+    def compensation_probe(self):
+        """Probe that times the compensated dev step: the developer probe, or the bath without one."""
+        if tempcontrol.get_probe(tempcontrol.DEVELOPER_PROBE) is not None:
+            return tempcontrol.DEVELOPER_PROBE
+        return tempcontrol.BATH_PROBE
+
+    def next_stage(self, last_stage):
+        """Return the stage that must follow last_stage, enforcing the recipe's order.
+
+        Args:
+            last_stage (int or None): Stage just completed, None at the start of a session.
+
+        Returns:
+            int or None: Next stage number, or None once the last stage is done.
+        """
+        if last_stage is None:
+            return 1
+        return last_stage + 1 if last_stage < self.stage_count else None
+
     def set_dev_settings(self, base_seconds: int, choice_level: int):
         """Set development timer and push/pull level.
 
         Configures the development stage duration based on the user's choice
-        of exposure compensation (push/pull processing).
+        of exposure compensation (push/pull processing), and recompiles that
+        stage's timeline.
 
         Args:
             base_seconds (int): Base development time in seconds before push/pull adjustment.
@@ -48,108 +344,207 @@ class Stages:
         """
         self.dev_run_seconds = max(10, int(base_seconds))
         self.dev_choice_level = choice_level
+        self.journal.dev_settings(self.dev_run_seconds, choice_level)
+        sessiondb.dev_settings(self.dev_run_seconds, choice_level)
+
+        if self.dev_stage is not None:
+            self.timelines[self.dev_stage] = self._compile(self.dev_stage)
+
+    @metrics.timed(metrics.TICK_DRAW)
+    def _draw_tick(self, label, display_seconds, pause_hint):
+        """Post one timer tick: label, temperature, remaining time and pause hint.
+
+        Only posts the lines to the UI's renderer, so the timer never waits on
+        the LCD. Unchanged characters are skipped by the UI's shadow buffer,
+        so a normal tick only sends the changed MM:SS digits.
+        """
+        mins, secs = divmod(display_seconds, 60)
 
-    def timer(self, label, duration, active_button):
-        """Run a countdown timer for a development stage with pause support.
+        self.ui.post_line(label, 1)
+        self.ui.post_line(f"{mins:02}:{secs:02} left", 3)
 
-        Updates the LCD display every second showing remaining time and current
-        temperature. Monitors the specified button for long-press (1.2s) to pause
-        and resume. Maintains timer accuracy across pause/resume cycles.
+        temp = tempcontrol.get_temp(self.display_probe)
+        if temp is not None:
+            self.ui.post_line(f"Temp: {temp:4.1f} C", 2)
+        else:
+            self.ui.post_line("Temp: unknown", 2)
+
+        self.ui.post_line(pause_hint, 4)
+        dashboard.publish(step=label.strip(), remaining=display_seconds)
+
+    def _apply(self, event):
+        """Carry out the LED side of a timeline event.
 
         Args:
-            label (str): Stage name displayed on LCD line 1 (max 20 chars).
-            duration (float): Stage duration in seconds.
-            active_button (int): Button number (1-4) that controls pause for this stage.
+            event (recipes.Event): Event that has come due.
         """
-        self.ui.clear()
+        if event.kind == recipes.STAGE_START:
+            ledcontrol.green_done()
+        elif event.kind == recipes.STEP_START and event.led:
+            LED_CYCLES[event.led](event.end - event.offset)
+        elif event.kind == recipes.AGITATE:
+            ledcontrol.agitate(event.end - event.offset)
+        elif event.kind == recipes.STEP_END:
+            ledcontrol.leds_off()
+        elif event.kind == recipes.STAGE_END:
+            ledcontrol.green_cycle()
+
+    def start_playback(self, timeline):
+        """Start playing a timeline now, with a compensator for the dev step if enabled."""
+        compensator = None
+        if self.compensate:
+            compensator = compensation.Compensator(int(round(self.dev_run_seconds)), self.recipe.setpoint_c)
+        return Playback(timeline, clock.monotonic(), compensator)
+
+    def _resume_playback(self, timeline, offset, equivalent):
+        """Start playing a timeline offset seconds in, with the LEDs of what is under way there."""
+        playback = self.start_playback(timeline)
+        for event in playback.seek(offset, equivalent):
+            self._apply(event)
+        return playback
+
+    def stage_remaining(self, stage, offset, equivalent=None):
+        """Return the seconds left in a stage offset seconds into its timeline.
+
+        With compensation on, the development step is compiled at its longest
+        (see compile_stage()), so until it has ended its real length is taken
+        as the development still owed at the reference temperature instead.
 
-        end_time = time.monotonic() + float(duration)
-        press_start = None
-        pause_start = None
-        last_displayed_seconds = None
-       
-        pause_hint = f"Hold {active_button} to pause"    # Hint shown on the fourth LCD line to remind which button pauses this stage
+        Args:
+            stage (int): Stage number (1 to stage_count).
+            offset (float): Seconds into the stage's timeline, as journalled.
+            equivalent (float or None): Compensated development done, as journalled.
+        """
+        timeline = self.timelines[stage]
+        remaining = timeline[-1].offset - offset
+        if self.compensate and stage == self.dev_stage:
+            dev = next(event for event in timeline if event.kind == recipes.STEP_START and event.dev)
+            if offset < dev.end:  # Past the step, offsets are journalled on the compiled timeline
+                if equivalent is None:  # No checkpoint in the step yet: count its time at the reference rate
+                    equivalent = max(0.0, offset - dev.offset)
+                owed = max(0.0, int(round(self.dev_run_seconds)) - equivalent)
+                remaining -= dev.end - (max(offset, dev.offset) + owed)
+        return max(0.0, remaining)
+
+    def play(self, timeline, active_button, offset=0.0, equivalent=None):
+        """Step through a compiled stage timeline with pause support.
+
+        Each pass applies the events that are due, redraws the current
+        step's countdown when its displayed second changes, then blocks on
+        the UI event queue until the next event or second tick, whichever
+        comes first. A long-press (1.2s) HOLD of the active button pauses,
+        and resuming pushes the whole remaining timeline back by the time
+        spent paused. With compensation on, the dev step's end follows the
+        developer temperature on every pass. Pauses, resumes and a periodic
+        checkpoint of the offset reached go to the session journal.
 
-        while True:
-            now = time.monotonic()
-            remaining = end_time - now
+        Args:
+            timeline (tuple): recipes.Event tuples sorted by offset.
+            active_button (int): Button number (1-4) that controls pause for
+                this stage, and the stage number in the journal.
+            offset (float): Seconds into the timeline to start from, when resuming.
+            equivalent (float or None): Compensated development already done, when resuming.
+        """
+        player = _Player(self, timeline, active_button, offset, equivalent)
 
-            if remaining <= 0:
+        while True:
+            deadline = player.advance()
+            if deadline is None:
                 break
 
-            # Button handling
-            btn = self.ui.detect_button()
-            if btn == active_button:
-                if press_start is None:
-                    press_start = now
-                elif now - press_start >= self.longpress_time:
-                    ledcontrol.pause_on()
-                    ledcontrol.green_blink()
-                    self.ui.paused_screen()
+            event = self.ui.next_event(timeout=max(0, deadline - clock.monotonic()))
+            if not player.is_pause(event):
+                continue
 
-                    pause_start = time.monotonic()
-                    resume_press_start = None
+            # Long press: pause until the same button is held again
+            player.pause(event)
+            while True:
+                resume = self.ui.next_event()
+                if player.is_pause(resume):
+                    break
+            player.resume(event, resume)
 
-                    while True:
-                        now2 = time.monotonic()
-                        btn2 = self.ui.detect_button()
+    async def play_async(self, timeline, active_button, offset=0.0, equivalent=None):
+        """Asyncio version of play().
 
-                        if btn2 == active_button:
-                            if resume_press_start is None:
-                                resume_press_start = now2
-                            elif now2 - resume_press_start >= self.longpress_time:
-                                break
-                        else:
-                            resume_press_start = None
+        Waits on the UI's asyncio event queue between events and ticks and
+        posts to the UI's renderer, so the event loop never blocks on the
+        I2C bus. Cancelling the task abandons the stage.
 
-                        time.sleep(0.05)
-
-                    if pause_start is not None:
-                        paused_duration = time.monotonic() - pause_start
-                        end_time += paused_duration
-                        pause_start = None
+        Args:
+            timeline (tuple): recipes.Event tuples sorted by offset.
+            active_button (int): Button number (1-4) that controls pause for
+                this stage, and the stage number in the journal.
+            offset (float): Seconds into the timeline to start from, when resuming.
+            equivalent (float or None): Compensated development already done, when resuming.
+        """
+        player = _Player(self, timeline, active_button, offset, equivalent)
 
-                    ledcontrol.green_blink_stop()
-                    ledcontrol.pause_off()
-                    self.ui.clear()
+        while True:
+            deadline = player.advance()
+            if deadline is None:
+                break
 
-                    press_start = None
-                    continue
-            else:
-                press_start = None
+            event = await self.ui.next_event_async(timeout=max(0, deadline - clock.monotonic()))
+            if not player.is_pause(event):
+                continue
 
-            display_seconds = max(0, math.ceil(remaining))
+            player.pause(event)
+            while True:
+                resume = await self.ui.next_event_async()
+                if player.is_pause(resume):
+                    break
+            player.resume(event, resume)
 
-            if display_seconds != last_displayed_seconds:
-                mins, secs = divmod(display_seconds, 60)
+    def _dev_label(self):
+        """Return the development label with the push/pull level right-aligned."""
+        dev_label = "Developing..."
+        if self.dev_stage is not None:
+            dev_label = next(step.label for step in self.recipe.stages[self.dev_stage - 1] if step.duration == recipes.DEV)
 
-                self.ui.write_line(label, 1)
-                self.ui.write_line(f"{mins:02}:{secs:02} left", 3)
+        level_display = f"+{self.dev_choice_level}" if self.dev_choice_level > 0 else str(self.dev_choice_level)
+        return dev_label[: (20 - len(level_display))].ljust(20 - len(level_display)) + level_display.rjust(len(level_display))
 
-                temp = tempcontrol.actual_temp
-                if temp is not None:
-                    self.ui.write_line(f"Temp: {temp:4.1f} C", 2)
-                else:
-                    self.ui.write_line("Temp: unknown", 2)
+    def _stage_started(self, stage, offset, equivalent):
+        """Check the stage exists and record its start in the journal, dashboard and history."""
+        if stage not in self.timelines:
+            raise ValueError(f"Unknown stage: {stage}")
+        self.journal.stage_start(stage, offset, equivalent)
+        dashboard.publish(stage=stage, paused=False)
+        sessiondb.event("stage_start", stage)
 
-                self.ui.write_line(pause_hint, 4)
+    def _stage_ended(self, stage):
+        """Record the end of a stage in the journal, dashboard and history."""
+        self.journal.stage_end(stage)
+        dashboard.publish(stage=None, step=None, remaining=None)
+        sessiondb.event("stage_end", stage)
 
-                last_displayed_seconds = display_seconds
+    def run_stage(self, stage, offset=0.0, equivalent=None):
+        """Run a stage's timeline, paused by holding that stage's button.
 
-            # Sleep in short bursts until the next second tick so the display changes
-            # exactly once per second while staying responsive to pauses.
-            next_tick = end_time - (display_seconds - 1)
-            remaining_to_tick = next_tick - time.monotonic()
+        The green LED is off while the stage runs and solid once it is done.
+        The stage's start and end are synced to the session journal.
 
-            if remaining_to_tick <= 0:
-                time.sleep(0.02)
-            else:
-                time.sleep(max(0.02, min(0.1, remaining_to_tick)))
+        Args:
+            stage (int): Stage number (1 to stage_count).
+            offset (float): Seconds into the stage to start from, when resuming.
+            equivalent (float or None): Compensated development already done, when resuming.
+        """
+        self._stage_started(stage, offset, equivalent)
+        self.play(self.timelines[stage], stage, offset, equivalent)
+        self._stage_ended(stage)
 
-        ledcontrol.leds_off()
-        self.ui.clear()
-        time.sleep(0.5)
+    async def run_stage_async(self, stage, offset=0.0, equivalent=None):
+        """Asyncio version of run_stage().
 
+        Args:
+            stage (int): Stage number (1 to stage_count).
+            offset (float): Seconds into the stage to start from, when resuming.
+            equivalent (float or None): Compensated development already done, when resuming.
+        """
+        self._stage_started(stage, offset, equivalent)
+        await self.play_async(self.timelines[stage], stage, offset, equivalent)
+        self._stage_ended(stage)
 
     def wash_dev(self):
             
@@ -160,21 +555,7 @@ class Stages:
         development.
         """
         
-        ledcontrol.green_done()
-
-        ledcontrol.blue_cycle(self.short_rinse)
-        self.timer("      Pre-Soak      ", self.short_rinse, active_button=1)
-
-        dev_duration = int(round(self.dev_run_seconds))
-        dev_label = "Developing..."
-
-        level_display = f"+{self.dev_choice_level}" if self.dev_choice_level > 0 else str(self.dev_choice_level)
-        padded_label = dev_label[: (20 - len(level_display))].ljust(20 - len(level_display)) + level_display.rjust(len(level_display))
-
-        ledcontrol.yellow_cycle(dev_duration)
-        self.timer(padded_label, dev_duration, active_button=1)
-
-        ledcontrol.green_cycle()
+        self.run_stage(1)
 
     def stopdev(self):
         
@@ -184,12 +565,7 @@ class Stages:
         via long button press. A solid green LED indicates completion.
         """
         
-        ledcontrol.green_done()
-
-        ledcontrol.yellow_cycle(self.stopbath)
-        self.timer("     Stop bath    ", self.stopbath, active_button=2)
-
-        ledcontrol.green_cycle()
+        self.run_stage(2)
 
     def wash_fix(self):
         
@@ -199,15 +575,7 @@ class Stages:
         A solid green LED indicates completion of the fixer stage.
         """
         
-        ledcontrol.green_done()
-
-        ledcontrol.blue_cycle(self.short_rinse)
-        self.timer("    Second rinse    ", self.short_rinse, active_button=3)
-
-        ledcontrol.yellow_cycle(self.fixer)
-        self.timer("     Fixing...    ", self.fixer, active_button=3)
-
-        ledcontrol.green_cycle()
+        self.run_stage(3)
 
     def wash_photoflo(self):
         
@@ -217,11 +585,4 @@ class Stages:
         yellow LED activity. A solid green LED indicates final completion.
         """
         
-        ledcontrol.green_done()
-
-        ledcontrol.blue_cycle(self.long_rinse)
-        self.timer("    Final rinse    ", self.long_rinse, active_button=4)
-
-        self.timer("      Photoflo      ", self.photoflo, active_button=4)
-
-        ledcontrol.green_cycle()
+        self.run_stage(4)
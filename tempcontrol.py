@@ -3,36 +3,208 @@
 
 import os
 import glob
-import time
+import asyncio
 import threading
+from collections import namedtuple
+from temphistory import TempHistory
+from tempfilter import TempFilter
+import clock
+import dashboard
+import hardware
+import metrics
 
-os.system('modprobe w1-gpio')
-os.system('modprobe w1-therm')
+base_dir = None  #the temp sensors are here (a fake tree on the simulator), set by init()
+bulk_read_file = None  #writing 'trigger' here starts a conversion on every sensor at once
 
-base_dir = '/sys/bus/w1/devices/' #the temp sensor is here
+# Conversion time of the DS18B20 for each resolution in bits
+CONVERSION_TIME = {9: 0.094, 10: 0.188, 11: 0.375, 12: 0.750}
 
-devices = glob.glob(base_dir + '28*')  #looks for the sensor's directory, it should start with a 28
-device_file = devices[0] + '/w1_slave'
+# Name and calibration offset (added to the reading, in C) for each probe, by sensor id.
+# Probes that are not listed take the first free name in DEFAULT_NAMES, then probeN.
+PROBE_CONFIG = {
+    # '28-0000071234ab': ('bath', 0.0),
+    # '28-0000071234cd': ('developer', -0.1),
+    # '28-0000071234ef': ('tank', 0.0),
+}
+DEFAULT_NAMES = ('bath', 'developer', 'tank')
+HISTORY_WINDOWS = (60, 300, 900)  #seconds, windows that history stats can be queried over
+BATH_PROBE = 'bath'  #the probe in the water bath, regulated by the heater
 
-actual_temp = None
+# Adaptive sampling: after every sample the sampler picks the (interval in s, resolution in bits) to use next
+FAST_SAMPLING = (0.25, 10)   #near a heater threshold or changing fast: 0.25 C steps, 188 ms conversions
+STABLE_SAMPLING = (2.0, 12)  #session running and the bath steady
+IDLE_SAMPLING = (5.0, 12)    #no session running and the bath steady
+NEAR_THRESHOLD_C = 0.1       #bath readings this close to a heater threshold sample fast
+LOOKAHEAD_S = 30.0           #so do baths whose last minute's trend reaches a threshold within this time
+FAST_SLOPE_C_PER_S = 0.005   #and baths moving faster than this (0.3 C a minute), wherever they are
+DEVELOPER_PROBE = 'developer'  #the probe in the developer bottle, followed by the development time compensation
+HISTORY_S = 86400  #seconds of samples each probe's history keeps, even if the sampler stays at its fastest rate throughout
+HISTORY_CAPACITY = int(HISTORY_S / FAST_SAMPLING[0])  #samples kept per probe: 345600, about 6 MB
+
+Probe = namedtuple("Probe", ["name", "sensor_id", "offset", "device_file", "resolution_file"])
+Reading = namedtuple("Reading", ["temp", "raw", "timestamp"])  #filtered and calibrated C, unfiltered sensor C, clock.monotonic()
+
+
+def discover_probes():
+    """Find every DS18B20 on the bus and name it from PROBE_CONFIG.
+
+    Returns:
+        list: Probe tuples in sensor id order.
+    """
+    sensor_dirs = sorted(glob.glob(base_dir + '28*'))  #sensor directories start with a 28
+    taken = {PROBE_CONFIG[os.path.basename(d)][0] for d in sensor_dirs if os.path.basename(d) in PROBE_CONFIG}
+    spare = [n for n in DEFAULT_NAMES if n not in taken]
+
+    found = []
+    for number, sensor_dir in enumerate(sensor_dirs, start=1):
+        sensor_id = os.path.basename(sensor_dir)
+        if sensor_id in PROBE_CONFIG:
+            name, offset = PROBE_CONFIG[sensor_id]
+        else:
+            name, offset = (spare.pop(0) if spare else f'probe{number}'), 0.0
+
+        temperature_file = sensor_dir + '/temperature'  #newer kernels: just the millidegrees, CRC already checked
+        device_file = temperature_file if os.path.exists(temperature_file) else sensor_dir + '/w1_slave'
+        found.append(Probe(name, sensor_id, offset, device_file, sensor_dir + '/resolution'))
+
+    return found
+
+
+probes = []  # Filled by init()
+readings = {}  # Probe name -> latest Reading. Replaced as a whole on each sample, so a reference is a consistent snapshot
+history = {}  # Probe name -> TempHistory of its calibrated readings
+filters = {}  # Probe name -> TempFilter its raw readings go through
+sample_interval = 1.0  # Seconds between background samples, picked by choose_rate() unless adaptive is False
+adaptive = True  # Set False to sample every sample_interval at whatever resolution the probes have
+resolution = None  # Bits the adaptive sampler last set on the probes
+thresholds_c = ()  # Bath temperatures where relaycontrol would switch the heater next, kept up to date by relaycontrol
+session_running = False  # Set by main from a session's start to its end; the sampler backs off further while False
+heater_on = False  # Mirrored by relaycontrol so history samples carry the heater state
+sample_count = 0  # Goes up by one with every sample(), so a waiter can tell a new snapshot from the last one it saw
+new_sample = threading.Condition()  # Notified after every sample(); wait on it instead of polling readings
 
 _stop_event = threading.Event()
 _worker = None
+_fds = {}  # device_file -> descriptor, kept open between samples so each read is a single pread()
+_subscribers = set()  # asyncio queues handed out by subscribe(), fed by run()
+
+
+def init():
+    """Load the 1-Wire modules if they are not loaded yet and discover the probes.
+
+    Nothing touches the bus at import, so this runs on first use: start()
+    and run() call it. Later calls do nothing.
+
+    Returns:
+        list: The discovered Probe tuples (empty if no sensor is connected).
+    """
+    global base_dir, bulk_read_file, probes
+
+    if base_dir is None:
+        hardware.load_w1_modules()
+        root = hardware.w1_base_dir()
+        bulk_read_file = root + 'w1_bus_master1/therm_bulk_read'
+        base_dir = root
+        probes = discover_probes()
+    return probes
+
+
+def get_probe(name=BATH_PROBE):
+    """Return the probe with the given name, or None if it is not connected."""
+    for probe in probes:
+        if probe.name == name:
+            return probe
+    return None
+
+
+def get_temp(name=BATH_PROBE):
+    """Return the latest calibrated temperature of a probe.
+
+    Args:
+        name (str): Probe name, the bath probe by default.
+
+    Returns:
+        float or None: Temperature in C, or None if the probe has no reading.
+    """
+    reading = readings.get(name)
+    return reading.temp if reading else None
 
 
-def read_temp_raw():
-    with open(device_file, 'r') as f: #reads the temperature directly from the file
-        return f.readlines()
+def get_raw_temp(name=BATH_PROBE):
+    """Return the sensor's own value behind a probe's latest reading, before filtering and calibration."""
+    reading = readings.get(name)
+    return reading.raw if reading else None
 
 
-def temp_celsius():  #after reading the file, this function converts that info into celsius and makes that its return value
-    lines = read_temp_raw()
+def get_filter(name=BATH_PROBE):
+    """Return a probe's TempFilter, creating it on first use."""
+    probe_filter = filters.get(name)
+    if probe_filter is None:
+        probe_filter = filters[name] = TempFilter()
+    return probe_filter
 
-    while lines[0].strip()[-3:] != 'YES':
-        if _stop_event.is_set():
+
+def get_history(name=BATH_PROBE):
+    """Return a probe's TempHistory, creating it on first use.
+
+    Args:
+        name (str): Probe name, the bath probe by default.
+
+    Returns:
+        TempHistory: Ring buffer of the probe's readings with rolling stats.
+    """
+    probe_history = history.get(name)
+    if probe_history is None:
+        probe_history = history[name] = TempHistory(HISTORY_CAPACITY, HISTORY_WINDOWS)
+    return probe_history
+
+
+def read_temp_raw(device_file):
+    """Read a sensor's sysfs file through a persistent descriptor.
+
+    Every pread() at offset 0 makes the kernel produce a fresh reading, so the
+    file is opened once instead of on every sample. A failed read closes the
+    descriptor, so the next call reopens the file: a sensor that dropped off
+    the bus gets a new sysfs node when it comes back.
+
+    Args:
+        device_file (str): The sensor's temperature or w1_slave file.
+
+    Returns:
+        list: Lines of the file (one for temperature, two for w1_slave).
+
+    Raises:
+        OSError: The file could not be opened or read.
+    """
+    fd = _fds.get(device_file)
+    if fd is None:
+        fd = _fds[device_file] = os.open(device_file, os.O_RDONLY)
+    try:
+        data = os.pread(fd, 256, 0)
+    except OSError:
+        os.close(_fds.pop(device_file))
+        raise
+    return data.decode('ascii', 'replace').splitlines()
+
+
+def temp_celsius(probe=None):  #after reading the file, this function converts that info into celsius and makes that its return value
+    probe = probe or get_probe()
+    if probe is None:
+        return None
+
+    try:
+        lines = read_temp_raw(probe.device_file)
+    except OSError:  #the temperature attribute fails the read on a CRC error or a lost sensor
+        return None
+
+    if probe.device_file.endswith('/temperature'):
+        try:
+            return int(lines[0]) / 1000.0
+        except (IndexError, ValueError):
             return None
-        time.sleep(0.05)
-        lines = read_temp_raw()
+
+    if len(lines) < 2 or lines[0].strip()[-3:] != 'YES':
+        return None  #bad CRC: skip this sample rather than spinning, the next one retries
 
     equals_pos = lines[1].find('t=')
     if equals_pos != -1:
@@ -44,30 +216,231 @@ def temp_celsius():  #after reading the file, this function converts that info i
     return None
 
 
-def _periodic_temp():
-    global actual_temp
+def trigger_bulk_conversion():
+    """Start a temperature conversion on every sensor on the bus at once.
+
+    The following reads of each sensor wait for that single conversion
+    instead of starting their own, so N probes cost one conversion window.
+
+    Returns:
+        bool: True if the bus master accepted the trigger.
+    """
+    try:
+        with open(bulk_read_file, 'w') as f:
+            f.write('trigger')
+    except OSError:  #older kernels without bulk read, or not running as root
+        return False
+    return True
+
+
+def get_resolution(probe=None):
+    """Return a probe's conversion resolution in bits, or None if unsupported."""
+    probe = probe or get_probe()
+    try:
+        with open(probe.resolution_file, 'r') as f:
+            return int(f.read())
+    except (AttributeError, OSError, ValueError):
+        return None
+
 
+def set_resolution(bits, probe=None):
+    """Set the conversion resolution through the sysfs attribute.
+
+    Lower resolution trades precision for speed: 9 bits (0.5 C) converts in
+    about 94 ms, 12 bits (0.0625 C) in 750 ms. See CONVERSION_TIME.
+
+    Args:
+        bits (int): Resolution, 9 to 12.
+        probe (Probe or None): Probe to configure. None sets every probe.
+
+    Returns:
+        bool: True if the kernel accepted the new resolution on every probe.
+    """
+    if bits not in CONVERSION_TIME:
+        raise ValueError(f"DS18B20 resolution must be 9-12 bits, got {bits}")
+
+    accepted = True
+    for target in ([probe] if probe else probes):
+        try:
+            with open(target.resolution_file, 'w') as f:
+                f.write(str(bits))
+        except OSError:  #older kernels, or not running as root
+            accepted = False
+    return accepted
+
+
+@metrics.timed(metrics.SENSOR_READ)
+def sample():
+    """Read every probe once and publish a new readings snapshot.
+
+    With more than one probe a bulk conversion is triggered first so all of
+    them share one conversion window. Each raw value goes through the probe's
+    TempFilter; a probe whose read fails keeps its previous reading. When the
+    filter rejects a value as a glitch, the reading's raw value and timestamp
+    are still brought up to date, so the heater's watchdog sees a live probe
+    through a run of rejections, but its filtered temperature is held. Only
+    accepted readings are appended to the probe's history.
+    Threads waiting on new_sample are woken as soon as the snapshot is in place.
+
+    Returns:
+        dict: The new readings snapshot.
+    """
+    global readings, sample_count
+
+    if len(probes) > 1:
+        trigger_bulk_conversion()
+
+    snapshot = dict(readings)
+    for probe in probes:
+        raw = temp_celsius(probe)
+        if raw is None:
+            continue
+        timestamp = clock.monotonic()
+        temp = get_filter(probe.name).update(raw, timestamp)
+        if temp is None:
+            metrics.count(metrics.TEMP_REJECTED)
+            previous = snapshot.get(probe.name)
+            if previous is not None:  # The probe still answered: fresh raw value and timestamp, held filtered value
+                snapshot[probe.name] = Reading(previous.temp, raw, timestamp)
+            continue
+        reading = Reading(temp + probe.offset, raw, timestamp)
+        snapshot[probe.name] = reading
+        get_history(probe.name).append(reading.timestamp, reading.temp, heater_on)
+
+    readings = snapshot
+    sample_count += 1  # Before taking the lock, so a waiter polling its predicate sees it without it
+    with new_sample:
+        new_sample.notify_all()
+    if dashboard.enabled:
+        dashboard.publish(temps={name: round(reading.temp, 1) for name, reading in snapshot.items()})
+    return snapshot
+
+
+def choose_rate(snapshot):
+    """Return the sampling rate suited to the bath right now.
+
+    Fast and coarse while the heater may be about to switch, slow and at
+    full resolution while nothing is happening, slower still between sessions.
+
+    Args:
+        snapshot (dict): Readings snapshot returned by sample().
+
+    Returns:
+        tuple: (interval in seconds, resolution in bits), one of FAST_SAMPLING,
+        STABLE_SAMPLING and IDLE_SAMPLING.
+    """
+    if get_probe(BATH_PROBE) is None:
+        return IDLE_SAMPLING  #nothing to regulate
+    reading = snapshot.get(BATH_PROBE)
+    if reading is None:
+        return FAST_SAMPLING  #get a reading to the heater before its watchdog trips
+
+    stats = get_history(BATH_PROBE).stats(HISTORY_WINDOWS[0])
+    slope = stats.slope if stats is not None else 0.0
+    if abs(slope) >= FAST_SLOPE_C_PER_S:
+        return FAST_SAMPLING
+
+    ahead = reading.temp + slope * LOOKAHEAD_S
+    low, high = min(reading.temp, ahead) - NEAR_THRESHOLD_C, max(reading.temp, ahead) + NEAR_THRESHOLD_C
+    if any(low <= threshold <= high for threshold in thresholds_c):
+        return FAST_SAMPLING
+    return STABLE_SAMPLING if session_running else IDLE_SAMPLING
+
+
+def _sample_adaptive():
+    """Run sample(), then set sample_interval and the probes' resolution for the next one."""
+    global sample_interval, resolution
+
+    snapshot = sample()
+    if adaptive:
+        sample_interval, bits = choose_rate(snapshot)
+        if bits != resolution:
+            set_resolution(bits)  #a kernel that refuses keeps converting at its own resolution
+            resolution = bits
+    return snapshot
+
+
+def _periodic_temp():
     while not _stop_event.is_set():
-        temp = temp_celsius()
+        metrics.count(metrics.TEMP_WAKEUPS)
+        _sample_adaptive()
+        clock.wait(_stop_event, sample_interval)
+
+
+def wait_for_sample(seen, timeout=None, stop=None):
+    """Block until sample() has run since sample_count was seen.
+
+    Args:
+        seen (int): sample_count when the caller last looked at readings.
+        timeout (float or None): Seconds to give up after.
+        stop (threading.Event or None): Also return once this is set;
+            whoever sets it should call wake_waiters().
 
-        if temp is not None:
-            actual_temp = temp
+    Returns:
+        int: The current sample_count, equal to seen on a timeout.
+    """
+    with new_sample:
+        clock.wait_for(new_sample, lambda: sample_count != seen or (stop is not None and stop.is_set()), timeout)
+        return sample_count
+
+
+def wake_waiters():
+    """Wake every thread in wait_for_sample() so it can check its stop event."""
+    with new_sample:
+        new_sample.notify_all()
 
-        _stop_event.wait(1)
+
+def subscribe():
+    """Return an asyncio queue that run() puts every new readings snapshot on.
+
+    The queue holds one snapshot: if the subscriber falls behind, the
+    older snapshot is replaced, never queued up.
+    """
+    samples = asyncio.Queue(maxsize=1)
+    _subscribers.add(samples)
+    return samples
+
+
+def unsubscribe(samples):
+    """Stop feeding a queue returned by subscribe()."""
+    _subscribers.discard(samples)
+
+
+async def run():
+    """Sample the sensors at the adaptive rate as an asyncio task.
+
+    The blocking sysfs reads run in the loop's default executor so the
+    event loop keeps serving the other tasks during the conversion. Each
+    snapshot is handed to the subscribe() queues as soon as it is read.
+    Cancel the task to stop sampling.
+    """
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, init)
+
+    while True:
+        metrics.count(metrics.TEMP_WAKEUPS)
+        snapshot = await loop.run_in_executor(None, _sample_adaptive)
+        for samples in _subscribers:
+            if samples.full():
+                samples.get_nowait()
+            samples.put_nowait(snapshot)
+        await asyncio.sleep(sample_interval)
 
 
 def start():
-    
+
     """Start the background temperature monitoring thread in the backrground
-    The thread continuously reads data from the DS18B20 sensor and updates
-    the global actual_temp variable so other modules can access the
-    current temperature in real time.
+    The thread continuously reads data from the DS18B20 sensors and replaces
+    the readings snapshot so other modules can access the current
+    temperature of each probe in real time. How often, and at what
+    resolution, follows the bath: see choose_rate().
     """
-    
+
     global _worker
     if _worker and _worker.is_alive():
         return _worker
 
+    init()
     _stop_event.clear()
     _worker = threading.Thread(target=_periodic_temp, daemon=True)
     _worker.start()
@@ -75,10 +448,10 @@ def start():
 
 
 def cleanup():
-    """Stop background temperature thread to help cleanup."""
+    """Stop background temperature thread and close the sensor files to help cleanup."""
     _stop_event.set()
     if _worker and _worker.is_alive():
         _worker.join(timeout=1.5)
-
-
-start()
+    for fd in _fds.values():
+        os.close(fd)
+    _fds.clear()
@@ -0,0 +1,88 @@
+# tempfilter.py
+# Streaming filter between a probe's raw readings and the temperature everything acts on.
+#
+# Each reading is checked and folded into a scalar Kalman filter in O(1):
+#  - impossible values are dropped: outside the DS18B20's -55 to 125 C range (a failed
+#    read shows up as -127 C) and the 85.0 C power-on value, unless the estimate is near 85
+#  - spikes further from the estimate than SPIKE_C are dropped; a change that persists for
+#    CONFIRM_SAMPLES readings in a row is real (the probe was moved) and restarts the filter
+#  - the rest update a random-walk estimate whose gain falls as the readings agree, so
+#    quantisation steps and noise stop toggling the relay and the LCD's last digit
+
+import math
+
+MIN_C = -55.0                # DS18B20 measuring range
+MAX_C = 125.0
+POWER_ON_C = 85.0            # Register value before the first conversion, read after a brown-out
+MEASUREMENT_NOISE_C = 0.1    # Standard deviation of one reading, quantisation included
+PROCESS_NOISE_C = 0.01       # How far the true temperature can wander in one second, standard deviation
+SPIKE_C = 1.5                # Readings further than this from the estimate are held back as spikes
+CONFIRM_SAMPLES = 3          # Held back readings in a row that agree with each other before they are believed
+
+
+class TempFilter:
+    """Outlier rejection and scalar Kalman smoothing of one probe's readings.
+
+    Args:
+        measurement_noise_c (float): Standard deviation of one reading in C.
+        process_noise_c (float): Standard deviation of the true temperature's drift per second.
+    """
+
+    __slots__ = ("r", "q", "estimate", "variance", "last_time", "held", "rejected")
+
+    def __init__(self, measurement_noise_c=MEASUREMENT_NOISE_C, process_noise_c=PROCESS_NOISE_C):
+        self.r = measurement_noise_c ** 2
+        self.q = process_noise_c ** 2
+        self.estimate = None   # Filtered temperature in C, None until the first good reading
+        self.variance = 0.0
+        self.last_time = None
+        self.held = []         # Spikes held back in a row, at most CONFIRM_SAMPLES
+        self.rejected = 0      # Readings dropped so far
+
+    def plausible(self, raw):
+        """Return False for readings the sensor cannot mean: out of range, or a power-on reset."""
+        if raw is None or math.isnan(raw) or not MIN_C <= raw <= MAX_C:
+            return False
+        return raw != POWER_ON_C or (self.estimate is not None and abs(self.estimate - POWER_ON_C) <= SPIKE_C)
+
+    def _restart(self, raw, timestamp):
+        self.estimate = raw
+        self.variance = self.r
+        self.last_time = timestamp
+        self.held.clear()
+
+    def update(self, raw, timestamp):
+        """Fold one reading into the estimate.
+
+        Args:
+            raw (float or None): Sensor reading in C.
+            timestamp (float): clock.monotonic() of the reading.
+
+        Returns:
+            float or None: The new estimate, or None if the reading was rejected.
+        """
+        if not self.plausible(raw):
+            self.rejected += 1
+            return None
+
+        if self.estimate is None:
+            self._restart(raw, timestamp)
+            return self.estimate
+
+        if abs(raw - self.estimate) > SPIKE_C:
+            if self.held and abs(raw - self.held[-1]) > SPIKE_C:
+                self.held.clear()  # Scattered glitches, not a new level
+            self.held.append(raw)
+            if len(self.held) < CONFIRM_SAMPLES:
+                self.rejected += 1
+                return None
+            self._restart(raw, timestamp)
+            return self.estimate
+
+        self.held.clear()
+        self.variance += self.q * max(0.0, timestamp - self.last_time)
+        gain = self.variance / (self.variance + self.r)
+        self.estimate += gain * (raw - self.estimate)
+        self.variance *= 1.0 - gain
+        self.last_time = timestamp
+        return self.estimate
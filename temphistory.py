@@ -0,0 +1,228 @@
+# temphistory.py
+# Fixed-size temperature history with rolling statistics over time windows
+
+import math
+import threading
+from array import array
+from collections import deque, namedtuple
+
+WindowStats = namedtuple("WindowStats", ["count", "mean", "min", "max", "variance", "slope"])  # slope in C per second
+Sample = namedtuple("Sample", ["timestamp", "temp", "heater_on"])
+
+_RESYNC_EVERY = 4096  # Removals between exact recomputations of a window's running sums
+
+
+class _Window:
+    """Running sums and min/max candidates for the samples inside one time span.
+
+    Times are stored relative to `origin` so the sums of t and t*t stay small
+    enough for the incremental updates to keep their precision.
+    """
+
+    __slots__ = ("span", "start", "origin", "n", "sum_y", "sum_yy", "sum_t", "sum_tt", "sum_ty",
+                 "min_idx", "max_idx", "removed")
+
+    def __init__(self, span):
+        self.span = span
+        self.start = 0          # Absolute index of the oldest sample in the window
+        self.origin = None
+        self.n = 0
+        self.sum_y = self.sum_yy = 0.0
+        self.sum_t = self.sum_tt = self.sum_ty = 0.0
+        self.min_idx = deque()  # Absolute indices with increasing temperatures
+        self.max_idx = deque()  # Absolute indices with decreasing temperatures
+        self.removed = 0
+
+    def add(self, t, y):
+        t -= self.origin
+        self.n += 1
+        self.sum_y += y
+        self.sum_yy += y * y
+        self.sum_t += t
+        self.sum_tt += t * t
+        self.sum_ty += t * y
+
+    def remove(self, t, y):
+        t -= self.origin
+        self.n -= 1
+        self.sum_y -= y
+        self.sum_yy -= y * y
+        self.sum_t -= t
+        self.sum_tt -= t * t
+        self.sum_ty -= t * y
+        self.removed += 1
+
+
+class TempHistory:
+    """Ring buffer of (timestamp, temperature, heater state) samples.
+
+    Storage is three preallocated arrays, so memory stays flat no matter how
+    long the process runs. Every window keeps running sums and monotonic
+    min/max queues that are updated as samples enter and leave it, so
+    append() and stats() cost O(1) (amortised) regardless of history length.
+
+    Args:
+        capacity (int): Number of samples kept. Older samples are overwritten.
+        windows (iterable): Window lengths in seconds that stats() can report.
+    """
+
+    def __init__(self, capacity=86400, windows=(60, 300, 900)):
+        self.capacity = capacity
+        self._ts = array("d", bytes(8 * capacity))
+        self._temp = array("d", bytes(8 * capacity))
+        self._heater = array("b", bytes(capacity))
+        self._count = 0  # Total samples ever appended; the next absolute index
+        self._windows = {span: _Window(span) for span in windows}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    def append(self, timestamp, temp, heater_on=False):
+        """Add a sample and slide every window forward.
+
+        Args:
+            timestamp (float): time.monotonic() of the reading.
+            temp (float): Temperature in C.
+            heater_on (bool): Heater relay state when the reading was taken.
+        """
+        with self._lock:
+            idx = self._count
+            oldest = idx + 1 - self.capacity  # The sample below this is about to be overwritten
+            for window in self._windows.values():
+                while window.start < oldest:  # Evicted while its values are still in the slot
+                    self._evict(window)
+
+            slot = idx % self.capacity
+            self._ts[slot] = timestamp
+            self._temp[slot] = temp
+            self._heater[slot] = 1 if heater_on else 0
+            self._count += 1
+
+            for window in self._windows.values():
+                if window.origin is None:
+                    window.origin = timestamp
+                window.add(timestamp, temp)
+
+                while window.min_idx and self._temp[window.min_idx[-1] % self.capacity] >= temp:
+                    window.min_idx.pop()
+                window.min_idx.append(idx)
+                while window.max_idx and self._temp[window.max_idx[-1] % self.capacity] <= temp:
+                    window.max_idx.pop()
+                window.max_idx.append(idx)
+
+                cutoff = timestamp - window.span
+                while window.start < idx and self._ts[window.start % self.capacity] <= cutoff:
+                    self._evict(window)
+
+                if window.removed >= _RESYNC_EVERY:
+                    self._resync(window)
+
+    def _evict(self, window):
+        """Drop the oldest sample from a window. Call with the lock held."""
+        old = window.start % self.capacity
+        window.remove(self._ts[old], self._temp[old])
+        if window.min_idx and window.min_idx[0] == window.start:
+            window.min_idx.popleft()
+        if window.max_idx and window.max_idx[0] == window.start:
+            window.max_idx.popleft()
+        window.start += 1
+
+    def _resync(self, window):
+        """Recompute a window's sums exactly, rebased on its oldest sample. Call with the lock held."""
+        window.origin = self._ts[window.start % self.capacity]
+        window.n = 0
+        window.sum_y = window.sum_yy = 0.0
+        window.sum_t = window.sum_tt = window.sum_ty = 0.0
+        for idx in range(window.start, self._count):
+            slot = idx % self.capacity
+            window.add(self._ts[slot], self._temp[slot])
+        window.removed = 0
+
+    def stats(self, window=60):
+        """Return rolling statistics over one of the configured windows.
+
+        Args:
+            window (float): Window length in seconds, as given to the constructor.
+
+        Returns:
+            WindowStats or None: count, mean, min, max, variance and least-squares
+            slope (C per second), or None if the window has no samples.
+        """
+        with self._lock:
+            w = self._windows[window]
+            n = w.n
+            if n == 0:
+                return None
+
+            mean = w.sum_y / n
+            variance = max(0.0, w.sum_yy / n - mean * mean)
+
+            t_var = w.sum_tt - w.sum_t * w.sum_t / n
+            slope = (w.sum_ty - w.sum_t * w.sum_y / n) / t_var if n > 1 and t_var > 1e-9 else 0.0
+
+            return WindowStats(
+                count=n,
+                mean=mean,
+                min=self._temp[w.min_idx[0] % self.capacity],
+                max=self._temp[w.max_idx[0] % self.capacity],
+                variance=variance,
+                slope=slope,
+            )
+
+    def stddev(self, window=60):
+        """Return the standard deviation over a window, or None if it is empty."""
+        s = self.stats(window)
+        return math.sqrt(s.variance) if s else None
+
+    def latest(self):
+        """Return the newest Sample, or None if nothing was recorded yet."""
+        with self._lock:
+            if self._count == 0:
+                return None
+            slot = (self._count - 1) % self.capacity
+            return Sample(self._ts[slot], self._temp[slot], bool(self._heater[slot]))
+
+    def since(self, index):
+        """Return the samples appended from an absolute index on, for readers that poll.
+
+        Unlike samples(since=...), this only touches the new samples.
+        Samples already overwritten are skipped.
+
+        Args:
+            index (int): Absolute index from the previous call, 0 the first time.
+
+        Returns:
+            tuple: (list of Sample, index to pass to the next call).
+        """
+        with self._lock:
+            last = self._count
+            new = []
+            for idx in range(max(index, last - self.capacity), last):
+                slot = idx % self.capacity
+                new.append(Sample(self._ts[slot], self._temp[slot], bool(self._heater[slot])))
+        return new, last
+
+    def samples(self, since=None):
+        """Yield the stored samples oldest first, without copying the buffer.
+
+        Each sample is read under the lock, so one appended meanwhile cannot
+        tear it, but the lock is not held while the caller has it.
+
+        Args:
+            since (float or None): Only yield samples newer than this timestamp.
+
+        Yields:
+            Sample: One sample at a time.
+        """
+        with self._lock:
+            first, last = max(0, self._count - self.capacity), self._count
+
+        for idx in range(first, last):
+            slot = idx % self.capacity
+            with self._lock:
+                if idx < self._count - self.capacity:
+                    continue  # Overwritten while iterating
+                sample = Sample(self._ts[slot], self._temp[slot], bool(self._heater[slot]))
+            if since is None or sample.timestamp > since:
+                yield sample
@@ -0,0 +1,23 @@
+# test_hd44780.py
+# I2CLcd's block transfers against the per-nibble writes of the old driver, on
+# hd44780's mocked bus. Run with:  python3 -m pytest
+
+import hd44780
+from hd44780 import I2CLcd, MockBus
+
+
+def test_write_at_is_one_transfer():
+    bus = MockBus()
+    lcd = I2CLcd(bus)
+    bus.transactions = bus.bits = 0
+    lcd.lcd_write_at(hd44780.ROW_OFFSETS[1], "00:42")
+    assert bus.transactions == 1
+    assert bus.bits == 1 + 9 + 9 * 4 * 6 + 1  # Cursor move and 5 characters, 4 port writes each
+
+
+def test_block_write_beats_per_nibble():
+    results = hd44780.benchmark("00:42", repeat=1)
+    nibble_transactions, nibble_wire_s, _ = results["per-nibble"]
+    block_transactions, block_wire_s, _ = results["block"]
+    assert (nibble_transactions, block_transactions) == (36, 1)
+    assert block_wire_s < nibble_wire_s / 3
@@ -0,0 +1,20 @@
+# test_interfacing.py
+# Screens built from the recipe rather than hard-coded. Run with:  python3 -m pytest
+
+import recipes
+from interfacing import LCD_COLS, UI
+
+
+def test_stage_menu_shows_the_recipe_stages():
+    loaded, _ = recipes.load_recipes()
+    assert UI._stage_menu(recipes.stage_names(loaded["bw"])) == ["1 Dev  3 Fixing", "2 Stop 4 Photoflo"]
+    assert UI._stage_menu(recipes.stage_names(loaded["c41"])) == ["1 Dev  3 Wash", "2 Blix 4 Stabilizer"]
+
+
+def test_stage_menu_fits_the_lcd():
+    assert UI._stage_menu(("Developing", "Stop bath", "Fixing", "Final rinse")) == [
+        "1 Developing 3 Fixin",
+        "2 Stop bath  4 Final",
+    ]
+    assert UI._stage_menu(("Dev",)) == ["1 Dev", ""]
+    assert all(len(line) <= LCD_COLS for line in UI._stage_menu(("x" * 30,) * 4))
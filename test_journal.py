@@ -0,0 +1,115 @@
+# test_journal.py
+# Reading the session journal back with journal.recover(). Run with:  python3 -m pytest
+
+import journal
+from journal import Journal
+
+
+def test_no_journal(tmp_path):
+    assert journal.recover(tmp_path / "missing.journal") is None
+
+
+def test_running_stage_is_recovered(tmp_path):
+    path = tmp_path / "session.journal"
+    session = Journal(path)
+    session.begin("bw", True, history=42)
+    session.dev_settings(300, 1)
+    session.stage_start(1)
+    session.checkpoint(1, 30.0, now=0.0, equivalent=12.345)
+    session.close()
+
+    recovery = journal.recover(path)
+    assert (recovery.recipe, recovery.history, recovery.compensate) == ("bw", 42, True)
+    assert (recovery.dev_seconds, recovery.dev_level) == (300, 1)
+    assert (recovery.last_stage, recovery.stage, recovery.offset) == (None, 1, 30.0)
+    assert recovery.equivalent == 12.35
+    assert not recovery.paused
+
+
+def test_pause_and_stage_end(tmp_path):
+    path = tmp_path / "session.journal"
+    session = Journal(path)
+    session.begin("bw", False)
+    session.stage_start(1)
+    session.pause(1, 31.0)
+    assert journal.recover(path).paused and journal.recover(path).offset == 31.0
+
+    session.resume(1, 31.0)
+    session.stage_end(1)
+    session.close()
+    recovery = journal.recover(path)
+    assert (recovery.last_stage, recovery.stage, recovery.offset, recovery.paused) == (1, None, 0.0, False)
+
+
+def test_reopened_session_continues(tmp_path):
+    path = tmp_path / "session.journal"
+    session = Journal(path)
+    session.begin("bw", False)
+    session.stage_start(2, offset=10.0)
+    session.close()
+
+    session = Journal(path)
+    session.reopen()
+    session.checkpoint(2, 45.0, now=0.0)
+    session.close()
+    recovery = journal.recover(path)
+    assert (recovery.stage, recovery.offset) == (2, 45.0)
+
+
+def test_finished_session_is_not_offered(tmp_path):
+    path = tmp_path / "session.journal"
+    session = Journal(path)
+    session.begin("bw", False)
+    session.stage_start(1)
+    session.stage_end(1)
+    session.end()
+    assert journal.recover(path) is None
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    path = tmp_path / "session.journal"
+    session = Journal(path)
+    session.begin("bw", False)
+    session.stage_start(1)
+    session.checkpoint(1, 15.0, now=0.0)
+    session.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"stage":1,"offset":30.0,"equ')  # Died mid-write
+
+    recovery = journal.recover(path)
+    assert (recovery.stage, recovery.offset) == (1, 15.0)
+
+
+def test_discard_deletes_the_journal(tmp_path):
+    path = tmp_path / "session.journal"
+    session = Journal(path)
+    session.begin("bw", False)
+    session.discard()
+    assert not path.exists()
+    assert journal.recover(path) is None
+
+
+def test_only_the_newest_checkpoint_is_written_between_writes(tmp_path):
+    path = tmp_path / "session.journal"
+    session = Journal(path, checkpoint_s=15.0, write_s=60.0)
+    session.begin("bw", False)
+    session.stage_start(1)
+    start = session.next_checkpoint
+
+    def written():
+        return path.read_text(encoding="utf-8").count('"checkpoint"')
+
+    for n in range(4):
+        session.checkpoint(1, 15.0 * (n + 1), now=start + 15.0 * n)
+    assert written() == 0  # Held in memory, one at a time
+    assert len(session._pending) == 1
+    session.checkpoint(1, 75.0, now=start + 60.0)
+    assert written() == 1
+    assert journal.recover(path).offset == 75.0
+
+    session.checkpoint(1, 90.0, now=start + 75.0)
+    session.pause(1, 95.0)  # Written at once, with the checkpoint before it
+    assert written() == 2
+    recovery = journal.recover(path)
+    assert recovery.paused and recovery.offset == 95.0
+    session.close()
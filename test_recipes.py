@@ -0,0 +1,76 @@
+# test_recipes.py
+# Stage timelines: compile_stage() and chain_stages(). Run with:  python3 -m pytest
+
+import pytest
+import recipes
+from recipes import DEV, Event, Step, compile_stage, chain_stages
+
+PRESOAK = Step("Pre-Soak", 60, "blue", None)
+DEVELOP = Step("Developing...", DEV, "yellow", ("every", 10.0, 30.0))
+STOP = Step("Stop", 30, None, ("windows", ((0.0, 5.0), (25.0, 10.0))))
+
+
+def kinds(timeline):
+    return [(event.offset, event.kind) for event in timeline]
+
+
+def test_steps_run_back_to_back_with_gaps():
+    timeline = compile_stage((PRESOAK, DEVELOP), dev_seconds=70)
+
+    assert kinds(timeline) == [
+        (0.0, recipes.STAGE_START),
+        (0.0, recipes.STEP_START),
+        (60.0, recipes.STEP_END),
+        (60.5, recipes.STEP_START),
+        (60.5, recipes.AGITATE),
+        (90.5, recipes.AGITATE),
+        (120.5, recipes.AGITATE),
+        (130.5, recipes.STEP_END),
+        (131.0, recipes.STAGE_END),
+    ]
+    presoak, develop = (event for event in timeline if event.kind == recipes.STEP_START)
+    assert presoak == Event(0.0, recipes.STEP_START, "Pre-Soak".center(20), 60.0, "blue", False)
+    assert develop.end == 130.5 and develop.dev and develop.led == "yellow"
+    assert [event.end for event in timeline if event.kind == recipes.AGITATE] == [70.5, 100.5, 130.5]
+
+
+def test_agitation_windows_are_cut_at_the_step_end():
+    timeline = compile_stage((STOP,))
+    agitate = [(event.offset, event.end) for event in timeline if event.kind == recipes.AGITATE]
+    assert agitate == [(0.0, 5.0), (25.0, 30.0)]
+
+
+def test_dev_step_needs_a_time():
+    with pytest.raises(ValueError):
+        compile_stage((DEVELOP,))
+
+
+def test_dev_label_and_stretch():
+    timeline = compile_stage((DEVELOP, STOP), dev_seconds=100.4, dev_label="Dev 01:40  +1".ljust(20), dev_stretch=2.0)
+
+    develop = timeline[1]
+    assert develop.label == "Dev 01:40  +1".ljust(20)
+    assert develop.end == 201.0  # round(100.4 * 2)
+    assert timeline[-1].offset == 201.0 + 0.5 + 30 + 0.5
+
+
+def test_chain_stages_shifts_offsets_and_ends():
+    first = compile_stage((PRESOAK,))
+    second = compile_stage((STOP,))
+    chained = chain_stages((first, second))
+
+    assert len(chained) == len(first) + len(second)
+    assert chained[:len(first)] == first
+    base = first[-1].offset
+    for event, original in zip(chained[len(first):], second):
+        assert event.offset == original.offset + base
+        assert event.end == (None if original.end is None else original.end + base)
+        assert event[1:3] == original[1:3]
+    assert [event.offset for event in chained] == sorted(event.offset for event in chained)
+
+
+def test_stage_names_follow_the_recipe():
+    loaded, _ = recipes.load_recipes()
+    assert recipes.stage_names(loaded["bw"]) == ("Dev", "Stop", "Fixing", "Photoflo")
+    assert recipes.stage_names(loaded["bw-rapid-fixer"]) == ("Dev", "Stop", "Fixing", "Photoflo")
+    assert recipes.stage_names(loaded["c41"]) == ("Dev", "Blix", "Wash", "Stabilizer")
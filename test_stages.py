@@ -0,0 +1,155 @@
+# test_stages.py
+# Playback of a stage timeline: seek() to resume part way through and track() of a
+# compensated development step. Run with:  python3 -m pytest
+
+import recipes
+from compensation import Compensator
+from recipes import DEV, Step, compile_stage
+from journal import Journal
+from stages import Playback, Stages
+
+PRESOAK = Step("Pre-Soak", 60, "blue", None)
+DEVELOP = Step("Developing...", DEV, "yellow", ("every", 10.0, 30.0))
+STOP = Step("Stop", 30, None, None)
+
+
+def drain(playback, now):
+    """Return the kinds of every event due at now."""
+    due = []
+    event = playback.pop_due(now)
+    while event is not None:
+        due.append(event.kind)
+        event = playback.pop_due(now)
+    return due
+
+
+def test_events_come_due_in_order():
+    playback = Playback(compile_stage((PRESOAK, STOP)), start=100.0)
+    assert drain(playback, 100.0) == [recipes.STAGE_START, recipes.STEP_START]
+    assert playback.step.label.strip() == "Pre-Soak"
+    assert playback.next_time() == 160.0 and playback.step_end() == 160.0
+    assert drain(playback, 159.9) == []
+    assert drain(playback, 160.0) == [recipes.STEP_END]
+    assert playback.step is None
+
+    playback.pause(20.0)
+    assert playback.next_time() == 180.5
+    assert drain(playback, 300.0) == [recipes.STEP_START, recipes.STEP_END, recipes.STAGE_END]
+    assert playback.finished
+
+
+def test_seek_returns_what_is_under_way():
+    playback = Playback(compile_stage((PRESOAK, DEVELOP), dev_seconds=70), start=100.0)
+    under_way = playback.seek(65.0)
+
+    assert [(event.offset, event.kind) for event in under_way] == [
+        (65.0, recipes.STAGE_START),
+        (65.0, recipes.STEP_START),
+        (65.0, recipes.AGITATE),
+    ]
+    assert under_way[1].end == 130.5 and under_way[2].end == 70.5  # Ends stay put
+    assert playback.start == 35.0
+    assert playback.step.label.strip() == "Developing..."
+    assert playback.offset(100.0) == 65.0
+    assert playback.next_time() == 35.0 + 90.5
+
+
+def test_seek_past_a_finished_agitation():
+    playback = Playback(compile_stage((PRESOAK, DEVELOP), dev_seconds=70), start=0.0)
+    under_way = playback.seek(75.0)
+    assert [event.kind for event in under_way] == [recipes.STAGE_START, recipes.STEP_START]
+
+
+def compensated(dev_seconds=100, reference_c=20.0):
+    timeline = compile_stage((DEVELOP, STOP), dev_seconds=dev_seconds, dev_stretch=2.0)
+    playback = Playback(timeline, start=0.0, compensator=Compensator(dev_seconds, reference_c))
+    drain(playback, 0.0)
+    return playback
+
+
+def test_track_at_the_reference_temperature():
+    playback = compensated()
+    assert playback.step.end == 200.0  # Laid out at its longest
+    playback.track(20.0, 0.0)
+
+    assert playback.shift == -100.0
+    assert playback.step_end() == 100.0
+    assert playback.next_time() == 30.0  # Agitation windows up to the real end still run
+    assert drain(playback, 99.0) == [recipes.AGITATE, recipes.AGITATE, recipes.AGITATE]
+    assert drain(playback, 100.0) == [recipes.STEP_END]  # Later windows are skipped
+    assert playback.next_time() == 100.5
+
+
+def test_track_follows_the_temperature():
+    playback = compensated()
+    playback.track(20.0, 0.0)
+    playback.track(23.0, 50.0)  # Half done at 20 °C, the rest runs faster
+    warm_end = playback.step_end()
+    assert 50.0 < warm_end < 100.0
+
+    playback.track(23.0, 60.0)
+    assert abs(playback.step_end() - warm_end) < 1e-9  # Steady temperature, steady prediction
+
+
+def test_track_against_the_recipe_setpoint():
+    playback = compensated(reference_c=38.0)
+    playback.track(38.0, 0.0)
+    assert playback.step_end() == 100.0  # C-41 at its own temperature runs its nominal time
+
+
+def test_journalled_offset_and_equivalent():
+    playback = compensated()
+    playback.track(20.0, 0.0)
+    playback.track(23.0, 50.0)
+    end = playback.step_end()
+    assert 0.0 < playback.equivalent() < 100.0
+    assert playback.offset(end) == 200.0  # Journalled as the compiled end, past the shift
+
+
+def test_seek_restores_compensated_progress():
+    playback = Playback(compile_stage((DEVELOP, STOP), dev_seconds=100, dev_stretch=2.0), start=0.0,
+                        compensator=Compensator(100))
+    playback.seek(40.0, equivalent=40.0)
+    playback.track(20.0, 0.0)
+    assert playback.compensator.equivalent_s == 40.0
+    assert playback.step_end() == 60.0
+
+
+def test_seek_into_the_compensated_step_without_a_checkpoint():
+    playback = Playback(compile_stage((PRESOAK, DEVELOP), dev_seconds=100, dev_stretch=2.0), start=0.0,
+                        compensator=Compensator(100))
+    playback.seek(90.5)  # 30 s into development, none journalled yet
+    assert playback.compensator.equivalent_s == 30.0
+
+
+class FakeUI:
+    stage_names = ()
+
+    def set_hold_time(self, seconds):
+        pass
+
+
+def dev_stages(tmp_path, compensate):
+    loaded, _ = recipes.load_recipes()
+    stages = Stages(FakeUI(), loaded["bw"], compensate, Journal(tmp_path / "session.journal"))
+    stages.set_dev_settings(300, 0)
+    return stages
+
+
+def test_stage_remaining_uncompensated(tmp_path):
+    stages = dev_stages(tmp_path, compensate=False)
+    end = stages.timelines[1][-1].offset
+    assert end == 60 + 0.5 + 300 + 0.5
+    assert stages.stage_remaining(1, 100.0) == end - 100.0
+
+
+def test_stage_remaining_follows_the_compensated_development(tmp_path):
+    stages = dev_stages(tmp_path, compensate=True)
+    timeline = stages.timelines[1]
+    assert timeline[-1].offset == 60 + 0.5 + 600 + 0.5  # Laid out at MAX_STRETCH
+
+    assert stages.stage_remaining(1, 0.0) == 60 + 0.5 + 300 + 0.5  # Not twice the development
+    assert stages.stage_remaining(1, 160.5, equivalent=120.0) == 180.0 + 0.5
+    assert stages.stage_remaining(1, 160.5) == 200.0 + 0.5  # No checkpoint: 100 s at the reference rate
+    assert stages.stage_remaining(1, 160.5, equivalent=400.0) == 0.5  # Developed enough already
+    assert stages.stage_remaining(1, 660.5) == 0.5  # Past the step, on the compiled timeline
@@ -0,0 +1,45 @@
+# test_tempcontrol.py
+# sample(): what a probe's reading holds when the filter accepts or rejects a
+# value. Run with:  python3 -m pytest
+
+import pytest
+import clock
+import tempcontrol
+from tempcontrol import Probe
+
+BATH = Probe(tempcontrol.BATH_PROBE, "28-000000000000", 0.5, None, None)
+
+
+@pytest.fixture
+def bath(monkeypatch):
+    """Give tempcontrol one bath probe whose next raw values come from a list."""
+    values = []
+    monkeypatch.setattr(tempcontrol, "probes", [BATH])
+    monkeypatch.setattr(tempcontrol, "readings", {})
+    monkeypatch.setattr(tempcontrol, "filters", {})
+    monkeypatch.setattr(tempcontrol, "history", {})
+    monkeypatch.setattr(tempcontrol, "temp_celsius", lambda probe=None: values.pop(0))
+    return values
+
+
+def test_accepted_reading(bath):
+    bath.append(20.0)
+    reading = tempcontrol.sample()[BATH.name]
+    assert (reading.temp, reading.raw) == (20.5, 20.0)  # Calibrated with the probe's offset
+    assert len(tempcontrol.get_history()) == 1
+
+
+def test_rejected_reading_stays_fresh(bath, monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(clock, "monotonic", lambda: now[0])
+    bath.extend([20.0] * 5 + [25.0, 25.1])
+    for _ in range(5):
+        tempcontrol.sample()
+        now[0] += 5.0
+
+    for raw in (25.0, 25.1):  # A step the filter has not confirmed yet
+        reading = tempcontrol.sample()[BATH.name]
+        assert abs(reading.temp - 20.5) < 1e-9  # Filtered value held
+        assert (reading.raw, reading.timestamp) == (raw, now[0])  # But the probe is seen to answer
+        now[0] += 5.0
+    assert len(tempcontrol.get_history()) == 5
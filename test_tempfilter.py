@@ -0,0 +1,73 @@
+# test_tempfilter.py
+# Outlier rejection and smoothing of TempFilter. Run with:  python3 -m pytest
+
+import tempfilter
+from tempfilter import TempFilter
+
+
+def settled(temp=20.0, readings=10):
+    """Return a filter that has seen a steady temperature for a while."""
+    f = TempFilter()
+    for t in range(readings):
+        f.update(temp, float(t))
+    return f
+
+
+def test_impossible_readings_are_dropped():
+    f = TempFilter()
+    assert f.update(85.0, 0.0) is None  # Power-on value before any good reading
+    assert f.update(-127.0, 1.0) is None  # Failed read
+    assert f.update(None, 2.0) is None
+    assert f.update(float("nan"), 3.0) is None
+    assert f.update(126.0, 4.0) is None
+    assert f.estimate is None and f.rejected == 5
+
+    assert f.update(20.0, 5.0) == 20.0
+
+
+def test_power_on_value_is_dropped_even_if_repeated():
+    f = settled()
+    for t in range(10, 20):
+        assert f.update(85.0, float(t)) is None
+    assert f.update(-127.0, 20.0) is None
+    assert abs(f.estimate - 20.0) < 1e-9
+    assert f.held == []  # Never mistaken for a new level
+
+
+def test_85_is_believed_near_85():
+    f = settled(84.5)
+    assert f.update(85.0, 10.0) is not None
+
+
+def test_spike_needs_three_readings_in_a_row():
+    f = settled()
+    rejected = f.rejected
+    assert f.update(25.0, 10.0) is None
+    assert f.update(25.1, 11.0) is None
+    assert f.rejected == rejected + tempfilter.CONFIRM_SAMPLES - 1
+    assert f.update(25.0, 12.0) == 25.0  # Confirmed: the probe really moved, start over there
+    assert f.held == []
+    assert abs(f.update(25.05, 13.0) - 25.0) < 0.05
+
+
+def test_scattered_spikes_never_confirm():
+    f = settled()
+    for t, raw in enumerate((25.0, 30.0, 25.0, 30.0, 25.0, 30.0), start=10):
+        assert f.update(raw, float(t)) is None
+    assert abs(f.estimate - 20.0) < 1e-9
+
+
+def test_good_reading_breaks_a_run_of_spikes():
+    f = settled()
+    assert f.update(25.0, 10.0) is None
+    assert f.update(25.0, 11.0) is None
+    assert f.update(20.0, 12.0) is not None
+    assert f.update(25.0, 13.0) is None  # Counting starts again
+
+
+def test_noise_is_smoothed():
+    f = settled(readings=1)
+    for t in range(1, 60):
+        estimate = f.update(20.0625 if t % 2 else 20.0, float(t))  # Toggling on the 12-bit quantisation step
+    assert 20.0 < estimate < 20.0625
+    assert abs(estimate - 20.03125) < 0.01
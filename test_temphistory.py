@@ -0,0 +1,113 @@
+# test_temphistory.py
+# Rolling window statistics, eviction by time and by capacity, and the periodic
+# resync of TempHistory's running sums. Run with:  python3 -m pytest
+
+import math
+import temphistory
+from temphistory import TempHistory
+
+
+def exact_stats(samples):
+    """Window statistics computed from scratch, to check the running sums against."""
+    n = len(samples)
+    ts = [t for t, _ in samples]
+    ys = [y for _, y in samples]
+    mean = sum(ys) / n
+    t_mean = sum(ts) / n
+    t_var = sum((t - t_mean) ** 2 for t in ts)
+    slope = sum((t - t_mean) * (y - mean) for t, y in samples) / t_var if t_var else 0.0
+    return n, mean, min(ys), max(ys), sum((y - mean) ** 2 for y in ys) / n, slope
+
+
+def assert_stats(stats, samples, tolerance=1e-9):
+    count, mean, low, high, variance, slope = exact_stats(samples)
+    assert stats.count == count
+    assert stats.min == low and stats.max == high
+    assert math.isclose(stats.mean, mean, abs_tol=tolerance)
+    assert math.isclose(stats.variance, variance, abs_tol=tolerance)
+    assert math.isclose(stats.slope, slope, abs_tol=tolerance)
+
+
+def test_empty_history_has_no_stats():
+    history = TempHistory(capacity=10, windows=(60,))
+    assert history.stats(60) is None
+    assert history.stddev(60) is None
+    assert history.latest() is None
+
+
+def test_window_stats():
+    history = TempHistory(capacity=100, windows=(60,))
+    samples = [(float(t), 20.0 + 0.1 * t + (0.05 if t % 2 else 0.0)) for t in range(30)]
+    for t, temp in samples:
+        history.append(t, temp, heater_on=t % 3 == 0)
+
+    assert_stats(history.stats(60), samples)
+    assert math.isclose(history.stddev(60), math.sqrt(history.stats(60).variance))
+    assert history.latest() == temphistory.Sample(29.0, samples[-1][1], False)
+
+
+def test_samples_leave_the_window_by_age():
+    history = TempHistory(capacity=100, windows=(5, 60))
+    for t in range(10):
+        history.append(float(t), 30.0 - t)  # Falling, so the window's maximum has to move on
+
+    stats = history.stats(5)
+    assert stats.count == 5  # Samples at 5..9: the one exactly 5 s old is out
+    assert (stats.max, stats.min) == (25.0, 21.0)
+    assert history.stats(60).count == 10
+
+
+def test_samples_leave_the_window_when_overwritten():
+    history = TempHistory(capacity=4, windows=(60,))
+    samples = [(float(t), temp) for t, temp in enumerate((25.0, 19.0, 20.0, 21.0, 20.5, 20.2))]
+    for t, temp in samples:
+        history.append(t, temp)
+
+    assert len(history) == 4
+    assert_stats(history.stats(60), samples[-4:])
+    assert [sample.temp for sample in history.samples()] == [20.0, 21.0, 20.5, 20.2]
+
+
+def test_since_reads_only_new_samples():
+    history = TempHistory(capacity=4, windows=(60,))
+    for t in range(3):
+        history.append(float(t), 20.0 + t)
+    new, index = history.since(0)
+    assert [sample.timestamp for sample in new] == [0.0, 1.0, 2.0] and index == 3
+
+    for t in range(3, 9):
+        history.append(float(t), 20.0 + t)
+    new, index = history.since(index)  # Two of the six were overwritten before this read
+    assert [sample.timestamp for sample in new] == [5.0, 6.0, 7.0, 8.0] and index == 9
+
+
+def test_resync_keeps_long_runs_exact():
+    # Large timestamps, like a monotonic clock days after boot, and enough
+    # evictions for several resyncs of the short window
+    start = 900000.0
+    history = TempHistory(capacity=200, windows=(10,))
+    samples = []
+    for i in range(3 * temphistory._RESYNC_EVERY + 17):
+        sample = (start + i * 0.5, 20.0 + 0.3 * math.sin(i / 7.0))
+        history.append(*sample)
+        samples.append(sample)
+
+    window = history._windows[10]
+    assert window.removed < temphistory._RESYNC_EVERY
+    assert window.origin > start  # Rebased on a recent sample
+    assert_stats(history.stats(10), [s for s in samples if s[0] > samples[-1][0] - 10], tolerance=1e-7)
+
+
+def test_samples_skips_those_overwritten_while_iterating():
+    history = TempHistory(capacity=4, windows=(60,))
+    for t in range(4):
+        history.append(float(t), 20.0 + t)
+
+    read = []
+    for sample in history.samples():
+        read.append(sample)
+        if len(read) == 1:
+            history.append(4.0, 24.0)  # Overwrites the sample at 0.0, already read
+            history.append(5.0, 25.0)  # Overwrites the one at 1.0 before it is read
+    assert [(sample.timestamp, sample.temp) for sample in read] == [(0.0, 20.0), (2.0, 22.0), (3.0, 23.0)]
+    assert all(sample.temp == 20.0 + sample.timestamp for sample in read)